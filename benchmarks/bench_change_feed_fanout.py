@@ -0,0 +1,119 @@
+"""Fan-out of the data-service change feed to many subscribers.
+
+In-process: N subscriber tasks long-poll ``ChangeLog.wait``/``since`` (exactly what
+``GET /changes`` does per request) while a producer thread appends M changes, the way sync
+mutation handlers do from the threadpool. Reports delivery latency (append -> subscriber
+has the entry) and total deliveries per second.
+
+With ``--url``, subscribers instead long-poll a running data service over HTTP and the
+producer drives ``POST /orders/update_time``.
+
+Usage:
+    python benchmarks/bench_change_feed_fanout.py --subscribers 10 100 1000 5000
+    python benchmarks/bench_change_feed_fanout.py --url http://localhost:8002 --subscribers 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.data_service.app.changes import ChangeLog  # noqa: E402
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_in_process(subscribers: int, changes: int, interval: float) -> List[float]:
+    log = ChangeLog(max_entries=changes + 1)
+    latencies: List[float] = []
+
+    async def subscriber() -> None:
+        since = 0
+        while since < changes:
+            await log.wait(since, timeout=5.0)
+            entries, _ = log.since(since, limit=500)
+            now = time.perf_counter()
+            for e in entries:
+                latencies.append(now - e["data"]["t0"])
+            if entries:
+                since = entries[-1]["seq"]
+
+    def produce() -> None:
+        for i in range(changes):
+            log.append("order.updated", {"order_id": i, "t0": time.perf_counter()})
+            time.sleep(interval)
+
+    tasks = [asyncio.create_task(subscriber()) for _ in range(subscribers)]
+    await asyncio.sleep(0.05)  # let every subscriber park on the shared waiter
+    await asyncio.gather(asyncio.to_thread(produce), *tasks)
+    return latencies
+
+
+async def run_http(url: str, subscribers: int, changes: int, interval: float) -> List[float]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=subscribers + 4)
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limits) as client:
+        start = (await client.get("/changes", params={"since": 0})).json()
+        head = start["next_since"]
+        sent: dict = {}
+        latencies: List[float] = []
+
+        async def subscriber() -> None:
+            since = head
+            while since < head + changes:
+                params = {"since": since, "wait": 10.0, "limit": 500}
+                payload = (await client.get("/changes", params=params)).json()
+                now = time.perf_counter()
+                for e in payload["changes"]:
+                    latencies.append(now - sent.get(e["seq"], now))
+                since = payload["next_since"]
+
+        async def produce() -> None:
+            for i in range(changes):
+                sent[head + i + 1] = time.perf_counter()
+                body = {"order_id": 1, "new_time": f"2025-10-01T{i % 24:02d}:00:00"}
+                await client.post("/orders/update_time", json=body)
+                await asyncio.sleep(interval)
+
+        tasks = [asyncio.create_task(subscriber()) for _ in range(subscribers)]
+        await asyncio.sleep(0.2)
+        await asyncio.gather(produce(), *tasks)
+        return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--changes", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.002, help="seconds between appends")
+    parser.add_argument("--url", help="benchmark a running data service over HTTP instead")
+    args = parser.parse_args()
+
+    print(
+        f"{'subs':>6} {'deliveries':>11} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'deliv/s':>10}"
+    )
+    for n in args.subscribers:
+        t0 = time.perf_counter()
+        if args.url:
+            lat = asyncio.run(run_http(args.url, n, args.changes, args.interval))
+        else:
+            lat = asyncio.run(run_in_process(n, args.changes, args.interval))
+        elapsed = time.perf_counter() - t0
+        ms = [v * 1000 for v in lat]
+        print(
+            f"{n:>6} {len(lat):>11} {statistics.median(ms):>8.2f} {_percentile(ms, 0.99):>8.2f} "
+            f"{max(ms):>8.2f} {len(lat) / elapsed:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
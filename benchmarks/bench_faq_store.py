@@ -0,0 +1,82 @@
+"""Memory held by the FAQ corpus: dict rows + Documents versus the columnar ``FAQStore``.
+
+"dicts" reproduces the previous layout: the loaded rows, a ``Document`` per row whose
+metadata is a copy of the row, and a second load for ``retrieve_faq``. "store" is one
+``FAQStore`` plus the ``FAQDocuments`` view FAISS uses. Rows are synthetic; ``--dup``
+sets the share of rows whose answer repeats an earlier one (common in real knowledge
+bases: "contact the operator", policy boilerplate). Memory is measured with tracemalloc.
+
+Usage:
+    python benchmarks/bench_faq_store.py --rows 100000 1000000
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.documents import Document  # noqa: E402
+
+from services.llm_service.app.logic.faq_store import FAQDocuments, FAQStore  # noqa: E402
+
+WORDS = "vé xe khách đổi giờ huỷ hoàn tiền nhà xe chuyến đi thanh toán ứng dụng Vexere".split()
+
+
+def synthetic_rows(n: int, dup: float, seed: int = 0):
+    rng = random.Random(seed)
+    answers = []
+    for i in range(n):
+        question = f"Câu hỏi {i}: " + " ".join(rng.choices(WORDS, k=12)) + "?"
+        if answers and rng.random() < dup:
+            answer = rng.choice(answers)
+        else:
+            answer = " ".join(rng.choices(WORDS, k=60)) + f" ({i})."
+            answers.append(answer)
+        yield {"question": question, "answer": answer}
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / 2**20, peak / 2**20, seconds
+
+
+def build_dicts(n: int, dup: float):
+    rows = [dict(r) for r in synthetic_rows(n, dup)]
+    docs = [Document(page_content=r["question"], metadata=r) for r in rows]
+    cache = [dict(r) for r in synthetic_rows(n, dup)]  # _FAQ_CACHE: a second load
+    return rows, docs, cache
+
+
+def build_store(n: int, dup: float):
+    store = FAQStore.from_rows(synthetic_rows(n, dup))
+    return store, FAQDocuments(store)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--dup", type=float, default=0.3, help="share of repeated answers")
+    args = parser.parse_args()
+
+    header = ("rows", "layout", "held MiB", "peak MiB", "build s")
+    print(f"{header[0]:>9} {header[1]:>7} {header[2]:>10} {header[3]:>10} {header[4]:>8}")
+    for n in args.rows:
+        for name, build in (("dicts", build_dicts), ("store", build_store)):
+            held, peak, seconds = measure(lambda: build(n, args.dup))
+            print(f"{n:>9} {name:>7} {held:>10.1f} {peak:>10.1f} {seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Throughput of the in-process batched backend versus the HTTP backend, by batch size.
+
+For each batch size B, B concurrent clients each send ``--rounds`` requests through
+``LocalBackend`` (``max_batch_size=B``) and through an HTTP ``Backend``. Reports requests/s
+and generated tokens/s.
+
+By default both sides are simulated, so the run needs no model: the local runner costs
+``--step-ms + --row-ms * batch`` per decode step, and the HTTP side is a local
+OpenAI-compatible stub that serves one request at a time at ``--step-ms + --row-ms`` per
+token (an unbatched server). ``--model`` runs a real Hugging Face model locally (``llm``
+extra) and ``--url`` targets a real server instead of the stub.
+
+Usage:
+    python benchmarks/bench_local_llm.py --batch-sizes 1 2 4 8 16
+    python benchmarks/bench_local_llm.py --model Qwen/Qwen3-0.6B --url http://localhost:1234/v1
+"""
+
+import argparse
+import asyncio
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.llm_service.app.logic.local_llm import (  # noqa: E402
+    DynamicBatcher,
+    GenerationJob,
+    TransformersRunner,
+)
+from services.llm_service.app.logic.model_router import (  # noqa: E402
+    Backend,
+    BackendConfig,
+    LocalBackend,
+)
+
+PROMPT = "Tôi muốn đổi giờ vé của đơn 123 sang 10h sáng mai"
+
+
+class SimulatedRunner:
+    """Batched decode whose step cost grows slowly with batch size, as on a CPU."""
+
+    def __init__(self, step_ms: float, row_ms: float):
+        self.step = step_ms / 1000
+        self.row = row_ms / 1000
+
+    def __call__(self, jobs: List[GenerationJob]) -> None:
+        for _ in range(max(j.max_new_tokens for j in jobs)):
+            live = [j for j in jobs if not j.finished]
+            if not live:
+                break
+            time.sleep(self.step + self.row * len(live))
+            for job in live:
+                job.generated += 1
+                job.emit("x")
+                if job.generated >= job.max_new_tokens:
+                    job.finished = True
+        for job in jobs:
+            job.finished = True
+            job.finish()
+
+
+def start_stub_server(step_ms: float, row_ms: float) -> str:
+    import uvicorn
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    lock = asyncio.Lock()
+
+    @app.post("/v1/chat/completions")
+    async def completions(body: dict):
+        tokens = body.get("max_tokens") or 16
+        async with lock:  # one request at a time, no batching
+            await asyncio.sleep(tokens * (step_ms + row_ms) / 1000)
+        message = {"role": "assistant", "content": "x" * tokens}
+        return {"model": body["model"], "choices": [{"message": message}]}
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+async def run(backend: Backend, clients: int, rounds: int, tokens: int) -> float:
+    payload = {
+        "model": "bench",
+        "messages": [{"role": "user", "content": PROMPT}],
+        "max_tokens": tokens,
+        "temperature": 0,
+    }
+
+    async def client() -> None:
+        for _ in range(rounds):
+            await backend.complete(dict(payload))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--rounds", type=int, default=4, help="requests per client")
+    parser.add_argument("--tokens", type=int, default=32, help="new tokens per request")
+    parser.add_argument("--step-ms", type=float, default=20.0)
+    parser.add_argument("--row-ms", type=float, default=2.0)
+    parser.add_argument("--model", help="Hugging Face model for the local backend")
+    parser.add_argument("--url", help="OpenAI-compatible server instead of the stub")
+    args = parser.parse_args()
+
+    url = args.url or start_stub_server(args.step_ms, args.row_ms)
+    runner = TransformersRunner(args.model) if args.model else None
+    runner = runner or SimulatedRunner(args.step_ms, args.row_ms)
+    if args.model:
+        runner.load()
+
+    header = ("batch", "local req/s", "local tok/s", "http req/s", "http tok/s")
+    print(f"{header[0]:>5} {header[1]:>12} {header[2]:>12} {header[3]:>11} {header[4]:>11}")
+    for size in args.batch_sizes:
+        batcher = DynamicBatcher(runner, max_batch_size=size, max_wait=0.005, max_queue=4 * size)
+        local = LocalBackend(BackendConfig("local", "", ["bench"], kind="local"), batcher=batcher)
+        http = Backend(BackendConfig("http", url, ["bench"], max_connections=size))
+        requests = size * args.rounds
+
+        async def both():
+            try:
+                return (
+                    await run(local, size, args.rounds, args.tokens),
+                    await run(http, size, args.rounds, args.tokens),
+                )
+            finally:
+                await http.aclose()
+
+        local_s, http_s = asyncio.run(both())
+        print(
+            f"{size:>5} {requests / local_s:>12.1f} {requests * args.tokens / local_s:>12.0f} "
+            f"{requests / http_s:>11.1f} {requests * args.tokens / http_s:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
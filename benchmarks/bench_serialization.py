@@ -0,0 +1,82 @@
+"""Encoding cost and wire size of large order/trip payloads.
+
+Compares stdlib ``json``, FastAPI's default path (``jsonable_encoder`` + ``json``) and
+``services.common.serialization.dumps`` (orjson) on CPU time per encode, then reports body
+size raw, gzip and brotli (when installed) at the levels the middleware uses.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 2000 --repeat 50
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from services.common import serialization  # noqa: E402
+from services.common.serialization import compress, dumps  # noqa: E402
+
+
+def orders(n: int):
+    return [
+        {
+            "order_id": i,
+            "user_id": 10 + i % 50,
+            "status": "pending" if i % 3 else "completed",
+            "trip_id": 1000 + i,
+            "departure_time": f"2025-09-{i % 28 + 1:02d}T{i % 24:02d}:00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def trips(n: int):
+    return [
+        {
+            "trip_id": i,
+            "route_id": f"HCM-DL-{i % 7}",
+            "operator": "Nhà xe Phương Trang",
+            "departure_time": f"2025-09-{i % 28 + 1:02d}T{i % 24:02d}:30:00",
+            "price": 250000 + 1000 * (i % 40),
+            "seats_left": i % 45,
+        }
+        for i in range(n)
+    ]
+
+
+def cpu_ms(fn, payload, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(payload)
+    return (time.process_time() - start) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    encoders = {
+        "json": lambda p: json.dumps(p, ensure_ascii=False).encode(),
+        "fastapi": lambda p: json.dumps(jsonable_encoder(p), ensure_ascii=False).encode(),
+        "dumps": dumps,
+    }
+    header = ("payload", *(f"{name} ms" for name in encoders), "raw B", "gzip B", "br B")
+    print(" ".join(f"{h:>11}" for h in header))
+    for name, payload in (("orders", orders(args.rows)), ("trips", trips(args.rows))):
+        times = [cpu_ms(fn, payload, args.repeat) for fn in encoders.values()]
+        body = dumps(payload)
+        gz = len(compress(body, "gzip"))
+        br = len(compress(body, "br")) if serialization.brotli is not None else "-"
+        cells = [name, *(f"{t:.2f}" for t in times), len(body), gz, br]
+        print(" ".join(f"{c:>11}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
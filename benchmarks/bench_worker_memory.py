@@ -0,0 +1,129 @@
+"""Per-worker RSS/PSS of the LLM service: pre-fork launcher vs ``uvicorn --workers``.
+
+RSS counts every resident page a worker maps, so shared pages are counted once per worker.
+PSS divides each shared page by the number of processes mapping it; the PSS sum is the real
+footprint of the deployment. Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage:
+    python benchmarks/bench_worker_memory.py --workers 4
+    python benchmarks/bench_worker_memory.py --workers 4 --mode prefork
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "prefork": lambda port, n: [
+        sys.executable,
+        "-m",
+        "services.llm_service.app.serve",
+        "--port",
+        str(port),
+        "--workers",
+        str(n),
+        "--log-level",
+        "warning",
+    ],
+    "uvicorn": lambda port, n: [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "services.llm_service.app.main:app",
+        "--port",
+        str(port),
+        "--workers",
+        str(n),
+        "--log-level",
+        "warning",
+    ],
+}
+
+
+def read_memory_kb(pid: int) -> Dict[str, int]:
+    """Return Rss/Pss/Shared/Private totals in kB from smaps_rollup."""
+    out: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1])
+    return out
+
+
+def descendants(pid: int) -> List[int]:
+    found: List[int] = []
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+            kids = [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return found
+    for kid in kids:
+        found.append(kid)
+        found.extend(descendants(kid))
+    return found
+
+
+def wait_ready(port: int, workers: int, parent: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200:
+                if len(descendants(parent)) >= workers:
+                    time.sleep(2.0)  # let every worker finish its own startup
+                    return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"service on port {port} not ready after {timeout}s")
+
+
+def measure(mode: str, workers: int, port: int, timeout: float) -> None:
+    proc = subprocess.Popen(MODES[mode](port, workers), cwd=ROOT)
+    try:
+        wait_ready(port, workers, proc.pid, timeout)
+        pids = [proc.pid] + descendants(proc.pid)
+        print(f"\n[{mode}] workers={workers}")
+        print(f"{'pid':>8} {'role':>8} {'RSS MB':>9} {'PSS MB':>9} {'Private MB':>11}")
+        total_rss = total_pss = 0
+        for pid in pids:
+            mem = read_memory_kb(pid)
+            rss, pss = mem.get("Rss", 0), mem.get("Pss", 0)
+            private = mem.get("Private_Clean", 0) + mem.get("Private_Dirty", 0)
+            total_rss += rss
+            total_pss += pss
+            role = "parent" if pid == proc.pid else "worker"
+            print(
+                f"{pid:>8} {role:>8} {rss / 1024:>9.1f} {pss / 1024:>9.1f} "
+                f"{private / 1024:>11.1f}"
+            )
+        print(f"{'total':>17} {total_rss / 1024:>9.1f} {total_pss / 1024:>9.1f}")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("smaps_rollup not available (Linux >= 4.14 required)")
+    modes = list(MODES) if args.mode == "both" else [args.mode]
+    for mode in modes:
+        measure(mode, args.workers, args.port, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
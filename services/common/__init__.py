@@ -0,0 +1 @@
+"""Code shared by the gateway, LLM and data services."""
@@ -0,0 +1,283 @@
+"""On-demand profiling of single requests, shared by the gateway, LLM and data services.
+
+``ProfilingMiddleware`` profiles a request when it carries ``X-Profile: <PROFILE_TOKEN>`` or
+is picked by ``PROFILE_SAMPLE_RATE``; otherwise it only looks at the headers. A profiled
+request gets a sampler thread that, every ``PROFILE_INTERVAL_MS``, records:
+
+- ``cpu``: the event loop thread's stack while the request's task is running;
+- ``await``: the task's chain of suspended coroutines while it waits (the await site);
+- ``thread:<name>``: busy worker threads while the task waits (sync endpoints and
+  ``run_in_threadpool`` work; under concurrent load they may include other requests).
+
+Samples are written in folded-stack format (``frame;frame;frame count``, readable by
+flamegraph.pl, speedscope and inferno) to ``PROFILE_DIR``, which keeps the newest
+``PROFILE_MAX_FILES`` profiles. ``GET /profiles`` lists them and ``GET /profiles/{id}``
+returns one; both require ``X-Profile: <PROFILE_TOKEN>`` and are refused while no token is
+configured. At most one request is profiled at a time.
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None  # None: header trigger disabled
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "profiles")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "2"))
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{13}-[a-z0-9_]+-[0-9a-f]{6}$")
+MAX_DEPTH = 128
+# Standard-library files at the top of a parked worker thread (waiting for work).
+STDLIB = sysconfig.get_paths()["stdlib"]
+IDLE_FILES = {
+    "threading.py",
+    "queue.py",
+    "selectors.py",
+    os.path.join("concurrent", "futures", "thread.py"),
+}
+
+
+def _idle(frame) -> bool:
+    path = frame.f_code.co_filename
+    return path.startswith(STDLIB) and os.path.relpath(path, STDLIB) in IDLE_FILES
+
+
+def _frame_label(code, lineno: int) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{lineno})"
+
+
+def thread_stack(frame) -> List[str]:
+    """Outermost-first labels of ``frame`` and its callers."""
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame.f_code, frame.f_lineno))
+        frame = frame.f_back
+    return labels[::-1]
+
+
+def await_stack(task: asyncio.Task) -> List[str]:
+    """Outermost-first labels of the coroutines ``task`` is suspended in."""
+    labels = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None and len(labels) < MAX_DEPTH:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            labels.append(f"[{type(awaitable).__name__}]")
+            break
+        labels.append(_frame_label(frame.f_code, frame.f_lineno))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return labels
+
+
+class Sampler:
+    """Background thread sampling one request's task and the threads working for it."""
+
+    def __init__(self, task: asyncio.Task, interval: float):
+        self.task = task
+        self.interval = interval
+        self.loop_thread = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if asyncio.current_task(self.task.get_loop()) is self.task:
+                self._add("cpu", thread_stack(frames.get(self.loop_thread)))
+                continue
+            if self.task.done():
+                continue
+            self._add("await", await_stack(self.task))
+            for ident, frame in frames.items():
+                if ident in (me, self.loop_thread) or _idle(frame):
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self._add(f"thread:{names.get(ident, ident)}", thread_stack(frame))
+
+    def _add(self, kind: str, stack: List[str]) -> None:
+        self.counts[kind] += 1
+        self.stacks[";".join([kind, *stack])] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Directory of ``<id>.folded`` profiles with ``<id>.json`` metadata, newest kept."""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id(service: str) -> str:
+        slug = re.sub(r"[^a-z0-9_]", "_", service.lower())
+        return f"{int(time.time() * 1000):013d}-{slug}-{random.getrandbits(24):06x}"
+
+    def save(self, profile_id: str, folded: str, meta: Dict[str, Any]) -> None:
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{profile_id}.folded").write_text(folded, encoding="utf-8")
+            meta = {"id": profile_id, **meta}
+            (self.directory / f"{profile_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+            ids = self._ids()
+            for old in ids[: max(len(ids) - self.max_files, 0)]:
+                for suffix in (".folded", ".json"):
+                    (self.directory / f"{old}{suffix}").unlink(missing_ok=True)
+
+    def _ids(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        return sorted(p.stem for p in self.directory.glob("*.json") if PROFILE_ID_RE.match(p.stem))
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for profile_id in reversed(self._ids()):
+            try:
+                out.append(json.loads((self.directory / f"{profile_id}.json").read_text()))
+            except (OSError, ValueError):
+                continue  # removed by a concurrent save
+        return out
+
+    def read(self, profile_id: str) -> Optional[str]:
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.folded"
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+
+store = ProfileStore()
+_active = threading.Lock()  # one profiled request at a time per process
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests selected by header or sampling (see module doc).
+
+    The profile id is returned in ``X-Profile-Id``.
+    """
+
+    def __init__(
+        self,
+        app,
+        service: str,
+        token: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+        exclude=("/health", "/metrics", "/profiles"),
+    ):
+        self.app = app
+        self.service = service
+        token = token or PROFILE_TOKEN
+        self.token = token.encode() if token else None
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.interval = interval_ms / 1000
+        self.exclude = tuple(exclude)
+
+    def _selected(self, scope) -> bool:
+        if self.token is not None:
+            for key, value in scope.get("headers") or ():
+                if key == b"x-profile":
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self._selected(scope)
+            or scope["path"].startswith(self.exclude)
+            or not _active.acquire(blocking=False)
+        ):
+            return await self.app(scope, receive, send)
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _active.release()
+
+    async def _profile(self, scope, receive, send):
+        profile_id = ProfileStore.new_id(self.service)
+        status = {"code": 0}
+        sampler = Sampler(asyncio.current_task(), self.interval)
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                profile_header = (b"x-profile-id", profile_id.encode())
+                message = {**message, "headers": [*message.get("headers", []), profile_header]}
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            meta = {
+                "service": self.service,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "created": time.time(),
+                "wall_ms": round((time.perf_counter() - wall) * 1000, 3),
+                "process_cpu_ms": round((time.process_time() - cpu) * 1000, 3),
+                "interval_ms": self.interval * 1000,
+                "samples": dict(sampler.counts),
+            }
+            await asyncio.get_running_loop().run_in_executor(
+                None, store.save, profile_id, sampler.folded(), meta
+            )
+
+
+router = APIRouter()
+
+
+def _authorise(x_profile: Optional[str]) -> None:
+    # Profiles expose source paths and stacks: never served without a configured token.
+    if PROFILE_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Profiles are disabled (no PROFILE_TOKEN)")
+    if x_profile is None or not hmac.compare_digest(x_profile.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="X-Profile token required")
+
+
+@router.get("/profiles")
+def list_profiles(x_profile: Optional[str] = Header(None)):
+    """Captured profiles of this service, newest first."""
+    _authorise(x_profile)
+    return {"profiles": store.list()}
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, x_profile: Optional[str] = Header(None)):
+    """One profile in folded-stack format (e.g. ``flamegraph.pl profile.folded``)."""
+    _authorise(x_profile)
+    folded = store.read(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    return PlainTextResponse(folded)
@@ -0,0 +1,239 @@
+"""Fast JSON encoding and HTTP body compression shared by the services.
+
+``dumps`` uses orjson when installed (several times faster than ``json`` on the list
+payloads the data service returns) and falls back to compact stdlib JSON with identical
+output. ``FastJSONResponse`` is the default response class of every app.
+``CompressionMiddleware`` negotiates brotli (when the ``brotli`` package is installed) or gzip
+for bodies of at least ``COMPRESSION_MIN_BYTES``, and accepts compressed request bodies, which
+the gateway sends for large internal requests (``json_body``).
+"""
+
+import gzip
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+MAX_DECOMPRESSED_BYTES = 16 * 1024 * 1024
+# Compressed bytes fed to brotli per step; one step inflates to at most a few 16 MiB
+# meta-blocks before the size check runs.
+BROTLI_INPUT_STEP = 32
+
+# Streams whose chunks must reach the client as they are produced are left alone.
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream", "image/", "audio/", "video/")
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+class BodyTooLarge(ValueError):
+    """A compressed request body inflates past ``MAX_DECOMPRESSED_BYTES``."""
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("brotli request bodies are not supported here")
+        out, body = brotli.Decompressor(), bytearray()
+        for start in range(0, len(data), BROTLI_INPUT_STEP):
+            body += out.process(data[start : start + BROTLI_INPUT_STEP])
+            if len(body) > MAX_DECOMPRESSED_BYTES:
+                raise BodyTooLarge("decompressed body too large")
+        if not out.is_finished():
+            raise ValueError("truncated brotli body")
+        return bytes(body)
+    if encoding == "gzip":
+        out = zlib.decompressobj(wbits=31)
+        body = out.decompress(data, MAX_DECOMPRESSED_BYTES)
+        if out.unconsumed_tail:
+            raise BodyTooLarge("decompressed body too large")
+        return body
+    raise ValueError(f"unsupported content-encoding {encoding!r}")
+
+
+def preferred_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of br/gzip acceptable per ``Accept-Encoding`` (q-values honoured)."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    ranked = sorted(offered, key=lambda e: -weights.get(e, wildcard))
+    return next((e for e in ranked if weights.get(e, wildcard) > 0), None)
+
+
+def json_body(payload: Any) -> Dict[str, Any]:
+    """httpx request kwargs for ``payload``: plain ``json=`` when small, gzip when large."""
+    body = dumps(payload)
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return {"json": payload}
+    return {
+        "content": compress(body, "gzip"),
+        "headers": {"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    }
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flush per chunk so streamed lines are not held back waiting for more output.
+        if self._br is not None:
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._br.finish() if self._br is not None else self._gz.flush()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _encoded_headers(headers, encoding: str, length: Optional[int] = None):
+    out = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"vary")]
+    out += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+    if length is not None:
+        out.append((b"content-length", str(length).encode()))
+    return out
+
+
+class CompressionMiddleware:
+    """ASGI middleware: compress responses, decompress ``Content-Encoding`` request bodies."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_headers = scope.get("headers") or []
+        if _header(request_headers, b"content-encoding"):
+            scope, receive = await self._decompressed_request(scope, receive, send)
+            if scope is None:
+                return
+        encoding = preferred_encoding(_header(request_headers, b"accept-encoding") or "")
+        if encoding is None or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+
+        start: Optional[Dict[str, Any]] = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = message.get("headers", [])
+                media = _header(headers, b"content-type") or ""
+                passthrough = (
+                    _header(headers, b"content-encoding") is not None
+                    or message["status"] in (204, 304)
+                    or media.startswith(UNCOMPRESSED_MEDIA_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if compressor is None and not more:
+                # Whole body in one message: compress only when it is worth it.
+                headers = start.get("headers", [])
+                if len(body) >= self.minimum_size:
+                    body = compress(body, encoding)
+                    headers = _encoded_headers(headers, encoding, len(body))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+            if compressor is None:
+                compressor = _StreamCompressor(encoding)
+                await send(
+                    {**start, "headers": _encoded_headers(start.get("headers", []), encoding)}
+                )
+            out = compressor.chunk(body) if body else b""
+            if not more:
+                out += compressor.finish()
+            await send({"type": "http.response.body", "body": out, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _decompressed_request(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        encoding = _header(scope["headers"], b"content-encoding").strip().lower()
+        try:
+            body = decompress(b"".join(chunks), encoding)
+        except (ValueError, OSError, zlib.error) as exc:
+            status = 413 if isinstance(exc, BodyTooLarge) else 400
+            response = FastJSONResponse({"detail": f"Bad request body: {exc}"}, status_code=status)
+            await response(scope, receive, send)
+            return None, None
+        headers = [
+            (k, v)
+            for k, v in scope["headers"]
+            if k.lower() not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if sent:
+                return await receive()  # e.g. http.disconnect
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return {**scope, "headers": headers}, replay
@@ -0,0 +1,311 @@
+"""Lightweight distributed tracing shared by the gateway, LLM and data services.
+
+Trace context follows W3C ``traceparent`` (``00-<trace id>-<span id>-<flags>``):
+
+- ``TracingMiddleware`` continues the caller's trace (or starts one) for each request and
+  records a server span;
+- ``instrument_httpx`` wraps ``httpx`` client sends so every internal call carries the
+  current context and is recorded as a client span;
+- ``span(name, **attributes)`` records a span around any block (LLM calls, retrieval, tools).
+
+Sampling is decided once at the root (``TRACE_SAMPLE_RATE``) and travels in the flags, so a
+trace is recorded in every service or in none. Finished spans go to an in-memory buffer
+served by ``GET /traces`` and, when ``TRACE_EXPORT_PATH`` is set, are appended to a JSONL
+file that all services on a host can share (by a background writer thread, one append per
+batch of spans, so requests never wait on the file).
+"""
+
+import contextlib
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import httpx
+from fastapi import APIRouter, Query
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH") or None
+TRACE_BUFFER_SPANS = int(os.environ.get("TRACE_BUFFER_SPANS", "4096"))
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+@dataclass
+class Span:
+    name: str
+    service: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    kind: str = "internal"  # "server" | "client" | "internal"
+    start: float = 0.0  # epoch seconds
+    duration_ms: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class SpanBuffer:
+    """Bounded in-memory store of finished spans with an optional JSONL copy."""
+
+    def __init__(self, max_spans: int = TRACE_BUFFER_SPANS, path: Optional[str] = None):
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: "queue.Queue[Span]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            if self.path and self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write, name="trace-export", daemon=True
+                )
+                self._writer.start()
+        if self.path:
+            self._pending.put(span)
+
+    def flush(self) -> None:
+        """Block until every exported span is in the JSONL file."""
+        if self.path:
+            self._pending.join()
+
+    def _write(self) -> None:
+        # One unbuffered O_APPEND write per batch keeps lines whole when services share a file.
+        try:
+            fh = open(self.path, "ab", buffering=0)
+        except OSError:
+            fh = None  # keep draining; the in-memory buffer still has the spans
+        while True:
+            batch = [self._pending.get()]
+            while not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            try:
+                if fh is not None:
+                    fh.write(b"".join(_jsonl(span) for span in batch))
+            except (OSError, TypeError, ValueError):
+                pass
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def query(self, trace_id: Optional[str] = None, limit: int = 200) -> List[Dict[str, Any]]:
+        with self._lock:
+            spans = [s for s in self.spans if trace_id is None or s.trace_id == trace_id]
+        return [asdict(s) for s in spans[-limit:]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+def _jsonl(span: Span) -> bytes:
+    return (json.dumps(asdict(span), ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+_current: ContextVar[Optional[SpanContext]] = ContextVar("trace_context", default=None)
+_service: ContextVar[str] = ContextVar("trace_service", default="unknown")
+_sample_rate = TRACE_SAMPLE_RATE
+exporter = SpanBuffer(path=TRACE_EXPORT_PATH)
+
+
+def configure(service: Optional[str] = None, sample_rate: Optional[float] = None) -> None:
+    """Set the default service name (spans outside requests) and/or the root sample rate."""
+    global _sample_rate
+    if service is not None:
+        _service.set(service)
+    if sample_rate is not None:
+        _sample_rate = sample_rate
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match or set(match.group(1)) == {"0"} or set(match.group(2)) == {"0"}:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+def current() -> Optional[SpanContext]:
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    ctx = _current.get()
+    return ctx.traceparent() if ctx else None
+
+
+@contextlib.contextmanager
+def span(
+    name: str, kind: str = "internal", parent: Optional[SpanContext] = None, **attributes
+) -> Iterator[Span]:
+    """Record ``name`` as a child of ``parent`` (default: the current span)."""
+    parent = parent or _current.get()
+    if parent is None:
+        trace_id, parent_id, sampled = _new_id(128), None, random.random() < _sample_rate
+    else:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    record = Span(
+        name, _service.get(), trace_id, _new_id(64), parent_id, kind, attributes=attributes
+    )
+    token = _current.set(SpanContext(trace_id, record.span_id, sampled))
+    record.start = time.time()
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as exc:
+        record.status = "error"
+        record.attributes.setdefault("error", f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        record.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        _current.reset(token)
+        if sampled:
+            exporter.export(record)
+
+
+def record(name: str, start: float, duration_ms: float, status: str = "ok", **attributes) -> None:
+    """Record an already-timed child of the current span (for work spread over async
+    generator steps, where a ``span`` block cannot stay open)."""
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        return
+    exporter.export(
+        Span(
+            name,
+            _service.get(),
+            parent.trace_id,
+            _new_id(64),
+            parent.span_id,
+            start=start,
+            duration_ms=round(duration_ms, 3),
+            status=status,
+            attributes=attributes,
+        )
+    )
+
+
+class TracingMiddleware:
+    """ASGI middleware: one server span per request, continuing an incoming ``traceparent``.
+
+    The span covers the whole response, including streamed bodies; the trace id is echoed in
+    ``X-Trace-Id``. Requests under ``exclude`` (health, metrics, trace queries, long polls)
+    run unsampled, so neither they nor their outgoing calls are recorded.
+    """
+
+    def __init__(self, app, service: str, exclude=("/health", "/metrics", "/traces")):
+        self.app = app
+        self.service = service
+        self.exclude = tuple(exclude)
+        configure(service)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        _service.set(self.service)
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if scope["path"].startswith(self.exclude):
+            parent = SpanContext(_new_id(128), _new_id(64), sampled=False)
+        name = f"{scope['method']} {scope['path']}"
+        with span(name, kind="server", parent=parent, **{"http.method": scope["method"]}) as s:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    s.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        s.status = "error"
+                    trace_header = (b"x-trace-id", s.trace_id.encode())
+                    message = {**message, "headers": [*message.get("headers", []), trace_header]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+
+def _client_span_name(request: httpx.Request) -> str:
+    return f"{request.method} {request.url.host}:{request.url.port or ''}{request.url.path}"
+
+
+def instrument_httpx() -> None:
+    """Propagate context on, and record a client span for, every httpx request made inside a
+    trace; calls outside one (background loops such as the gateway's change-feed long poll)
+    are sent as is rather than starting traces of their own.
+
+    For streamed responses the span ends when the response headers arrive.
+    """
+    if getattr(httpx.AsyncClient.send, "_traced", False):
+        return
+    async_send, sync_send = httpx.AsyncClient.send, httpx.Client.send
+
+    async def traced_async_send(self, request, **kwargs):
+        if _current.get() is None:
+            return await async_send(self, request, **kwargs)
+        with span(_client_span_name(request), kind="client") as s:
+            request.headers["traceparent"] = current_traceparent()
+            response = await async_send(self, request, **kwargs)
+            s.set_attribute("http.status_code", response.status_code)
+            return response
+
+    def traced_send(self, request, **kwargs):
+        if _current.get() is None:
+            return sync_send(self, request, **kwargs)
+        with span(_client_span_name(request), kind="client") as s:
+            request.headers["traceparent"] = current_traceparent()
+            response = sync_send(self, request, **kwargs)
+            s.set_attribute("http.status_code", response.status_code)
+            return response
+
+    traced_async_send._traced = traced_send._traced = True
+    httpx.AsyncClient.send, httpx.Client.send = traced_async_send, traced_send
+
+
+def waterfall(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Spans of one trace ordered by start, with ``offset_ms`` from the root and ``depth``."""
+    if not spans:
+        return []
+    by_id = {s["span_id"]: s for s in spans}
+    t0 = min(s["start"] for s in spans)
+
+    def depth(s: Dict[str, Any]) -> int:
+        d = 0
+        while s.get("parent_id") in by_id and d < len(spans):
+            s, d = by_id[s["parent_id"]], d + 1
+        return d
+
+    ordered = sorted(spans, key=lambda s: s["start"])
+    return [
+        {**s, "offset_ms": round((s["start"] - t0) * 1000, 3), "depth": depth(s)} for s in ordered
+    ]
+
+
+router = APIRouter()
+
+
+@router.get("/traces")
+def get_traces(trace_id: Optional[str] = None, limit: int = Query(200, ge=1, le=5000)):
+    """Buffered spans of this service (all, or one trace)."""
+    return {"service": _service.get(), "spans": exporter.query(trace_id, limit)}
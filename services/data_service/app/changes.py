@@ -0,0 +1,77 @@
+"""Monotonic change log for the data service.
+
+Every mutation appends an entry with the next sequence number. Consumers resume from the
+last sequence they saw; if that has already been evicted from the bounded log they get
+``reset=True`` and must drop everything they cached.
+
+Waiters share one future per "generation", so an append wakes any number of subscribers
+with a single callback.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class ChangeLog:
+    def __init__(self, max_entries: int = 10_000):
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiter: Optional[asyncio.Future] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def append(self, op: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a change; safe to call from sync handlers running in the threadpool."""
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "op": op, "ts": time.time(), "data": data}
+            self._entries.append(entry)
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+        return entry
+
+    def _wake(self) -> None:
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def since(self, seq: int, limit: int = 100) -> Tuple[List[Dict[str, Any]], bool]:
+        """Entries with sequence > ``seq`` (at most ``limit``) and whether a gap occurred."""
+        with self._lock:
+            if seq > self._seq:  # consumer is ahead of us: the service restarted
+                return list(islice(self._entries, limit)), True
+            if not self._entries:
+                return [], False
+            first = self._entries[0]["seq"]
+            reset = seq < first - 1
+            start = max(0, seq - first + 1)
+            return list(islice(self._entries, start, start + limit)), reset
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait until an entry newer than ``seq`` exists; False on timeout.
+
+        Returns at once when ``seq`` is ahead of the log (it predates a service restart).
+        """
+        if self._seq != seq:
+            return True
+        loop = asyncio.get_running_loop()
+        if self._waiter is None or self._loop is not loop:
+            self._loop = loop
+            self._waiter = loop.create_future()
+        waiter = self._waiter
+        if self._seq != seq:  # appended before the waiter was visible to append()
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return self._seq != seq
+        return True
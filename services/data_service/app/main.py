@@ -3,10 +3,41 @@
 As this should already exist, this implementation is for design purposes only.
 """
 
-from fastapi import FastAPI, HTTPException
+import base64
+import binascii
+import hashlib
+import json
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
-app = FastAPI(title="Data Service Layer", version="0.1.0")
+from ...common import profiling, tracing
+from ...common.serialization import CompressionMiddleware, FastJSONResponse, dumps
+from .changes import ChangeLog
+
+app = FastAPI(title="Data Service Layer", version="0.1.0", default_response_class=FastJSONResponse)
+app.include_router(tracing.router)
+app.include_router(profiling.router)
+app.add_middleware(CompressionMiddleware)
+# /changes long polls are excluded so idle feed followers do not flood the span buffer.
+app.add_middleware(
+    tracing.TracingMiddleware,
+    service="data_service",
+    exclude=("/health", "/traces", "/changes"),
+)
+app.add_middleware(
+    profiling.ProfilingMiddleware,
+    service="data_service",
+    exclude=("/health", "/profiles", "/changes"),
+)
+
+MAX_PAGE_SIZE = 1000
+CHANGE_LOG_SIZE = 10_000
+CHANGES_MAX_WAIT_SECONDS = 30.0
+SSE_HEARTBEAT_SECONDS = 15.0
 
 # Fake in-memory data stores (replicate real data in production)
 ORDERS = [
@@ -41,6 +72,9 @@ TRIPS = [
 
 COMPLAINTS = []
 
+# Every mutation is recorded here; see GET /changes and GET /changes/stream.
+CHANGES = ChangeLog(CHANGE_LOG_SIZE)
+
 
 class UpdateOrderTimeRequest(BaseModel):
     order_id: int
@@ -56,19 +90,124 @@ class ComplaintResponse(BaseModel):
 # these endpoint are just for demonstration purposes
 
 
+# --- List pagination helpers ---
+# Keyset pagination: stores are kept in ascending key order (order_id / trip_id), and a
+# cursor is the opaque encoding of the last key returned, so pages stay stable when rows
+# before the cursor are deleted.
+
+
+def encode_cursor(key: int) -> str:
+    return base64.urlsafe_b64encode(str(key).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii"))
+    except (binascii.Error, ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(selected) - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields {unknown}; allowed: {sorted(allowed)}"
+        )
+    return selected
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def list_response(
+    rows: Iterable[Dict[str, Any]],
+    key: str,
+    allowed_fields: Iterable[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[str],
+    fmt: str,
+    if_none_match: Optional[str] = None,
+):
+    """Page, project and serialise ``rows`` (a lazy iterable in ascending ``key`` order).
+
+    With ``limit``, responses carry one page and the next page's cursor, if any, is in the
+    ``X-Next-Cursor`` header; without it they carry every remaining row, as these endpoints
+    always have. JSON responses are a list with a content ETag and answer a matching
+    ``If-None-Match`` with an empty 304. NDJSON responses serialise row by row.
+    """
+    selected = parse_fields(fields, allowed_fields)
+    if cursor:
+        after = decode_cursor(cursor)
+        rows = (r for r in rows if r[key] > after)
+
+    def project(row: Dict[str, Any]) -> Dict[str, Any]:
+        return row if selected is None else {f: row[f] for f in selected if f in row}
+
+    if fmt == "ndjson" and limit is None:
+        lines = (dumps(project(r)) + b"\n" for r in rows)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    headers = {}
+    if limit is None:
+        page = list(rows)
+    else:
+        page = list(islice(rows, limit + 1))  # one extra row tells whether a next page exists
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(page[-1][key])
+    if fmt == "ndjson":
+        lines = (dumps(project(r)) + b"\n" for r in page)
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+    body = dumps([project(r) for r in page])
+    headers["ETag"] = f'"{hashlib.sha1(body).hexdigest()}"'
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+ORDER_FIELDS = ("order_id", "user_id", "status", "trip_id", "departure_time")
+TRIP_FIELDS = ("route_id", "trip_id", "operator", "depart")
+FORMAT_PATTERN = "^(json|ndjson)$"
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
 @app.get("/orders/{user_id}/pending")
-def get_pending_orders(user_id: int):
-    return [o for o in ORDERS if o["user_id"] == user_id and o["status"] == "pending"]
+def get_pending_orders(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    if_none_match: Optional[str] = Header(None),
+):
+    rows = (o for o in ORDERS if o["user_id"] == user_id and o["status"] == "pending")
+    return list_response(rows, "order_id", ORDER_FIELDS, limit, cursor, fields, fmt, if_none_match)
 
 
 @app.get("/trips/{route_id}")
-def get_trips(route_id: str):
-    return [t for t in TRIPS if t["route_id"] == route_id]
+def get_trips(
+    route_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    if_none_match: Optional[str] = Header(None),
+):
+    rows = (t for t in TRIPS if t["route_id"] == route_id)
+    return list_response(rows, "trip_id", TRIP_FIELDS, limit, cursor, fields, fmt, if_none_match)
 
 
 @app.post("/orders/update_time")
@@ -76,6 +215,10 @@ def update_order_time(req: UpdateOrderTimeRequest):
     for o in ORDERS:
         if o["order_id"] == req.order_id:
             o["departure_time"] = req.new_time
+            CHANGES.append(
+                "order.updated",
+                {"order_id": o["order_id"], "user_id": o["user_id"], "trip_id": o["trip_id"]},
+            )
             return {"updated": True, "order": o}
     raise HTTPException(status_code=404, detail="Order not found")
 
@@ -85,6 +228,7 @@ def delete_order(order_id: int):
     for o in ORDERS:
         if o["order_id"] == order_id:
             ORDERS.remove(o)
+            CHANGES.append("order.deleted", {"order_id": order_id, "user_id": o["user_id"]})
             return {"deleted": True, "order_id": order_id}
     raise HTTPException(status_code=404, detail="Order not found")
 
@@ -94,5 +238,64 @@ def create_complaint(order_id: int, complaint: str):
     for o in ORDERS:
         if o["order_id"] == order_id:
             # Here you would normally save the complaint to a database
+            COMPLAINTS.append({"order_id": order_id, "complaint": complaint})
+            CHANGES.append("complaint.created", {"order_id": order_id, "user_id": o["user_id"]})
             return ComplaintResponse(order_id=order_id, complaint=complaint)
     raise HTTPException(status_code=404, detail="Order not found")
+
+
+# --- Change feed ---
+
+
+@app.get("/changes")
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    wait: float = Query(0.0, ge=0.0, le=CHANGES_MAX_WAIT_SECONDS),
+):
+    """Changes after sequence ``since``; with ``wait`` > 0, long-poll until one arrives.
+
+    ``reset`` is true when entries after ``since`` were already evicted: the consumer must
+    drop everything it derived from earlier state and resume from ``next_since``.
+    """
+    if wait:
+        await CHANGES.wait(since, wait)
+    changes, reset = CHANGES.since(since, limit)
+    if changes:
+        next_since = changes[-1]["seq"]
+    else:
+        next_since = CHANGES.last_seq if reset else since
+    return {"changes": changes, "next_since": next_since, "reset": reset}
+
+
+@app.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-sent events: one ``change`` event per entry, ``id`` = sequence number.
+
+    Resumes from ``since`` or the standard ``Last-Event-ID`` header (default: only new
+    changes). Emits a ``reset`` event when the requested position was already evicted.
+    """
+    if since is None:
+        since = int(last_event_id) if (last_event_id or "").isdigit() else CHANGES.last_seq
+
+    async def events():
+        position = since
+        while not await request.is_disconnected():
+            changes, reset = CHANGES.since(position, MAX_PAGE_SIZE)
+            if reset:
+                yield f"event: reset\ndata: {json.dumps({'seq': CHANGES.last_seq})}\n\n"
+            for change in changes:
+                yield f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+                position = change["seq"]
+            if reset and not changes:
+                position = CHANGES.last_seq
+            if not changes and not await CHANGES.wait(position, SSE_HEARTBEAT_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
@@ -8,6 +8,56 @@ EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 # Path to FAQ CSV (RAG data), this can change if needed
 FAQ_DATA_PATH = Path(__file__).parent / "faq_data.csv"
 
+# Generation backends behind /generate (and the FAQ/planner endpoints). Each entry is an
+# OpenAI-compatible server with its own connection pool; list every model it serves.
+# TASK_MODELS sends cheap tasks to a small model and answer generation to a larger one, e.g.
+#   {"name": "big", "base_url": "http://gpu-1:8000/v1", "models": ["qwen/qwen3-14b"]}
+#   TASK_MODELS["faq"] = "qwen/qwen3-14b"
+GENERATION_BACKENDS = [
+    {"name": "default", "base_url": BASE_URL, "models": [LLM_MODEL], "max_connections": 16},
+]
+TASK_MODELS = {
+    "intent_plan": LLM_MODEL,
+    "faq": LLM_MODEL,
+    "chat": LLM_MODEL,
+}
+DEFAULT_GENERATION_MODEL = LLM_MODEL
+BACKEND_EWMA_ALPHA = 0.3
+BACKEND_FAILURE_THRESHOLD = 3  # consecutive failures before a backend is benched
+BACKEND_COOLDOWN_SECONDS = 5.0  # doubled per further failure, capped at 60s
+
+# In-process CPU backend (needs the "llm" extra). Enable it by adding e.g.
+#   {"name": "local", "kind": "local", "base_url": "", "models": [LLM_MODEL],
+#    "model_path": "Qwen/Qwen3-4B"}
+# to GENERATION_BACKENDS. Concurrent requests are batched into shared forward passes; the
+# caps below bound the batch (and so the KV cache) and the queue in front of it.
+LOCAL_LLM_MAX_BATCH_SIZE = 8
+LOCAL_LLM_MAX_BATCH_TOKENS = 8192  # prompt + new tokens summed over one batch
+LOCAL_LLM_MAX_WAIT_MS = 10  # how long an idle model waits for a batch to fill
+LOCAL_LLM_MAX_QUEUE = 64  # further requests fail over to other backends
+LOCAL_LLM_MAX_INPUT_TOKENS = 2048
+LOCAL_LLM_MAX_NEW_TOKENS = 512
+LOCAL_LLM_THREADS = None  # torch intra-op threads; None keeps the torch default
+
+# Retrieval / batch FAQ
+FAQ_TOP_K = 3
+FAQ_BATCH_MAX_QUESTIONS = 256
+FAQ_BATCH_MAX_CONCURRENCY = 8  # upper bound on concurrent generations per batch request
+# /faq/ask returns the stored answer without generating when the best hit's cosine similarity
+# to the question is at least this (a near-exact rephrasing); None always generates.
+FAQ_EXTRACTIVE_MIN_SCORE = 0.92
+
+# Intent planner: structured output mode ("json_schema" | "json_object" | None for prompt-only),
+# generation cap, and how many repair re-prompts a malformed plan gets before a 502.
+PLANNER_RESPONSE_FORMAT = "json_schema"
+PLANNER_MAX_TOKENS = 256
+PLANNER_MAX_REPAIRS = 1
+
 # External services
 DATA_SERVICE_URL = "http://localhost:8002"
 HTTP_TIMEOUT_SECONDS = 15.0
+
+# Multi-worker deployment (see serve.py). When set, the FAISS index is persisted here and
+# memory-mapped read-only so all workers share one copy; None keeps it in process memory.
+FAISS_INDEX_DIR = None  # e.g. Path(__file__).parent / "faiss_index"
+LLM_WORKERS = 1
@@ -0,0 +1,154 @@
+"""Column-oriented, de-duplicated in-memory FAQ corpus.
+
+The corpus is loaded once into an ``FAQStore``: each column keeps its distinct values in one
+UTF-8 buffer with an offsets array, and each row holds only the id of its value, so repeated
+answers are stored once and there is no per-row dict or string object. Retrieval refers to
+rows by id: ``FAQDocuments`` hands FAISS the questions to embed and serves as its docstore,
+building a small ``Document`` (``metadata={"row": i}``) only for the hits of a search.
+"""
+
+import csv
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+COLUMNS = ("question", "answer")
+
+
+class _Column:
+    """Distinct values in one buffer (``offsets[i]:offsets[i + 1]``) and a value id per row."""
+
+    __slots__ = ("data", "offsets", "ids", "_interned")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+        self.ids = array("I")
+        self._interned: Optional[Dict[str, int]] = {}
+
+    def append(self, value: str) -> None:
+        value_id = self._interned.get(value)
+        if value_id is None:
+            value_id = self._interned[value] = len(self._interned)
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+        self.ids.append(value_id)
+
+    def seal(self) -> "_Column":
+        """Drop the build-time index of values; the column is read-only afterwards."""
+        self.data, self._interned = bytes(self.data), None
+        return self
+
+    def __getitem__(self, row: int) -> str:
+        value_id = self.ids[row]
+        return self.data[self.offsets[value_id] : self.offsets[value_id + 1]].decode("utf-8")
+
+    @property
+    def distinct(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets) + 4 * len(self.ids)
+
+
+class FAQRecord:
+    """Read-only view of one row."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "FAQStore", row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def question(self) -> str:
+        return self.store.get(self.row, "question")
+
+    @property
+    def answer(self) -> str:
+        return self.store.get(self.row, "answer")
+
+    def get(self, column: str, default: Optional[str] = None) -> Optional[str]:
+        return self.store.get(self.row, column) if column in self.store.columns else default
+
+    def as_dict(self) -> Dict[str, str]:
+        return {name: self.store.get(self.row, name) for name in self.store.columns}
+
+
+class FAQStore:
+    __slots__ = ("columns", "size")
+
+    def __init__(self, columns: Dict[str, _Column], size: int):
+        self.columns = columns
+        self.size = size
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, str]], columns=COLUMNS) -> "FAQStore":
+        built = {name: _Column() for name in columns}
+        size = 0
+        for row in rows:
+            for name, column in built.items():
+                column.append(str(row.get(name) or "").strip())
+            size += 1
+        return cls({name: column.seal() for name, column in built.items()}, size)
+
+    @classmethod
+    def from_csv(cls, path: Path, columns=COLUMNS) -> "FAQStore":
+        """Load ``path`` row by row straight into the columns."""
+        if not Path(path).exists():
+            return cls.from_rows([], columns)
+        with open(path, encoding="utf-8") as f:
+            rows = ({(k or "").strip(): v for k, v in raw.items()} for raw in csv.DictReader(f))
+            return cls.from_rows(rows, columns)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get(self, row: int, column: str) -> str:
+        return self.columns[column][row]
+
+    def record(self, row: int) -> FAQRecord:
+        return FAQRecord(self, row)
+
+    def records(self) -> Iterator[FAQRecord]:
+        return (FAQRecord(self, row) for row in range(self.size))
+
+    def column(self, name: str) -> List[str]:
+        column = self.columns[name]
+        return [column[row] for row in range(self.size)]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+
+class FAQDocuments(Sequence, Docstore):
+    """The store's questions as ``Document``s, built on access; doubles as a FAISS docstore
+    whose ids are row numbers (``str(row)``)."""
+
+    def __init__(self, store: FAQStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return Document(page_content=self.store.get(row, "question"), metadata={"row": row})
+
+    def search(self, search: str) -> Document:
+        return self[int(search)]
+
+
+def faq_answer(doc: Document, store: FAQStore) -> str:
+    """Answer of a retrieved document (row id into ``store``, or an inline ``answer``)."""
+    metadata = doc.metadata or {}
+    if "row" in metadata:
+        return store.get(metadata["row"], "answer")
+    return str(metadata.get("answer", ""))
@@ -0,0 +1,65 @@
+"""Incremental detection of the first complete JSON object in streamed model output.
+
+Lets callers stop generation as soon as the object closes instead of paying for trailing
+chatter. Braces inside JSON strings and inside a leading ``<think>...</think>`` block (Qwen3
+reasoning output) are ignored.
+"""
+
+from typing import Optional
+
+THINK_OPEN, THINK_CLOSE = "<think>", "</think>"
+
+
+class JSONObjectScanner:
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0  # next character to scan
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.result: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Consume ``chunk``; return the object's text once it is complete, else None."""
+        if self.result is not None or not chunk:
+            return self.result
+        self._text += chunk
+        if self._start is None and self._pos == 0:
+            head = self._text.lstrip()
+            if head.startswith(THINK_OPEN) or THINK_OPEN.startswith(head):
+                close = self._text.find(THINK_CLOSE)
+                if close == -1:
+                    return None  # still reasoning (or too short to tell)
+                self._pos = close + len(THINK_CLOSE)
+
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._start is None:
+                if ch == "{":
+                    self._start, self._depth = i, 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.result = text[self._start : i + 1]
+                    return self.result
+        self._pos = len(text)
+        return None
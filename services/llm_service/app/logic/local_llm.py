@@ -0,0 +1,297 @@
+"""In-process CPU generation with dynamic batching (optional ``llm`` extra).
+
+Requests queue on a ``DynamicBatcher``; whenever the model is idle the batcher waits up to
+``max_wait`` for more work, then runs every compatible queued request (same temperature,
+within ``max_batch_size`` and ``max_batch_tokens``) as one padded ``generate`` call in a worker
+thread. Each request gets its own token stream, and a request whose consumer went away
+(e.g. the planner's early stop) is marked finished so its row stops producing tokens.
+
+``response_format`` is not enforced here; the planner's JSON scanner and repair handle that.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class QueueFullError(Exception):
+    """The local backend already has ``max_queue`` requests waiting."""
+
+
+@dataclass
+class GenerationJob:
+    messages: List[Dict[str, Any]]
+    max_new_tokens: int
+    temperature: float = 0.0
+    cost: int = 0  # prompt + new tokens, counted against max_batch_tokens
+    generated: int = 0
+    finished: bool = False  # set by the runner (EOS / token limit) or on cancel
+    cancelled: bool = False
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+    _queue: Optional[asyncio.Queue] = field(default=None, repr=False)
+
+    def emit(self, text: str) -> None:
+        """Called from the runner thread for each decoded text delta."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, error or _DONE)
+
+
+class DynamicBatcher:
+    """Coalesces concurrent jobs into batches for a blocking ``runner(jobs)`` call.
+
+    The runner must call ``emit``/``finish`` on every job it is given and should stop
+    generating for jobs that become ``finished``.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[List[GenerationJob]], None],
+        max_batch_size: int = 8,
+        max_batch_tokens: int = 8192,
+        max_wait: float = 0.01,
+        max_queue: int = 64,
+        cost: Optional[Callable[[GenerationJob], int]] = None,
+    ):
+        self.runner = runner
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.cost = cost or _estimate_cost
+        self._pending: Deque[GenerationJob] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.batched_jobs = 0
+
+    def _ensure_worker(self) -> None:
+        # Created lazily so the event and task bind to the serving event loop.
+        if self._worker is None or self._worker.done():
+            self._wake = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stream(self, job: GenerationJob) -> AsyncIterator[str]:
+        """Queue ``job`` and yield its text deltas; raises ``QueueFullError`` when saturated."""
+        if len(self._pending) >= self.max_queue:
+            raise QueueFullError(f"local backend queue is full ({self.max_queue})")
+        job._loop = asyncio.get_running_loop()
+        job._queue = asyncio.Queue()
+        job.cost = self.cost(job)
+        self._ensure_worker()
+        self._pending.append(job)
+        self._wake.set()
+        try:
+            while True:
+                item = await job._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            if not job.finished:
+                job.cancelled = job.finished = True
+                if job in self._pending:
+                    self._pending.remove(job)
+
+    def _take_batch(self) -> List[GenerationJob]:
+        head = self._pending.popleft()
+        batch, tokens = [head], head.cost
+        for job in list(self._pending):
+            if len(batch) >= self.max_batch_size:
+                break
+            if job.temperature != head.temperature or tokens + job.cost > self.max_batch_tokens:
+                continue
+            self._pending.remove(job)
+            batch.append(job)
+            tokens += job.cost
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)  # let concurrent requests join the batch
+            batch = self._take_batch()
+            self.batches += 1
+            self.batched_jobs += len(batch)
+            try:
+                await asyncio.to_thread(self.runner, batch)
+            except Exception as exc:  # surfaced to every job in the batch
+                logger.exception("local generation failed")
+                for job in batch:
+                    job.finish(exc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_jobs / self.batches, 2) if self.batches else 0,
+        }
+
+
+def _estimate_cost(job: GenerationJob) -> int:
+    chars = sum(len(str(m.get("content", ""))) for m in job.messages)
+    return chars // 4 + job.max_new_tokens
+
+
+class _BatchStreamer:
+    """``generate`` streamer that splits each step's tokens into per-job text deltas."""
+
+    def __init__(self, tokenizer, jobs: List[GenerationJob], eos_ids: set):
+        self.tokenizer = tokenizer
+        self.jobs = jobs
+        self.eos_ids = eos_ids
+        self._ids: List[List[int]] = [[] for _ in jobs]
+        # Per row: ids before ``_prefix`` are final text; ``_prefix:_read`` were already sent
+        # and are decoded again only as context for the next tokens (spaces, merges).
+        self._prefix = [0] * len(jobs)
+        self._read = [0] * len(jobs)
+        self._prompt_seen = False
+
+    def put(self, value) -> None:
+        if not self._prompt_seen:  # the first call carries the prompt ids
+            self._prompt_seen = True
+            return
+        for i, token in enumerate(value.reshape(-1).tolist()):
+            job = self.jobs[i]
+            if job.finished:
+                continue
+            if token in self.eos_ids:
+                self._close(job)
+                continue
+            self._ids[i].append(token)
+            job.generated += 1
+            self._emit_new_text(i)
+            if job.generated >= job.max_new_tokens:
+                self._close(job)
+
+    def _emit_new_text(self, i: int) -> None:
+        """Decode only the tokens since the last emitted delta plus a little context, so
+        each step costs the same however long the reply already is."""
+        ids, prefix, read = self._ids[i], self._prefix[i], self._read[i]
+        decode = self.tokenizer.decode
+        sent = decode(ids[prefix:read], skip_special_tokens=True)
+        text = decode(ids[prefix:], skip_special_tokens=True)
+        if len(text) > len(sent) and not text.endswith("�"):  # wait for multi-byte chars
+            self.jobs[i].emit(text[len(sent) :])
+            self._prefix[i], self._read[i] = read, len(ids)
+
+    @staticmethod
+    def _close(job: GenerationJob) -> None:
+        # Close the stream now rather than when the batch's longest row is done.
+        job.finished = True
+        job.finish()
+
+    def end(self) -> None:
+        for job in self.jobs:
+            if not job.finished:  # finished rows were closed in ``put``; cancelled ones are gone
+                self._close(job)
+
+
+class TransformersRunner:
+    """Runs a batch of chat jobs through a Hugging Face causal LM on CPU.
+
+    The model is loaded on the first batch (after ``serve.py`` forks), in bfloat16 with
+    ``low_cpu_mem_usage``. Chats longer than ``max_input_tokens`` lose their oldest turns
+    (system messages and the latest turn are kept); anything still too long is cut from the
+    left so the end of the prompt survives.
+    """
+
+    def __init__(
+        self, model_path: str, max_input_tokens: int = 2048, threads: Optional[int] = None
+    ):
+        self.model_path = model_path
+        self.max_input_tokens = max_input_tokens
+        self.threads = threads
+        self._torch = None
+        self._model = None
+        self._tokenizer = None
+
+    def load(self) -> None:
+        if self._model is not None:
+            return
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+        except ImportError as exc:
+            raise RuntimeError(
+                "The local backend needs the 'llm' extra: pip install -e .[llm]"
+            ) from exc
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        tokenizer.padding_side = "left"  # decoder-only batches must be left-padded
+        tokenizer.truncation_side = "left"  # keep the latest turn and the generation prompt
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_path, torch_dtype=torch.bfloat16, low_cpu_mem_usage=True
+        )
+        model.eval()
+        self._torch, self._tokenizer, self._model = torch, tokenizer, model
+
+    def estimate_cost(self, job: GenerationJob) -> int:
+        """Batch cost from the character count; cheap enough for the event loop."""
+        prompt_tokens = _estimate_cost(job) - job.max_new_tokens
+        return min(prompt_tokens, self.max_input_tokens) + job.max_new_tokens
+
+    def _template(self, messages: List[Dict[str, Any]]) -> str:
+        return self._tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True, enable_thinking=False
+        )
+
+    def _prompt(self, job: GenerationJob) -> str:
+        """The job's chat as prompt text, oldest non-system turns dropped until it fits."""
+        system = [m for m in job.messages if m.get("role") == "system"]
+        turns = [m for m in job.messages if m.get("role") != "system"]
+        prompt = self._template(job.messages)
+        while len(turns) > 1 and len(self._tokenizer(prompt)["input_ids"]) > self.max_input_tokens:
+            turns = turns[1:]
+            prompt = self._template(system + turns)
+        return prompt
+
+    def __call__(self, jobs: List[GenerationJob]) -> None:
+        self.load()
+        torch, tokenizer = self._torch, self._tokenizer
+        encoded = tokenizer(
+            [self._prompt(job) for job in jobs],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens,
+        )
+        eos = self._model.generation_config.eos_token_id
+        eos_ids = set(eos if isinstance(eos, list) else [eos]) | {tokenizer.eos_token_id}
+        streamer = _BatchStreamer(tokenizer, jobs, eos_ids)
+
+        def stop_finished_rows(input_ids, scores, **kwargs):
+            # Per-row stop flags: rows of finished or abandoned jobs are padded from here on.
+            return torch.tensor([job.finished for job in jobs], device=input_ids.device)
+
+        from transformers import StoppingCriteriaList
+
+        temperature = jobs[0].temperature
+        sampling: Dict[str, Any] = {"do_sample": temperature > 0}
+        if temperature > 0:
+            sampling["temperature"] = temperature
+        with torch.inference_mode():
+            self._model.generate(
+                **encoded,
+                max_new_tokens=max(job.max_new_tokens for job in jobs),
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([stop_finished_rows]),
+                pad_token_id=tokenizer.pad_token_id,
+                **sampling,
+            )
@@ -0,0 +1,31 @@
+"""In-process LLM service counters, served at GET /metrics."""
+
+from collections import Counter
+from typing import Any, Dict
+
+counters: Counter = Counter()
+
+
+def incr(name: str, value: float = 1) -> None:
+    counters[name] += value
+
+
+def snapshot() -> Dict[str, Any]:
+    data: Dict[str, Any] = dict(counters)
+    requests, attempts = counters["planner_requests"], counters["planner_attempts"]
+    if requests:
+        # Parse failures are per generation attempt; failures are requests that got a 502.
+        data["planner_parse_failure_rate"] = counters["planner_parse_failures"] / attempts
+        data["planner_failure_rate"] = counters["planner_failures"] / requests
+        data["planner_output_chunks_per_request"] = counters["planner_output_chunks"] / requests
+    faq, extractive = counters["faq_requests"], counters["faq_extractive"]
+    if faq:
+        data["faq_extractive_rate"] = extractive / faq
+    if extractive and faq > extractive:
+        # Saved time: what the extractive requests would have cost at the generated average.
+        generated_avg = counters["faq_generated_seconds"] / (faq - extractive)
+        extractive_avg = counters["faq_extractive_seconds"] / extractive
+        data["faq_generated_avg_s"] = generated_avg
+        data["faq_extractive_avg_s"] = extractive_avg
+        data["faq_latency_saved_s"] = extractive * max(generated_avg - extractive_avg, 0.0)
+    return data
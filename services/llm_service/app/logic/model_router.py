@@ -0,0 +1,382 @@
+"""Routing of generation requests over a pool of generation backends.
+
+Each backend has its own connection pool, passive health state and an EWMA of response
+latency (time to first token for streams). A request's model is the explicit
+``GenerationRequest.model`` or, failing that, the model configured for its ``task``; among
+healthy backends serving that model the one with the lowest
+``(outstanding + 1) * ewma_latency`` wins. Connection errors, 429 and 5xx fail over to the
+next candidate before any output has been returned.
+
+Backends are OpenAI-compatible servers, or ``kind="local"`` for an in-process CPU model with
+dynamic batching (``local_llm.py``).
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+
+from ....common import tracing
+from ..config import (
+    BACKEND_COOLDOWN_SECONDS,
+    BACKEND_EWMA_ALPHA,
+    BACKEND_FAILURE_THRESHOLD,
+    DEFAULT_GENERATION_MODEL,
+    GENERATION_BACKENDS,
+    HTTP_TIMEOUT_SECONDS,
+    LOCAL_LLM_MAX_BATCH_SIZE,
+    LOCAL_LLM_MAX_BATCH_TOKENS,
+    LOCAL_LLM_MAX_INPUT_TOKENS,
+    LOCAL_LLM_MAX_NEW_TOKENS,
+    LOCAL_LLM_MAX_QUEUE,
+    LOCAL_LLM_MAX_WAIT_MS,
+    LOCAL_LLM_THREADS,
+    TASK_MODELS,
+)
+from ..schemas.llm import GenerationRequest, GenerationResponse
+from .local_llm import DynamicBatcher, GenerationJob, QueueFullError, TransformersRunner
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class NoBackendError(Exception):
+    """No configured backend serves the requested model."""
+
+
+class BackendError(Exception):
+    """Every candidate backend failed."""
+
+
+@dataclass
+class BackendConfig:
+    name: str
+    base_url: str
+    models: List[str]
+    max_connections: int = 16
+    api_key: str = "none"
+    timeout: float = HTTP_TIMEOUT_SECONDS
+    kind: str = "http"  # "http" (OpenAI-compatible server) or "local" (in-process, CPU)
+    model_path: Optional[str] = None  # weights for a local backend; defaults to models[0]
+
+
+@dataclass
+class Backend:
+    config: BackendConfig
+    transport: Optional[httpx.AsyncBaseTransport] = None
+    outstanding: int = 0
+    ewma_latency: float = 1.0
+    consecutive_failures: int = 0
+    unhealthy_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    _client: Optional[httpx.AsyncClient] = field(default=None, repr=False)
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the serving event loop.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.config.base_url,
+                timeout=self.config.timeout,
+                headers={"Authorization": f"Bearer {self.config.api_key}"},
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_connections,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def score(self) -> float:
+        return (self.outstanding + 1) * self.ewma_latency
+
+    def record_success(self, latency: float) -> None:
+        self.ewma_latency += BACKEND_EWMA_ALPHA * (latency - self.ewma_latency)
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        over = self.consecutive_failures - BACKEND_FAILURE_THRESHOLD
+        if over >= 0:
+            self.unhealthy_until = now + min(BACKEND_COOLDOWN_SECONDS * 2**over, 60.0)
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        r = await self.client.post("/chat/completions", json=payload)
+        if r.status_code in RETRYABLE_STATUS:
+            raise BackendError(f"{self.name}: HTTP {r.status_code}")
+        r.raise_for_status()
+        return r.json()
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        async with self.client.stream("POST", "/chat/completions", json=payload) as r:
+            if r.status_code in RETRYABLE_STATUS:
+                raise BackendError(f"{self.name}: HTTP {r.status_code}")
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.config.kind,
+            "models": self.config.models,
+            "healthy": self.healthy(time.monotonic()),
+            "outstanding": self.outstanding,
+            "ewma_latency_s": round(self.ewma_latency, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalBackend(Backend):
+    """In-process backend: requests are batched onto a local Hugging Face model."""
+
+    def __init__(self, config: BackendConfig, batcher: Optional[DynamicBatcher] = None):
+        super().__init__(config)
+        if batcher is None:
+            runner = TransformersRunner(
+                config.model_path or config.models[0],
+                max_input_tokens=LOCAL_LLM_MAX_INPUT_TOKENS,
+                threads=LOCAL_LLM_THREADS,
+            )
+            batcher = DynamicBatcher(
+                runner,
+                max_batch_size=LOCAL_LLM_MAX_BATCH_SIZE,
+                max_batch_tokens=LOCAL_LLM_MAX_BATCH_TOKENS,
+                max_wait=LOCAL_LLM_MAX_WAIT_MS / 1000,
+                max_queue=LOCAL_LLM_MAX_QUEUE,
+                cost=runner.estimate_cost,
+            )
+        self.batcher = batcher
+
+    def _job(self, payload: Dict[str, Any]) -> GenerationJob:
+        max_tokens = min(
+            payload.get("max_tokens") or LOCAL_LLM_MAX_NEW_TOKENS, LOCAL_LLM_MAX_NEW_TOKENS
+        )
+        return GenerationJob(
+            messages=payload["messages"],
+            max_new_tokens=max_tokens,
+            temperature=float(payload.get("temperature") or 0.0),
+        )
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        deltas = self.batcher.stream(self._job(payload))
+        try:
+            async for delta in deltas:
+                yield delta
+        except QueueFullError as exc:
+            raise BackendError(f"{self.name}: {exc}") from exc
+        finally:
+            await deltas.aclose()
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job = self._job(payload)
+        parts = []
+        try:
+            async for delta in self.batcher.stream(job):
+                parts.append(delta)
+        except QueueFullError as exc:
+            raise BackendError(f"{self.name}: {exc}") from exc
+        message = {"role": "assistant", "content": "".join(parts)}
+        return {
+            "model": payload["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"completion_tokens": job.generated},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), **self.batcher.stats()}
+
+
+def to_openai_messages(prompt: Any) -> List[Dict[str, Any]]:
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    roles = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+    messages = []
+    for m in prompt:
+        if isinstance(m, BaseMessage):
+            messages.append({"role": roles.get(m.type, "user"), "content": m.content})
+        else:
+            messages.append(m)
+    return messages
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        backends: List[Backend],
+        task_models: Optional[Dict[str, str]] = None,
+        default_model: str = DEFAULT_GENERATION_MODEL,
+        clock=time.monotonic,
+    ):
+        self.backends = backends
+        self.task_models = task_models or {}
+        self.default_model = default_model
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls) -> "ModelRouter":
+        backends = []
+        for cfg in GENERATION_BACKENDS:
+            config = BackendConfig(**cfg)
+            backends.append(LocalBackend(config) if config.kind == "local" else Backend(config))
+        return cls(backends, TASK_MODELS, DEFAULT_GENERATION_MODEL)
+
+    def resolve_model(self, model: Optional[str], task: Optional[str]) -> str:
+        return model or self.task_models.get(task or "", self.default_model)
+
+    def candidates(self, model: str) -> List[Backend]:
+        """Backends serving ``model``, best first; unhealthy ones only as a last resort."""
+        serving = [b for b in self.backends if model in b.config.models]
+        if not serving:
+            raise NoBackendError(f"No backend serves model '{model}'")
+        now = self.clock()
+        return sorted(serving, key=lambda b: (not b.healthy(now), b.score()))
+
+    def _payload(self, model: str, prompt: Any, stream: bool, **params) -> Dict[str, Any]:
+        payload = {"model": model, "messages": to_openai_messages(prompt), "stream": stream}
+        payload.update({k: v for k, v in params.items() if v is not None})
+        return payload
+
+    async def complete(self, model: str, prompt: Any, **params) -> Dict[str, Any]:
+        """Non-streaming chat completion; returns the backend's JSON plus ``backend``."""
+        payload = self._payload(model, prompt, stream=False, **params)
+        last_error: Optional[Exception] = None
+        with tracing.span("llm.complete", model=model) as span:
+            for attempt, backend in enumerate(self.candidates(model)):
+                backend.outstanding += 1
+                backend.requests += 1
+                start = self.clock()
+                try:
+                    data = await backend.complete(payload)
+                except (httpx.TransportError, BackendError) as exc:
+                    backend.record_failure(self.clock())
+                    last_error = exc
+                    logger.warning("backend %s failed: %s", backend.name, exc)
+                    continue
+                finally:
+                    backend.outstanding -= 1
+                backend.record_success(self.clock() - start)
+                span.attributes.update(backend=backend.name, failovers=attempt)
+                data["backend"] = backend.name
+                return data
+            raise BackendError(f"All backends for '{model}' failed: {last_error}")
+
+    async def stream(self, model: str, prompt: Any, **params) -> AsyncIterator[str]:
+        """Streaming chat completion yielding content deltas."""
+        payload = self._payload(model, prompt, stream=True, **params)
+        last_error: Optional[Exception] = None
+        for backend in self.candidates(model):
+            backend.outstanding += 1
+            backend.requests += 1
+            start = self.clock()
+            started_at, chunks, status = time.time(), 0, "ok"
+            first_ms: Optional[float] = None
+            deltas = backend.stream(payload)
+            try:
+                async for delta in deltas:
+                    if first_ms is None:
+                        backend.record_success(self.clock() - start)
+                        first_ms = (time.time() - started_at) * 1000
+                    chunks += 1
+                    yield delta
+                return
+            except (httpx.TransportError, BackendError) as exc:
+                status = "error"
+                backend.record_failure(self.clock())
+                if first_ms is not None:
+                    raise  # output already sent; cannot fail over mid-answer
+                last_error = exc
+                logger.warning("backend %s failed: %s", backend.name, exc)
+            finally:
+                await deltas.aclose()
+                backend.outstanding -= 1
+                # Early close (e.g. the planner's JSON stop) still records what was streamed.
+                tracing.record(
+                    "llm.stream",
+                    started_at,
+                    (time.time() - started_at) * 1000,
+                    status,
+                    model=model,
+                    backend=backend.name,
+                    chunks=chunks,
+                    ttft_ms=round(first_ms, 3) if first_ms is not None else None,
+                )
+        raise BackendError(f"All backends for '{model}' failed: {last_error}")
+
+    async def generate(self, req: GenerationRequest) -> GenerationResponse:
+        model = self.resolve_model(req.model, req.task)
+        params: Dict[str, Any] = {"max_tokens": req.max_tokens, "temperature": req.temperature}
+        if req.json_mode:
+            params["response_format"] = {"type": "json_object"}
+        if req.tools:
+            params["tools"] = req.tools
+            params["tool_choice"] = req.tool_choice
+        data = await self.complete(model, req.prompt, **params)
+        message = ((data.get("choices") or [{}])[0]).get("message") or {}
+        return GenerationResponse(
+            model=data.get("model", model),
+            output=message.get("content") or "",
+            raw=data,
+            backend=data.get("backend"),
+        )
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [b.stats() for b in self.backends]
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            await backend.aclose()
+
+
+class RoutedChatModel:
+    """Minimal ``ainvoke``/``astream`` chat model bound to a task of a ``ModelRouter``.
+
+    Used by the FAQ and planner endpoints so each task is served by its configured model.
+    Tool calling stays on the LangChain ``ChatOpenAI`` client.
+    """
+
+    def __init__(self, router: ModelRouter, task: str):
+        self.router = router
+        self.task = task
+
+    @property
+    def model(self) -> str:
+        return self.router.resolve_model(None, self.task)
+
+    async def ainvoke(self, prompt: Any, **params) -> AIMessage:
+        data = await self.router.complete(self.model, prompt, **params)
+        message = ((data.get("choices") or [{}])[0]).get("message") or {}
+        return AIMessage(content=message.get("content") or "")
+
+    async def astream(self, prompt: Any, **params) -> AsyncIterator[AIMessageChunk]:
+        async for delta in self.router.stream(self.model, prompt, **params):
+            yield AIMessageChunk(content=delta)
@@ -0,0 +1,126 @@
+"""Intent planner execution: structured output, early stop and bounded repair.
+
+The backend is asked for JSON matching ``IntentPlanResponse`` (``response_format``) with a
+tight ``max_tokens``. Output is streamed through ``JSONObjectScanner`` and the stream is
+closed as soon as the object is complete. Unparseable plans get at most
+``PLANNER_MAX_REPAIRS`` repair prompts before ``PlannerError``.
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import ValidationError
+
+from ....common import tracing
+from ..config import PLANNER_MAX_REPAIRS, PLANNER_MAX_TOKENS, PLANNER_RESPONSE_FORMAT
+from ..schemas.llm import IntentAction, IntentPlanResponse
+from . import metrics
+from .json_stream import JSONObjectScanner
+
+PLAN_JSON_SCHEMA: Dict[str, Any] = IntentPlanResponse.model_json_schema()
+
+REPAIR_PROMPT = (
+    "{prompt}\n\nYour previous answer could not be used ({error}). Previous answer:\n"
+    "{previous}\n\nReply with only the corrected JSON object."
+)
+
+
+class PlannerError(Exception):
+    """The planner did not produce a usable plan within the repair budget."""
+
+
+def planner_call_kwargs() -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"max_tokens": PLANNER_MAX_TOKENS, "temperature": 0}
+    if PLANNER_RESPONSE_FORMAT == "json_schema":
+        kwargs["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": "intent_plan", "schema": PLAN_JSON_SCHEMA},
+        }
+    elif PLANNER_RESPONSE_FORMAT == "json_object":
+        kwargs["response_format"] = {"type": "json_object"}
+    return kwargs
+
+
+async def generate_json_object(llm, prompt: str, **kwargs) -> Tuple[str, Optional[str]]:
+    """Stream ``prompt`` and stop at the first complete JSON object.
+
+    Returns (all text received, object text or None).
+    """
+    scanner = JSONObjectScanner()
+    chunks = 0
+    stream = llm.astream(prompt, **kwargs)
+    try:
+        async for chunk in stream:
+            content = getattr(chunk, "content", chunk)
+            if not isinstance(content, str) or not content:
+                continue
+            chunks += 1  # usually about one token each, but backends may group tokens
+            if scanner.feed(content) is not None:
+                break
+    finally:
+        await stream.aclose()  # drops the HTTP stream, so the backend stops generating
+    metrics.incr("planner_output_chunks", chunks)
+    if scanner.result is not None:
+        metrics.incr("planner_early_stops")
+    return scanner.text, scanner.result
+
+
+def parse_plan(obj_text: str) -> IntentPlanResponse:
+    data = json.loads(obj_text)
+    if not isinstance(data, dict):
+        raise ValueError("plan is not a JSON object")
+    # Coerce types and defaults
+    action = data.get("action") or None
+    if action is not None and not isinstance(action, dict):
+        raise ValueError("action must be an object or null")
+    if action:
+        action = IntentAction(name=str(action.get("name", "")), args=action.get("args") or {})
+    actions = data.get("actions") or []
+    if not isinstance(actions, list) or not all(isinstance(a, dict) for a in actions):
+        raise ValueError("actions must be a list of objects")
+    actions = [
+        IntentAction(name=str(a.get("name", "")), args=a.get("args") or {})
+        for a in actions
+        if a.get("name")
+    ]
+    return IntentPlanResponse(
+        intent=str(data.get("intent", "unknown")),
+        slots=data.get("slots") or {},
+        action=action,
+        actions=actions,
+        notes=data.get("notes"),
+    )
+
+
+async def run_planner(llm, prompt: str) -> IntentPlanResponse:
+    with tracing.span("planner.run") as span:
+        plan = await _run_planner(llm, prompt, span)
+        span.set_attribute("intent", plan.intent)
+        return plan
+
+
+async def _run_planner(llm, prompt: str, span: tracing.Span) -> IntentPlanResponse:
+    metrics.incr("planner_requests")
+    kwargs = planner_call_kwargs()
+    attempt_prompt = prompt
+    error: Exception = ValueError("no attempt made")
+    for attempt in range(PLANNER_MAX_REPAIRS + 1):
+        metrics.incr("planner_attempts")
+        span.set_attribute("attempts", attempt + 1)
+        text, obj_text = await generate_json_object(llm, attempt_prompt, **kwargs)
+        try:
+            if obj_text is None:
+                raise ValueError("no complete JSON object in output")
+            plan = parse_plan(obj_text)
+        except (ValueError, ValidationError) as exc:  # JSONDecodeError is a ValueError
+            metrics.incr("planner_parse_failures")
+            error = exc
+            attempt_prompt = REPAIR_PROMPT.format(
+                prompt=prompt, error=str(exc)[:200], previous=text[-1000:]
+            )
+            continue
+        if attempt:
+            metrics.incr("planner_repaired")
+        return plan
+    metrics.incr("planner_failures")
+    raise PlannerError(str(error))
@@ -1,36 +1,25 @@
-import csv
 import difflib
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from ..config import FAQ_DATA_PATH
+from .faq_store import FAQStore
 
+_FAQ_STORE: Optional[FAQStore] = None
 
-def load_faq_data() -> List[Dict[str, str]]:
-    faqs = []
-    if not FAQ_DATA_PATH.exists():
-        return faqs
-    with open(FAQ_DATA_PATH, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            faqs.append({k.strip(): v.strip() for k, v in row.items()})
-    return faqs
 
-
-_FAQ_CACHE = None
-
-
-def get_faqs() -> List[Dict[str, str]]:
-    global _FAQ_CACHE
-    if _FAQ_CACHE is None:
-        _FAQ_CACHE = load_faq_data()
-    return _FAQ_CACHE
+def get_faq_store() -> FAQStore:
+    """The FAQ corpus, loaded once per process and shared by FAISS and ``retrieve_faq``."""
+    global _FAQ_STORE
+    if _FAQ_STORE is None:
+        _FAQ_STORE = FAQStore.from_csv(FAQ_DATA_PATH)
+    return _FAQ_STORE
 
 
 def retrieve_faq(question: str, top_k: int = 1) -> List[Dict[str, str]]:
-    faqs = get_faqs()
-    if not faqs:
+    store = get_faq_store()
+    if not len(store):
         return []
     # Use difflib for simple fuzzy matching on 'question' field
-    questions = [f["question"] for f in faqs if "question" in f]
-    matches = difflib.get_close_matches(question, questions, n=top_k, cutoff=0.3)
-    return [f for f in faqs if f["question"] in matches]
+    questions = store.column("question")
+    matches = set(difflib.get_close_matches(question, questions, n=top_k, cutoff=0.3))
+    return [store.record(i).as_dict() for i, q in enumerate(questions) if q in matches]
@@ -0,0 +1,125 @@
+"""FAISS index construction with an optional on-disk, memory-mapped copy.
+
+When ``FAISS_INDEX_DIR`` is set, the index is written once and every process loads it
+read-only through mmap, so N workers share the same page-cache pages instead of holding
+N private copies of the vectors.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ..config import EMBEDDING_MODEL, FAISS_INDEX_DIR
+
+INDEX_FILE = "index.faiss"
+FINGERPRINT_FILE = "fingerprint.txt"
+
+
+def corpus_fingerprint(docs: List[Document]) -> str:
+    """Hash of the embedding model and indexed texts; a mismatch forces a rebuild."""
+    h = hashlib.sha256(EMBEDDING_MODEL.encode("utf-8"))
+    for d in docs:
+        h.update(b"\x00")
+        h.update(d.page_content.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_mmap(index_path: Path, docs: Sequence[Document], embeddings, docstore=None) -> FAISS:
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    # IO_FLAG_MMAP_IFC maps flat codes zero-copy (faiss >= 1.10); older builds only mmap
+    # inverted lists, which is still read-only and shareable.
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    index = faiss.read_index(str(index_path), flags)
+    # Row i of the index is docs[i]: FAISS.from_documents adds vectors in input order.
+    ids = [str(i) for i in range(len(docs))]
+    docstore = docstore if docstore is not None else InMemoryDocstore(dict(zip(ids, docs)))
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+
+def build_vectorstore(
+    docs: Sequence[Document],
+    embeddings,
+    index_dir: Optional[Path] = FAISS_INDEX_DIR,
+    docstore=None,
+) -> Optional[FAISS]:
+    """Return a FAISS vector store over ``docs`` (None when there is nothing to index).
+
+    Without ``index_dir`` the index lives in process memory. With it, the index is persisted
+    on first use (or when the corpus changes) and then memory-mapped read-only. Documents get
+    ids ``str(row)``; a ``docstore`` resolving those ids replaces the copy of ``docs`` FAISS
+    would otherwise keep.
+    """
+    if not docs:
+        return None
+    if index_dir is None:
+        built = FAISS.from_documents(list(docs), embeddings, ids=[str(i) for i in range(len(docs))])
+        if docstore is not None:
+            built.docstore = docstore
+        return built
+
+    index_dir = Path(index_dir)
+    index_path = index_dir / INDEX_FILE
+    fingerprint_path = index_dir / FINGERPRINT_FILE
+    fingerprint = corpus_fingerprint(docs)
+    stale = (
+        not index_path.exists()
+        or not fingerprint_path.exists()
+        or fingerprint_path.read_text(encoding="utf-8").strip() != fingerprint
+    )
+    if stale:
+        import faiss
+
+        index_dir.mkdir(parents=True, exist_ok=True)
+        built = FAISS.from_documents(list(docs), embeddings)
+        tmp_path = index_path.with_suffix(".tmp")
+        faiss.write_index(built.index, str(tmp_path))
+        tmp_path.replace(index_path)  # atomic swap so concurrent readers never see a partial file
+        fingerprint_path.write_text(fingerprint, encoding="utf-8")
+    return _load_mmap(index_path, docs, embeddings, docstore)
+
+
+def batch_search(
+    vectorstore: FAISS, embeddings, questions: List[str], k: int
+) -> List[List[Document]]:
+    """Embed all ``questions`` in one batch and run a single FAISS search for them.
+
+    Returns the top-``k`` documents per question, in input order.
+    """
+    scored = batch_search_with_scores(vectorstore, embeddings, questions, k)
+    return [[doc for doc, _ in hits] for hits in scored]
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def batch_search_with_scores(
+    vectorstore: FAISS, embeddings, questions: List[str], k: int
+) -> List[List[Tuple[Document, float]]]:
+    """``batch_search`` with the cosine similarity of each document to its question.
+
+    Cosine is computed from the stored vectors, so it means the same whatever the index
+    metric or whether the embedding model normalises its output.
+    """
+    if not questions:
+        return []
+    vectors = np.asarray(embeddings.embed_documents(questions), dtype="float32")
+    if getattr(vectorstore, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(vectors)
+    _, rows = vectorstore.index.search(vectors, k)
+    id_map, docstore = vectorstore.index_to_docstore_id, vectorstore.docstore
+    out = []
+    for query, row in zip(_unit(vectors), rows):
+        hits = [int(i) for i in row if i != -1]
+        stored = _unit(np.stack([vectorstore.index.reconstruct(i) for i in hits])) if hits else []
+        out.append([(docstore.search(id_map[i]), float(query @ v)) for i, v in zip(hits, stored)])
+    return out
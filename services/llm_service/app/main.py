@@ -1,12 +1,35 @@
+import contextlib
+
 from fastapi import FastAPI
 
+from ...common import profiling, tracing
+from ...common.serialization import CompressionMiddleware, FastJSONResponse
+from .logic import metrics
 from .routers import llm
 
-# Simple abstraction layer for multiple model backends
+# Simple abstraction layer for multiple model backends (logic/model_router.py); the
+# backend connection pools are closed on shutdown.
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await llm.model_router.aclose()
 
 
-app = FastAPI(title="LLM Serving Layer", version="0.1.0")
+app = FastAPI(
+    title="LLM Serving Layer",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 app.include_router(llm.router)
+app.include_router(tracing.router)
+app.include_router(profiling.router)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(tracing.TracingMiddleware, service="llm_service")
+app.add_middleware(profiling.ProfilingMiddleware, service="llm_service")
+tracing.instrument_httpx()  # also covers the OpenAI client used by the agent
 
 """LLM service main module.
 
@@ -18,3 +41,8 @@ it for emergency rollback, set environment variable DISABLE_GPT5_PREVIEW=true.
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
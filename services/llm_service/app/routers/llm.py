@@ -1,55 +1,75 @@
-import json
-import re
+import asyncio
+import time
+from typing import List, Optional, Tuple
 
 import httpx
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
 
-from ..config import BASE_URL, DATA_SERVICE_URL, EMBEDDING_MODEL, HTTP_TIMEOUT_SECONDS, LLM_MODEL
-from ..logic.utils import load_faq_data
+from ....common import tracing
+from ..config import (
+    BASE_URL,
+    DATA_SERVICE_URL,
+    EMBEDDING_MODEL,
+    FAQ_BATCH_MAX_CONCURRENCY,
+    FAQ_EXTRACTIVE_MIN_SCORE,
+    FAQ_TOP_K,
+    HTTP_TIMEOUT_SECONDS,
+    LLM_MODEL,
+)
+from ..logic import metrics
+from ..logic.faq_store import FAQDocuments, faq_answer
+from ..logic.local_llm import QueueFullError
+from ..logic.model_router import BackendError, ModelRouter, NoBackendError, RoutedChatModel
+from ..logic.planner import PlannerError, run_planner
+from ..logic.utils import get_faq_store
+from ..logic.vector_index import batch_search, batch_search_with_scores, build_vectorstore
 from ..schemas.llm import (
     ChangeTimeRequest,
     ChangeTimeResponse,
+    FAQAskBatchRequest,
     FAQAskRequest,
     FAQAskResponse,
-    IntentAction,
+    FAQBatchItem,
+    GenerationRequest,
+    GenerationResponse,
     IntentPlanRequest,
     IntentPlanResponse,
 )
 
 router = APIRouter()
 
+# Tool-calling agent client (LangChain bind_tools)
 llm = ChatOpenAI(
     base_url=BASE_URL,
     model=LLM_MODEL,
     api_key="none",
 )
 
-# Build FAQ documents
-faq_data = load_faq_data()
-faq_docs = [
-    # Index only the question text for retrieval similarity
-    Document(
-        page_content=str(faq.get("question", "")),
-        metadata=faq,
-    )
-    for faq in faq_data
-]
+# Task-routed clients over the backend pool (see config.GENERATION_BACKENDS / TASK_MODELS)
+model_router = ModelRouter.from_config()
+faq_llm = RoutedChatModel(model_router, "faq")
+planner_llm = RoutedChatModel(model_router, "intent_plan")
+
+# FAQ corpus: one shared columnar store; FAISS indexes only the question text and resolves
+# hits to rows of the store (faq_docs is both its document list and its docstore).
+faq_store = get_faq_store()
+faq_docs = FAQDocuments(faq_store)
 
 # Embeddings + VectorStore
 faq_embeddings = HuggingFaceEmbeddings(
     model_name=EMBEDDING_MODEL,
 )
 
-vectorstore = FAISS.from_documents(faq_docs, faq_embeddings) if faq_docs else None
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3}) if vectorstore else None
+vectorstore = build_vectorstore(faq_docs, faq_embeddings, docstore=faq_docs)
+retriever = vectorstore.as_retriever(search_kwargs={"k": FAQ_TOP_K}) if vectorstore else None
 
 faq_prompt = ChatPromptTemplate.from_template(
     (
@@ -65,22 +85,55 @@ faq_prompt = ChatPromptTemplate.from_template(
 )
 
 
+def search_faq(question: str) -> List[Tuple[Document, float]]:
+    """Top FAQ_TOP_K documents for ``question`` with their cosine similarity, best first."""
+    if not retriever:
+        return []
+    with tracing.span("faq.retrieve", questions=1, k=FAQ_TOP_K):
+        return batch_search_with_scores(vectorstore, faq_embeddings, [question], FAQ_TOP_K)[0]
+
+
 def get_faq_context(question: str) -> str:
+    return format_faq_context([doc for doc, _ in search_faq(question)])
+
+
+def extractive_answer(hits: List[Tuple[Document, float]]) -> Optional[str]:
+    """Stored answer of the best hit when it is a near-exact match of the question."""
+    if not hits or FAQ_EXTRACTIVE_MIN_SCORE is None:
+        return None
+    doc, score = hits[0]
+    answer = faq_answer(doc, faq_store).strip()
+    return answer if answer and score >= FAQ_EXTRACTIVE_MIN_SCORE else None
+
+
+def get_faq_contexts(questions: List[str]) -> List[str]:
+    """Batched get_faq_context: one embedding batch and one FAISS search for all questions."""
     if not retriever:
-        return ""
-    docs = retriever.get_relevant_documents(question)
+        return [""] * len(questions)
+    with tracing.span("faq.retrieve", questions=len(questions), k=FAQ_TOP_K):
+        docs_per_question = batch_search(vectorstore, faq_embeddings, questions, FAQ_TOP_K)
+    return [format_faq_context(docs) for docs in docs_per_question]
+
+
+def format_faq_context(docs) -> str:
     # Provide Q/A pairs in context while retrieval used only the question text
-    lines = []
-    for d in docs:
-        q = d.page_content
-        a = ""
-        md = getattr(d, "metadata", {}) or {}
-        try:
-            a = md.get("answer", "")
-        except Exception:
-            a = ""
-        lines.append(f"Q: {q}\nA: {a}")
-    return "\n\n".join(lines)
+    return "\n\n".join(f"Q: {d.page_content}\nA: {faq_answer(d, faq_store)}" for d in docs)
+
+
+@router.post("/generate", response_model=GenerationResponse)
+async def generate(req: GenerationRequest):
+    """Raw generation routed to the best backend serving the requested model/task."""
+    try:
+        return await model_router.generate(req)
+    except NoBackendError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except (BackendError, httpx.HTTPError) as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+
+
+@router.get("/generate/backends")
+def generation_backends():
+    return model_router.stats()
 
 
 @router.post("/faq/ask")
@@ -94,27 +147,95 @@ async def faq_ask(req: FAQAskRequest, stream: bool = False):
             return StreamingResponse(err_gen(), media_type="text/plain")
         return FAQAskResponse(answer="FAQ data not loaded.", context="")
 
-    context = get_faq_context(req.question)
-    prompt = faq_prompt.format(context=context, question=req.question)
+    start = time.perf_counter()
+    hits = await run_in_threadpool(search_faq, req.question)
+    context = format_faq_context([doc for doc, _ in hits])
+    score = round(hits[0][1], 4) if hits else None
+    extractive = extractive_answer(hits)
+    metrics.incr("faq_requests")
+
+    def done(kind: str) -> None:
+        metrics.incr(f"faq_{kind}_seconds", time.perf_counter() - start)
 
+    if extractive is not None:
+        metrics.incr("faq_extractive")
+        done("extractive")
+        if not stream:
+            return FAQAskResponse(answer=extractive, context=context, extractive=True, score=score)
+
+        async def stored_answer():
+            yield f"[CONTEXT_START]\n{context}\n[CONTEXT_END]\n[ANSWER_START]\n"
+            yield extractive
+            yield "\n[ANSWER_END]"
+
+        headers = {"X-FAQ-Extractive": "1", "X-FAQ-Score": str(score)}
+        return StreamingResponse(stored_answer(), media_type="text/plain", headers=headers)
+
+    prompt = faq_prompt.format(context=context, question=req.question)
     if not stream:
         try:
-            answer_msg = await llm.ainvoke(prompt)
+            answer_msg = await faq_llm.ainvoke(prompt)
         except Exception as exc:
             raise HTTPException(status_code=500, detail=str(exc)) from exc
-        return FAQAskResponse(answer=answer_msg.content, context=context)
+        done("generated")
+        return FAQAskResponse(answer=answer_msg.content, context=context, score=score)
 
     async def token_generator():
         yield f"[CONTEXT_START]\n{context}\n[CONTEXT_END]\n[ANSWER_START]\n"
         try:
-            async for chunk in llm.astream(prompt):
+            async for chunk in faq_llm.astream(prompt):
                 if getattr(chunk, "content", None):
                     yield chunk.content
         except Exception as exc:
             yield f"\n[ERROR] {exc}"
+        done("generated")
         yield "\n[ANSWER_END]"
 
-    return StreamingResponse(token_generator(), media_type="text/plain")
+    headers = {"X-FAQ-Extractive": "0"}
+    if score is not None:
+        headers["X-FAQ-Score"] = str(score)
+    return StreamingResponse(token_generator(), media_type="text/plain", headers=headers)
+
+
+@router.post("/faq/ask_batch")
+async def faq_ask_batch(req: FAQAskBatchRequest):
+    """Answer many questions; streams one FAQBatchItem per NDJSON line in completion order.
+
+    Retrieval runs once for the whole batch; generation runs with at most
+    ``max_concurrency`` (capped by FAQ_BATCH_MAX_CONCURRENCY) LLM calls in flight.
+    """
+    questions = req.questions
+    contexts = await run_in_threadpool(get_faq_contexts, questions)
+    limit = min(req.max_concurrency or FAQ_BATCH_MAX_CONCURRENCY, FAQ_BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def answer_one(index: int) -> FAQBatchItem:
+        question, context = questions[index], contexts[index]
+        item = FAQBatchItem(index=index, question=question, context=context)
+        if not retriever:
+            item.answer = "FAQ data not loaded."
+            return item
+        prompt = faq_prompt.format(context=context, question=question)
+        async with semaphore:
+            try:
+                answer_msg = await faq_llm.ainvoke(prompt)
+                item.answer = answer_msg.content
+            except Exception as exc:
+                item.error = str(exc)
+        return item
+
+    async def ndjson_lines():
+        tasks = [asyncio.create_task(answer_one(i)) for i in range(len(questions))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield item.model_dump_json() + "\n"
+        finally:
+            # Client went away or we finished: never leave generations running.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 
 
 # --- Tool Calling: change ticket time ---
@@ -187,7 +308,8 @@ async def agent_change_time(req: ChangeTimeRequest):
     ]
 
     # First LLM pass (may include tool calls)
-    ai = await llm_with_tools.ainvoke(messages)
+    with tracing.span("llm.agent", model=LLM_MODEL, turn=1):
+        ai = await llm_with_tools.ainvoke(messages)
     tool_calls = getattr(ai, "tool_calls", []) or []
 
     tool_results = []
@@ -200,10 +322,13 @@ async def agent_change_time(req: ChangeTimeRequest):
             if tool_fn is None:
                 result = f"ERROR: Unknown tool {name}"
             else:
-                try:
-                    result = tool_fn.invoke(args)  # langchain tool wrapper supports .invoke
-                except Exception as exc:
-                    result = f"ERROR: {exc}"
+                with tracing.span(f"tool.{name}", args=str(args)) as span:
+                    try:
+                        result = tool_fn.invoke(args)  # langchain tool wrapper supports .invoke
+                    except Exception as exc:
+                        result = f"ERROR: {exc}"
+                    if str(result).startswith("ERROR"):
+                        span.status = "error"
             tool_results.append({"tool": name, "args": args, "result": result})
 
         # Send tool results back to the LLM for a final answer
@@ -211,7 +336,8 @@ async def agent_change_time(req: ChangeTimeRequest):
         for call, tr in zip(tool_calls, tool_results):
             call_id = call.get("id") if isinstance(call, dict) else getattr(call, "id", None)
             tool_messages.append(ToolMessage(content=str(tr["result"]), tool_call_id=call_id))
-        final = await llm.ainvoke(messages + [ai] + tool_messages)
+        with tracing.span("llm.agent", model=LLM_MODEL, turn=2):
+            final = await llm.ainvoke(messages + [ai] + tool_messages)
         return ChangeTimeResponse(
             answer=getattr(final, "content", str(final)),
             tool_calls=tool_calls,
@@ -233,9 +359,9 @@ intent_prompt = ChatPromptTemplate.from_template(
         "You are an intent classifier and action planner for a travel ticketing assistant. "
     "Classify the user's Vietnamese text into one of: change_time, get_pending_orders, "
     "get_trips, faq, unknown. "
-    "Extract slots and propose a single action if applicable. Output strict JSON with keys: "
+    "Extract slots and propose an action if applicable. Output strict JSON with keys: "
     "intent (string, within listed intents), slots (object), action (object|null), "
-    "notes (string|null). "
+    "actions (array of actions), notes (string|null). "
     "Slots may include: order_id (int), new_time (ISO-8601 string), route_id (string), "
     "question (string). "
     "If requesting trips and a route is specified, set action to {{\"name\": \"get_trips\", "
@@ -243,7 +369,11 @@ intent_prompt = ChatPromptTemplate.from_template(
     "If changing time with order_id & new_time present, set action to "
     "{{\"name\": \"update_ticket_time\", \"args\": {{\"order_id\": <int>, \"new_time_iso\": "
     "\"<ISO-8601>\"}}}}. "
-        "If asking a general question, intent faq with question in slots."
+        "If asking a general question, intent faq with question in slots. "
+        "If the text asks for several independent things (e.g. pending orders and trips on a "
+        "route), list one action per request in actions and set action to the first; "
+        "otherwise leave actions empty. "
+        "Reply with the JSON object only, no explanation."
         "\nUser text: {text}\nUser id: {user_id}"
     )
 )
@@ -254,17 +384,11 @@ async def plan_intent(req: IntentPlanRequest):
     prompt = intent_prompt.format(
         text=req.text, user_id=getattr(req, "user_id", None)  # user_id is optional
     )
-    msg = await llm.ainvoke(prompt)
-    print(msg)
-
-    content = msg.content if hasattr(msg, "content") else str(msg)
-    match = re.search(r"\{[\s\S]*\}", content)
-    data = json.loads(match.group(0) if match else content)
-    # Coerce types and defaults
-    intent = str(data.get("intent", "unknown"))
-    slots = data.get("slots", {}) or {}
-    action = data.get("action") or None
-    if action and isinstance(action, dict):
-        action = IntentAction(name=str(action.get("name", "")), args=action.get("args", {}) or {})
-    notes = data.get("notes")
-    return IntentPlanResponse(intent=intent, slots=slots, action=action, notes=notes)
+    try:
+        return await run_planner(planner_llm, prompt)
+    except PlannerError as exc:
+        raise HTTPException(status_code=502, detail=f"Unusable planner output: {exc}") from exc
+    except (NoBackendError, QueueFullError) as exc:
+        raise HTTPException(status_code=503, detail=f"Planner unavailable: {exc}") from exc
+    except (BackendError, httpx.HTTPError) as exc:
+        raise HTTPException(status_code=502, detail=f"Planner backend failed: {exc}") from exc
@@ -2,9 +2,12 @@ from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+from ..config import FAQ_BATCH_MAX_QUESTIONS
+
 
 class GenerationRequest(BaseModel):
-    model: str = Field(default="gpt-4o")
+    model: Optional[str] = None  # None: use the model configured for ``task``
+    task: Optional[str] = None  # e.g. intent_plan | faq | chat (see config.TASK_MODELS)
     prompt: str
     max_tokens: int = 512
     temperature: float = 0.7
@@ -17,6 +20,7 @@ class GenerationResponse(BaseModel):
     model: str
     output: str
     raw: Optional[Dict[str, Any]] = None
+    backend: Optional[str] = None
 
 
 class FAQAskRequest(BaseModel):
@@ -26,6 +30,23 @@ class FAQAskRequest(BaseModel):
 class FAQAskResponse(BaseModel):
     answer: str
     context: str
+    extractive: bool = False  # stored answer of a near-exact match, no generation
+    score: Optional[float] = None  # cosine similarity of the best match
+
+
+class FAQAskBatchRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=FAQ_BATCH_MAX_QUESTIONS)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+class FAQBatchItem(BaseModel):
+    """One NDJSON line of /faq/ask_batch; ``index`` is the question's input position."""
+
+    index: int
+    question: str
+    answer: Optional[str] = None
+    context: str = ""
+    error: Optional[str] = None
 
 
 class ChangeTimeRequest(BaseModel):
@@ -53,4 +74,6 @@ class IntentPlanResponse(BaseModel):
     intent: str  # e.g., change_time | get_pending_orders | get_trips | faq | unknown
     slots: Dict[str, Any] = {}
     action: Optional[IntentAction] = None
+    # Several independent requests in one utterance, e.g. pending orders and trips on a route
+    actions: List[IntentAction] = []
     notes: Optional[str] = None
@@ -0,0 +1,96 @@
+"""Pre-fork launcher for running the LLM service with several workers (POSIX only).
+
+``uvicorn --workers N`` spawns fresh interpreters, so each worker loads its own copy of the
+embedding model and FAISS index. This launcher imports the app once in the parent, freezes
+the GC so collections do not touch (and un-share) the loaded objects, then forks workers
+that inherit those pages copy-on-write and serve on one shared listening socket.
+
+Usage:
+    python -m services.llm_service.app.serve --workers 4 --port 8001
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+from typing import List, Optional
+
+import uvicorn
+
+from .config import LLM_WORKERS
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str) -> None:
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=LLM_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        print("serve.py needs os.fork; use uvicorn directly on this platform.", file=sys.stderr)
+        return 2
+
+    # Tokenizer thread pools created before fork deadlock in children.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    # Load model weights and the index once, in the parent.
+    from .main import app
+
+    gc.collect()
+    gc.freeze()  # move everything loaded so far out of GC tracking -> pages stay shared
+
+    sock = _bind(args.host, args.port)
+    children: List[int] = []
+    for _ in range(max(1, args.workers)):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            _run_worker(app, sock, args.log_level)
+            os._exit(0)
+        children.append(pid)
+    print(
+        f"LLM service parent {os.getpid()} serving on {args.host}:{args.port} "
+        f"with workers {children}",
+        flush=True,
+    )
+
+    def _forward(signum, _frame):
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _forward)
+    signal.signal(signal.SIGTERM, _forward)
+
+    exit_code = 0
+    for pid in children:
+        _, status = os.waitpid(pid, 0)
+        exit_code = exit_code or os.waitstatus_to_exitcode(status)
+    sock.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,3 +2,59 @@
 LLM_SERVICE_URL: str = "http://localhost:8001"
 DATA_SERVICE_URL: str = "http://localhost:8002"
 HTTP_TIMEOUT_SECONDS: float = 60.0
+# Rows requested per data-service list call (first page only; the rest is pasted into prompts)
+DATA_PAGE_SIZE: int = 20
+
+# Read-through cache for data-service lookups: resource -> (fresh TTL, stale-while-revalidate
+# window), in seconds. Gateway-initiated order updates invalidate "pending_orders".
+CACHE_TTLS: dict = {
+    "trips": (300.0, 600.0),
+    "pending_orders": (10.0, 30.0),
+}
+CACHE_MAX_ENTRIES: int = 1024
+
+# Follow the data service change feed (GET /changes) to invalidate cached lookups as soon as
+# orders change; CACHE_TTLS then only bound staleness while the feed is unreachable.
+CHANGE_FEED_ENABLED: bool = True
+CHANGE_FEED_WAIT_SECONDS: float = 25.0
+
+# /intents/plan actions: timeout per action (seconds), "default" for the others. Several
+# actions from one utterance run concurrently, each under its own timeout.
+ACTION_TIMEOUTS: dict = {
+    "default": 30.0,
+    "get_trips": 10.0,
+    "get_pending_orders": 10.0,
+    "update_ticket_time": 45.0,  # may fall back to the LLM agent
+}
+
+# Conversation sessions (pending action + collected args between clarification turns)
+SESSION_BACKEND: str = "memory"  # "memory" | "sqlite"
+SESSION_TTL_SECONDS: float = 900.0
+SESSION_SQLITE_PATH: str = "gateway_sessions.sqlite3"
+
+# Voice input (whisper-timestamped + pydub). Decoding and transcription run in a process pool
+# whose workers load VOICE_MODEL once; audio is transcribed in VOICE_CHUNK_SECONDS chunks and
+# each partial transcript starts a speculative planner call. A plan is reused for the final
+# transcript when the remaining audio added at most VOICE_SPECULATION_MAX_TAIL_WORDS words
+# and no slot values.
+VOICE_MODEL: str = "small"
+VOICE_DEVICE: str = "cpu"
+VOICE_LANGUAGE: str = "vi"
+VOICE_WORKERS: int = 2
+VOICE_THREADS_PER_WORKER: int = 2
+VOICE_CHUNK_SECONDS: float = 10.0
+VOICE_MAX_SECONDS: float = 120.0
+VOICE_MAX_BYTES: int = 10 * 1024 * 1024
+VOICE_SPECULATION_MAX_TAIL_WORDS: int = 3
+
+# Image input (OpenCV + pytesseract in a process pool). Screenshots are downscaled to
+# OCR_MAX_SIDE, grayscaled and binarised before OCR; results are cached by content hash so a
+# repeated screenshot skips OCR.
+OCR_WORKERS: int = 2
+OCR_MAX_SIDE: int = 1600
+OCR_MAX_BYTES: int = 8 * 1024 * 1024
+OCR_LANGUAGE: str = "vie+eng"
+OCR_TESSERACT_CONFIG: str = "--oem 1 --psm 6"
+OCR_CACHE_TTL_SECONDS: float = 3600.0
+OCR_CACHE_MAX_ENTRIES: int = 512
+OCR_PROMPT_MAX_CHARS: int = 400  # OCR text passed to the planner when no slots were found
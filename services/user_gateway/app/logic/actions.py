@@ -0,0 +1,234 @@
+"""Action registry for ``/intents/plan``.
+
+Every action the planner may name is declared once, at import: its handler, required and
+optional arguments, argument aliases (``new_time`` -> ``new_time_iso``), defaults taken from
+the request, the intent it serves when the planner gives no action, and the Vietnamese
+clarification asked when arguments are missing. ``resolve`` turns a plan into
+``ActionCall``s (a plan may list several independent ``actions``) and ``run_calls`` executes
+them concurrently, each under its own timeout.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from ....common import tracing
+from ....common.serialization import json_body
+from ..config import (
+    ACTION_TIMEOUTS,
+    DATA_PAGE_SIZE,
+    DATA_SERVICE_URL,
+    HTTP_TIMEOUT_SECONDS,
+    LLM_SERVICE_URL,
+)
+from ..schemas.gateway import UserRequest
+from .cache import cached_get_json, data_cache
+
+
+@dataclass
+class ActionContext:
+    """Per-request state shared by the handlers of one plan."""
+
+    req: UserRequest
+    intent: str = "unknown"
+    llm_calls: int = 0  # LLM round trips made by handlers
+
+
+Handler = Callable[[Dict[str, Any], ActionContext], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    name: str
+    handler: Handler
+    required: Tuple[str, ...] = ()
+    optional: Tuple[str, ...] = ()
+    aliases: Dict[str, str] = field(default_factory=dict)  # alias -> argument
+    request_defaults: Dict[str, str] = field(default_factory=dict)  # argument -> request field
+    ocr_args: Tuple[str, ...] = ()  # arguments a screenshot may fill
+    intent: Optional[str] = None  # planner intent served when the plan names no action
+    clarification: str = "Thiếu thông tin cần thiết: {missing}."
+
+    @property
+    def timeout(self) -> float:
+        return ACTION_TIMEOUTS.get(self.name, ACTION_TIMEOUTS["default"])
+
+    def normalise(self, args: Dict[str, Any], req: UserRequest) -> Dict[str, Any]:
+        """Rename aliases, drop undeclared arguments and fill empty ones from the request."""
+        out = dict(args)
+        for alias, name in self.aliases.items():
+            if alias in out:
+                value = out.pop(alias)
+                if not out.get(name):
+                    out[name] = value
+        declared = self.required + self.optional
+        out = {k: v for k, v in out.items() if k in declared}
+        for name, attr in self.request_defaults.items():
+            if not out.get(name):
+                out[name] = getattr(req, attr, None)
+        return out
+
+    def missing(self, args: Dict[str, Any]) -> List[str]:
+        return [k for k in self.required if not args.get(k)]
+
+    def message(self, missing: List[str]) -> str:
+        return self.clarification.format(missing=", ".join(missing))
+
+
+ACTIONS: Dict[str, ActionSpec] = {}
+INTENT_ACTIONS: Dict[str, str] = {}
+
+
+def action(name: str, **declaration) -> Callable[[Handler], Handler]:
+    """Register ``handler`` as action ``name`` (see ``ActionSpec`` for the fields)."""
+
+    def register(handler: Handler) -> Handler:
+        spec = ActionSpec(name, handler, **declaration)
+        ACTIONS[name] = spec
+        if spec.intent:
+            INTENT_ACTIONS[spec.intent] = name
+        return handler
+
+    return register
+
+
+@action(
+    "update_ticket_time",
+    required=("order_id", "new_time_iso"),
+    aliases={"new_time": "new_time_iso"},
+    ocr_args=("order_id",),  # a ticket's time is its current departure, not the new one
+    intent="change_time",
+    clarification=(
+        "Vui lòng cung cấp đầy đủ thông tin để đổi giờ vé: {missing}. "
+        "Ví dụ: 'Đổi vé order 123 sang 2025-09-15T10:00:00'."
+    ),
+)
+async def update_ticket_time(args: Dict[str, Any], ctx: ActionContext) -> Any:
+    order_id, new_time_iso = args.get("order_id"), args.get("new_time_iso")
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
+        if order_id is None or not new_time_iso:
+            # Fallback: let the LLM agent extract the arguments from the text
+            ctx.llm_calls += 1
+            rr = await client.post(
+                f"{LLM_SERVICE_URL}/agent/change_time", json={"question": ctx.req.text}
+            )
+            # The agent may have updated an order through its tool.
+            data_cache.invalidate("pending_orders")
+            if rr.headers.get("content-type", "").startswith("application/json"):
+                return rr.json()
+            return {"raw": rr.text}
+        rr = await client.post(
+            f"{DATA_SERVICE_URL}/orders/update_time",
+            **json_body({"order_id": order_id, "new_time": new_time_iso}),
+        )
+        if rr.status_code != 200:
+            raise HTTPException(status_code=rr.status_code, detail=rr.text)
+        data_cache.invalidate("pending_orders")
+        return rr.json()
+
+
+@action(
+    "get_trips",
+    required=("route_id",),
+    aliases={"route": "route_id"},
+    ocr_args=("route_id",),
+    intent="get_trips",
+    clarification="Vui lòng cung cấp route_id (ví dụ: HCM-HN).",
+)
+async def get_trips(args: Dict[str, Any], ctx: ActionContext) -> Any:
+    return await cached_get_json(
+        "trips",
+        f"{DATA_SERVICE_URL}/trips/{args['route_id']}",
+        params={"limit": DATA_PAGE_SIZE},
+    )
+
+
+@action(
+    "get_pending_orders",
+    required=("user_id",),
+    request_defaults={"user_id": "user_id"},
+    intent="get_pending_orders",
+    clarification="Vui lòng cung cấp user_id hoặc đăng nhập.",
+)
+async def get_pending_orders(args: Dict[str, Any], ctx: ActionContext) -> Any:
+    return await cached_get_json(
+        "pending_orders",
+        f"{DATA_SERVICE_URL}/orders/{args['user_id']}/pending",
+        params={"limit": DATA_PAGE_SIZE},
+    )
+
+
+@action("faq", optional=("question",), request_defaults={"question": "text"}, intent="faq")
+async def faq(args: Dict[str, Any], ctx: ActionContext) -> Any:
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
+        rr = await client.post(f"{LLM_SERVICE_URL}/faq/ask", json={"question": args["question"]})
+        if rr.status_code != 200:
+            raise HTTPException(status_code=rr.status_code, detail=rr.text)
+        data = rr.json()
+    if not data.get("extractive"):  # near-exact matches are answered without the LLM
+        ctx.llm_calls += 1
+    return data
+
+
+@dataclass
+class ActionCall:
+    name: str
+    args: Dict[str, Any]
+
+    @property
+    def spec(self) -> Optional[ActionSpec]:
+        return ACTIONS.get(self.name)
+
+    @property
+    def missing(self) -> List[str]:
+        return self.spec.missing(self.args) if self.spec else []
+
+
+def resolve(plan: Dict[str, Any], req: UserRequest) -> List[ActionCall]:
+    """The plan's actions (``actions``, else ``action``, else the intent's default action)
+    with normalised arguments; duplicates are dropped."""
+    raw = [a for a in plan.get("actions") or [] if isinstance(a, dict) and a.get("name")]
+    if not raw and isinstance(plan.get("action"), dict) and plan["action"].get("name"):
+        raw = [plan["action"]]
+    if not raw and plan.get("intent") in INTENT_ACTIONS:
+        raw = [{"name": INTENT_ACTIONS[plan["intent"]], "args": plan.get("slots") or {}}]
+    calls: List[ActionCall] = []
+    for item in raw:
+        name, args = str(item["name"]), item.get("args") or {}
+        spec = ACTIONS.get(name)
+        call = ActionCall(name, spec.normalise(args, req) if spec else dict(args))
+        if call not in calls:
+            calls.append(call)
+    return calls
+
+
+async def run_call(call: ActionCall, ctx: ActionContext) -> Any:
+    spec = call.spec
+    with tracing.span(f"action.{call.name}", intent=ctx.intent):
+        try:
+            return await asyncio.wait_for(spec.handler(call.args, ctx), spec.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504, detail=f"Action '{call.name}' timed out after {spec.timeout}s"
+            )
+
+
+async def run_calls(calls: List[ActionCall], ctx: ActionContext) -> List[Dict[str, Any]]:
+    """Run independent calls concurrently; a failed call is reported, not raised."""
+
+    async def one(call: ActionCall) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"action": call.name, "args": call.args}
+        if call.spec is None:
+            return {**entry, "error": f"No handler for action '{call.name}'", "status_code": 400}
+        try:
+            entry["result"] = await run_call(call, ctx)
+        except HTTPException as exc:
+            entry.update(error=exc.detail, status_code=exc.status_code)
+        except httpx.HTTPError as exc:
+            entry.update(error=f"{type(exc).__name__}: {exc}", status_code=502)
+        return entry
+
+    return list(await asyncio.gather(*(one(call) for call in calls)))
@@ -0,0 +1,152 @@
+"""Read-through cache for data-service lookups.
+
+Entries are fresh for a per-resource TTL, then served stale for a grace window while one
+background request revalidates them with ``If-None-Match``; a 304 only extends the entry.
+Concurrent misses for the same key share one upstream request.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from ..config import CACHE_MAX_ENTRIES, CACHE_TTLS, HTTP_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+NOT_MODIFIED = object()
+
+# loader(etag) -> (value | NOT_MODIFIED, etag)
+Loader = Callable[[Optional[str]], Awaitable[Tuple[Any, Optional[str]]]]
+
+
+@dataclass
+class CacheEntry:
+    resource: str
+    value: Any
+    etag: Optional[str]
+    fresh_until: float
+    stale_until: float
+
+
+class ReadThroughCache:
+    def __init__(
+        self,
+        ttls: Dict[str, Tuple[float, float]],
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: set = set()
+        self.stats = {"hit": 0, "stale": 0, "miss": 0, "not_modified": 0, "invalidated": 0}
+
+    async def get(self, resource: str, key: str, loader: Loader) -> Any:
+        entry = self._entries.get(key)
+        now = self.clock()
+        if entry is not None and now < entry.fresh_until:
+            self.stats["hit"] += 1
+            self._entries.move_to_end(key)
+            return entry.value
+        if entry is not None and now < entry.stale_until:
+            self.stats["stale"] += 1
+            if key not in self._inflight:
+                task = asyncio.create_task(self._revalidate(resource, key, loader))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return entry.value
+        self.stats["miss"] += 1
+        return await self._load(resource, key, loader)
+
+    async def _revalidate(self, resource: str, key: str, loader: Loader) -> None:
+        try:
+            await self._load(resource, key, loader)
+        except Exception as exc:  # keep serving the stale value
+            logger.warning("cache revalidation failed for %s: %s", key, exc)
+
+    async def _load(self, resource: str, key: str, loader: Loader) -> Any:
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = self._entries.get(key)
+            value, etag = await loader(entry.etag if entry is not None else None)
+            if value is NOT_MODIFIED and entry is not None:
+                self.stats["not_modified"] += 1
+                value, etag = entry.value, entry.etag
+            # An invalidation while the request was in flight makes this result suspect.
+            if self._inflight.get(key) is future:
+                self._store(resource, key, value, etag)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved; waiters re-raise it themselves
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _store(self, resource: str, key: str, value: Any, etag: Optional[str]) -> None:
+        ttl, stale = self.ttls.get(resource, (0.0, 0.0))
+        now = self.clock()
+        self._entries[key] = CacheEntry(resource, value, etag, now + ttl, now + ttl + stale)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(
+        self, resource: Optional[str] = None, key: Optional[str] = None, prefix: str = ""
+    ) -> None:
+        """Drop one key, every key of a resource (optionally narrowed to keys starting with
+        ``prefix``), or (no arguments) everything.
+
+        In-flight loads for dropped keys are detached so their results are not stored.
+        """
+        if key is not None:
+            doomed = {key}
+        else:
+            start = f"{resource}|{prefix}" if resource else prefix
+            doomed = {k for k in [*self._entries, *self._inflight] if k.startswith(start)}
+        for k in doomed:
+            if self._entries.pop(k, None) is not None:
+                self.stats["invalidated"] += 1
+            self._inflight.pop(k, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+
+data_cache = ReadThroughCache(CACHE_TTLS, max_entries=CACHE_MAX_ENTRIES)
+
+
+async def cached_get_json(resource: str, url: str, params: Optional[Dict[str, Any]] = None):
+    """GET ``url`` from the data service through ``data_cache``; non-2xx -> HTTPException."""
+    # "<resource>|<url>|..." lets invalidate(resource, prefix=url) target one URL's pages.
+    key = f"{resource}|{url}|{sorted((params or {}).items())}"
+
+    async def load(etag: Optional[str]):
+        headers = {"If-None-Match": etag} if etag else None
+        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
+            rr = await client.get(url, params=params, headers=headers)
+        if rr.status_code == 304:
+            return NOT_MODIFIED, etag
+        if rr.status_code != 200:
+            raise HTTPException(status_code=rr.status_code, detail=rr.text)
+        return rr.json(), rr.headers.get("etag")
+
+    return await data_cache.get(resource, key, load)
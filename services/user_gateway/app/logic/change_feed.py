@@ -0,0 +1,56 @@
+"""Follow the data service change feed and invalidate cached lookups precisely.
+
+Long-polls ``GET /changes`` from the last sequence seen. Order changes drop only the
+affected user's pending-orders pages; a ``reset`` (missed changes or a data-service
+restart) drops the whole cache.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+import httpx
+
+from ..config import CHANGE_FEED_WAIT_SECONDS, DATA_SERVICE_URL, HTTP_TIMEOUT_SECONDS
+from .cache import data_cache
+
+logger = logging.getLogger(__name__)
+
+
+def apply_changes(changes: List[Dict[str, Any]], reset: bool) -> None:
+    if reset:
+        data_cache.invalidate()
+        return
+    for change in changes:
+        op, data = change.get("op", ""), change.get("data") or {}
+        if op.startswith("order."):
+            user_id = data.get("user_id")
+            if user_id is None:
+                data_cache.invalidate("pending_orders")
+            else:
+                url = f"{DATA_SERVICE_URL}/orders/{user_id}/pending"
+                data_cache.invalidate("pending_orders", prefix=f"{url}|")
+        elif op.startswith("trip."):
+            data_cache.invalidate("trips")
+
+
+async def follow_changes() -> None:
+    """Run until cancelled; reconnects with exponential backoff on errors."""
+    since, backoff = 0, 1.0
+    params: Dict[str, Any] = {"limit": 500, "wait": CHANGE_FEED_WAIT_SECONDS}
+    async with httpx.AsyncClient(timeout=CHANGE_FEED_WAIT_SECONDS + HTTP_TIMEOUT_SECONDS) as client:
+        while True:
+            try:
+                r = await client.get(
+                    f"{DATA_SERVICE_URL}/changes", params={**params, "since": since}
+                )
+                r.raise_for_status()
+                payload = r.json()
+            except Exception as exc:
+                logger.warning("change feed unavailable (%s); retrying in %.0fs", exc, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            backoff = 1.0
+            apply_changes(payload.get("changes", []), bool(payload.get("reset")))
+            since = payload.get("next_since", since)
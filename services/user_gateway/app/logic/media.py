@@ -0,0 +1,46 @@
+"""Fetching of user-supplied media (voice, images) referenced by ``UserRequest``."""
+
+import base64
+
+import httpx
+from fastapi import HTTPException
+
+from ..config import HTTP_TIMEOUT_SECONDS
+
+
+async def load_bytes(source: str, max_bytes: int, kind: str) -> bytes:
+    """Bytes from a ``data:`` URI (base64) or an http(s) URL; 400/413 on bad input."""
+    if source.startswith("data:"):
+        if len(source) > max_bytes * 4 // 3 + 1024:  # base64 inflates by 4/3
+            raise HTTPException(status_code=413, detail=f"{kind} payload too large")
+        try:
+            data = base64.b64decode(source.split(",", 1)[1], validate=True)
+        except (IndexError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid base64 {kind} data URI")
+    elif source.startswith(("http://", "https://")):
+        data = await _fetch(source, max_bytes, kind)
+    else:
+        raise HTTPException(status_code=400, detail=f"{kind} must be an http(s) URL or data URI")
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"{kind} payload too large")
+    return data
+
+
+async def _fetch(url: str, max_bytes: int, kind: str) -> bytes:
+    """Download ``url``, giving up (413) as soon as it is known to exceed ``max_bytes``."""
+    too_large = HTTPException(status_code=413, detail=f"{kind} payload too large")
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
+        async with client.stream("GET", url) as r:
+            if r.status_code != 200:
+                raise HTTPException(
+                    status_code=400, detail=f"Cannot fetch {kind}: HTTP {r.status_code}"
+                )
+            length = r.headers.get("content-length", "")
+            if length.isdigit() and int(length) > max_bytes:
+                raise too_large
+            data = bytearray()
+            async for chunk in r.aiter_bytes():
+                data += chunk
+                if len(data) > max_bytes:
+                    raise too_large
+            return bytes(data)
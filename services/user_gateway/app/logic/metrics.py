@@ -0,0 +1,38 @@
+"""In-process gateway counters, served at GET /metrics."""
+
+from collections import Counter
+from typing import Any, Dict
+
+counters: Counter = Counter()
+gauges: Dict[str, float] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    counters[name] += value
+
+
+def gauge(name: str, value: float) -> None:
+    gauges[name] = value
+
+
+def record_task(llm_calls: int) -> None:
+    """A user task finished (action executed); ``llm_calls`` LLM round trips it took."""
+    counters["tasks_completed"] += 1
+    counters["task_llm_calls"] += llm_calls
+
+
+def snapshot() -> Dict[str, Any]:
+    data: Dict[str, Any] = dict(counters)
+    tasks = counters["tasks_completed"]
+    data["llm_calls_per_task"] = counters["task_llm_calls"] / tasks if tasks else 0.0
+    data.update(gauges)
+    if counters["voice_audio_seconds"]:
+        # Real-time factor: transcription compute (and end-to-end time) per second of audio.
+        audio = counters["voice_audio_seconds"]
+        data["voice_rtf"] = counters["voice_processing_seconds"] / audio
+        data["voice_wall_rtf"] = counters["voice_wall_seconds"] / audio
+    if counters["voice_chunks"]:
+        data["voice_queue_wait_avg_s"] = (
+            counters["voice_queue_wait_seconds"] / counters["voice_chunks"]
+        )
+    return data
@@ -0,0 +1,175 @@
+"""Image input: OCR of ticket screenshots in a process pool, cached by content hash.
+
+Workers decode the image with OpenCV, downscale it to at most ``OCR_MAX_SIDE`` pixels,
+convert it to grayscale and binarise it (Otsu) before running tesseract. Results are kept in
+a ``ReadThroughCache`` keyed by the SHA-256 of the image bytes, so a screenshot sent again
+(or concurrently) is only read once. Order ids, times and routes found in the text are
+returned as planner slots.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ....common import tracing
+from ..config import (
+    OCR_CACHE_MAX_ENTRIES,
+    OCR_CACHE_TTL_SECONDS,
+    OCR_LANGUAGE,
+    OCR_MAX_BYTES,
+    OCR_MAX_SIDE,
+    OCR_PROMPT_MAX_CHARS,
+    OCR_TESSERACT_CONFIG,
+    OCR_WORKERS,
+)
+from . import metrics
+from .cache import ReadThroughCache
+from .media import load_bytes
+from .slots import extract_slots
+
+
+def _init_worker() -> None:
+    import cv2
+
+    # One thread each for OpenCV and tesseract; parallelism comes from the pool.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    cv2.setNumThreads(1)
+
+
+def normalise_image(image, max_side: int = OCR_MAX_SIDE):
+    """Downscale to ``max_side``, grayscale and binarise (dark text on white)."""
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if binary.mean() < 127:  # dark-mode screenshot: light text on a dark background
+        binary = 255 - binary
+    return binary
+
+
+def ocr_image(data: bytes, submitted_at: float) -> Tuple[str, Dict[str, float]]:
+    """Run in a pool worker; returns (text, per-stage seconds)."""
+    import cv2
+    import numpy as np
+    import pytesseract
+
+    started = time.time()
+    timings = {"queue": started - submitted_at}
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("not a decodable image")
+    decoded = time.time()
+    timings["decode"] = decoded - started
+    binary = normalise_image(image)
+    normalised = time.time()
+    timings["normalise"] = normalised - decoded
+    text = pytesseract.image_to_string(binary, lang=OCR_LANGUAGE, config=OCR_TESSERACT_CONFIG)
+    timings["ocr"] = time.time() - normalised
+    return text.strip(), timings
+
+
+def _default_executor() -> Executor:
+    return ProcessPoolExecutor(
+        max_workers=OCR_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+
+
+@dataclass
+class OCRResult:
+    text: str
+    slots: Dict[str, Any]
+    cached: bool
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    def meta(self) -> Dict[str, Any]:
+        return {"slots": self.slots, "cached": self.cached, "timings_ms": self.timings_ms}
+
+
+class OCRPipeline:
+    def __init__(
+        self,
+        executor_factory: Callable[[], Executor] = _default_executor,
+        run: Callable[[bytes, float], Tuple[str, Dict[str, float]]] = ocr_image,
+        cache: Optional[ReadThroughCache] = None,
+    ):
+        self.executor_factory = executor_factory
+        self.run = run
+        self.cache = cache or ReadThroughCache(
+            {"ocr": (OCR_CACHE_TTL_SECONDS, 0.0)}, max_entries=OCR_CACHE_MAX_ENTRIES
+        )
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:  # started on first use, not at import
+            self._executor = self.executor_factory()
+        return self._executor
+
+    async def extract(self, data: bytes) -> OCRResult:
+        start = time.perf_counter()
+        digest = hashlib.sha256(data).hexdigest()
+        timings = {"hash": time.perf_counter() - start}
+        ran = False
+
+        async def loader(_etag):
+            nonlocal ran
+            ran = True
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.run, data, time.time()), None
+
+        with tracing.span("ocr.extract", bytes=len(data)) as span:
+            try:
+                text, stages = await self.cache.get("ocr", f"ocr|{digest}", loader)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=f"Unreadable image: {exc}")
+            span.set_attribute("cached", not ran)
+        if ran:
+            timings.update(stages)
+        timings["total"] = time.perf_counter() - start
+
+        metrics.incr("ocr_requests")
+        metrics.incr("ocr_cache_hits" if not ran else "ocr_cache_misses")
+        for stage, seconds in timings.items():
+            metrics.incr(f"ocr_{stage}_seconds", seconds)
+        timings_ms = {k: round(v * 1000, 2) for k, v in timings.items()}
+        return OCRResult(text, extract_slots(text), cached=not ran, timings_ms=timings_ms)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+ocr_pipeline = OCRPipeline()
+
+
+async def load_image(source: str) -> bytes:
+    return await load_bytes(source, OCR_MAX_BYTES, "image")
+
+
+# Slot names in the hint: a ticket's time is its current departure, not a requested new time.
+HINT_LABELS = {"new_time_iso": "giờ khởi hành hiện tại"}
+
+
+def image_hint(result: OCRResult) -> str:
+    """Planner input describing the screenshot: its slots, else the start of its text."""
+    if result.slots:
+        found = ", ".join(f"{HINT_LABELS.get(k, k)}={v}" for k, v in result.slots.items())
+        return f"[Thông tin từ ảnh: {found}]"
+    if result.text:
+        return f"[Nội dung ảnh: {result.text[:OCR_PROMPT_MAX_CHARS]}]"
+    return ""
@@ -1,8 +1,7 @@
 from typing import Any, Optional, Tuple
 
-import httpx
-
-from ..config import DATA_SERVICE_URL, HTTP_TIMEOUT_SECONDS
+from ..config import DATA_PAGE_SIZE, DATA_SERVICE_URL
+from .cache import cached_get_json
 
 
 def detect_intent(text: str, user_id: Optional[int]) -> Tuple[Optional[str], Optional[str]]:
@@ -20,13 +19,14 @@ async def fetch_data(
 ) -> Optional[Any]:
     if not intent:
         return None
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-        if intent == "get_pending_orders" and user_id is not None:
-            r = await client.get(f"{DATA_SERVICE_URL}/orders/{user_id}/pending")
-            r.raise_for_status()
-            return r.json()
-        if intent == "get_trips" and extra:
-            r = await client.get(f"{DATA_SERVICE_URL}/trips/{extra}")
-            r.raise_for_status()
-            return r.json()
+    if intent == "get_pending_orders" and user_id is not None:
+        return await cached_get_json(
+            "pending_orders",
+            f"{DATA_SERVICE_URL}/orders/{user_id}/pending",
+            params={"limit": DATA_PAGE_SIZE},
+        )
+    if intent == "get_trips" and extra:
+        return await cached_get_json(
+            "trips", f"{DATA_SERVICE_URL}/trips/{extra}", params={"limit": DATA_PAGE_SIZE}
+        )
     return None
@@ -0,0 +1,123 @@
+"""Conversation sessions for multi-turn clarification.
+
+When ``plan`` asks the user for missing arguments, the pending action and the arguments
+gathered so far are stored under the conversation id, so the follow-up can be completed
+locally (see ``slots.extract_slots``) instead of re-planning with the LLM. Request handlers
+use the async ``load``/``save``/``discard``, which keep the SQLite store's blocking calls off
+the event loop.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..config import SESSION_BACKEND, SESSION_SQLITE_PATH, SESSION_TTL_SECONDS
+
+
+@dataclass
+class Session:
+    conversation_id: str
+    intent: str
+    pending_action: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    llm_calls: int = 0  # LLM round trips spent on this task so far
+
+
+class MemorySessionStore:
+    blocking = False
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._items: Dict[str, tuple] = {}
+
+    def get(self, conversation_id: str) -> Optional[Session]:
+        item = self._items.get(conversation_id)
+        if item is None:
+            return None
+        expires_at, session = item
+        if self.clock() >= expires_at:
+            del self._items[conversation_id]
+            return None
+        return session
+
+    def put(self, session: Session) -> None:
+        self._purge()
+        self._items[session.conversation_id] = (self.clock() + self.ttl, session)
+
+    def delete(self, conversation_id: str) -> None:
+        self._items.pop(conversation_id, None)
+
+    def _purge(self) -> None:
+        now = self.clock()
+        for key in [k for k, (exp, _) in self._items.items() if now >= exp]:
+            del self._items[key]
+
+
+class SQLiteSessionStore:
+    """Durable variant (survives restarts, shareable by workers on one host)."""
+
+    blocking = True  # sqlite3 calls; run off the event loop
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL_SECONDS, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, conversation_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM sessions WHERE id = ? AND expires_at > ?",
+                (conversation_id, self.clock()),
+            ).fetchone()
+        return Session(**json.loads(row[0])) if row else None
+
+    def put(self, session: Session) -> None:
+        now = self.clock()
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, payload, expires_at) VALUES (?, ?, ?)",
+                (session.conversation_id, json.dumps(asdict(session)), now + self.ttl),
+            )
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (conversation_id,))
+
+
+def create_session_store():
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(SESSION_SQLITE_PATH)
+    return MemorySessionStore()
+
+
+sessions = create_session_store()
+
+
+async def _call(fn, *args):
+    return await run_in_threadpool(fn, *args) if sessions.blocking else fn(*args)
+
+
+async def load(conversation_id: str) -> Optional[Session]:
+    return await _call(sessions.get, conversation_id)
+
+
+async def save(session: Session) -> None:
+    await _call(sessions.put, session)
+
+
+async def discard(conversation_id: str) -> None:
+    await _call(sessions.delete, conversation_id)
@@ -0,0 +1,110 @@
+"""Rule-based slot extraction for short follow-up messages.
+
+Used to complete a pending action from replies such as "order 123, 10h sáng mai" without
+another planner round trip. Only fills what it recognises confidently; anything else is
+left to the LLM planner.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+ORDER_ID_RE = re.compile(
+    r"(?:order|đơn(?:\s*hàng)?|mã(?:\s*đơn)?|vé|booking)\s*(?:số|id|:)?\s*#?(\d{1,12})\b"
+    r"|#(\d{1,12})\b",
+    re.IGNORECASE,
+)
+ISO_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})[T ](\d{1,2}):(\d{2})(?::(\d{2}))?\b")
+# The unit must end the word ("2h", "10h30", "7 giờ"), so "2 hành khách" is not 02:00.
+TIME_RE = re.compile(
+    r"\b([01]?\d|2[0-3])\s*(?:h(?![^\W\d_])|giờ\b|:)\s*([0-5]?\d)?\s*(?:phút\b|p\b)?"
+    r"(?:\s*(sáng|trưa|chiều|tối|đêm)\b)?",
+    re.IGNORECASE,
+)
+DATE_RE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{4}))?\b")
+RELATIVE_DAY_RE = re.compile(r"\b(ngày kia|ngày mốt|mốt|ngày mai|mai|hôm nay|nay)\b", re.I)
+RELATIVE_DAYS = {"ngày kia": 2, "ngày mốt": 2, "mốt": 2, "ngày mai": 1, "mai": 1}
+ROUTE_RE = re.compile(r"\b([A-Z]{2,3})\s*-\s*([A-Z]{2,3})\b")
+BARE_NUMBER_RE = re.compile(r"^\s*#?(\d{1,12})\s*\.?\s*$")
+
+
+def _hour_24(hour: int, period: Optional[str]) -> int:
+    period = (period or "").lower()
+    if period == "đêm" and (hour == 12 or hour < 5):
+        return hour % 12  # "12h đêm" is midnight, "2h đêm" is 02:00
+    if period in ("chiều", "tối", "đêm") and hour < 12:
+        return hour + 12
+    if period == "trưa" and hour < 11:
+        return hour + 12
+    return hour
+
+
+def extract_time(text: str, now: datetime) -> Optional[str]:
+    """ISO-8601 datetime from an ISO literal or Vietnamese time/date phrases."""
+    iso = ISO_RE.search(text)
+    if iso:
+        y, mo, d, h, mi, s = (int(g) if g else 0 for g in iso.groups())
+        try:
+            return datetime(y, mo, d, h, mi, s).isoformat()
+        except ValueError:
+            return None
+
+    time_match = TIME_RE.search(text)
+    if not time_match:
+        return None
+    hour = _hour_24(int(time_match.group(1)), time_match.group(3))
+    minute = int(time_match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return None
+
+    rest = text[: time_match.start()] + " " + text[time_match.end() :]
+    date_match = DATE_RE.search(rest)
+    relative = RELATIVE_DAY_RE.search(rest)
+    try:
+        if date_match:
+            day, month = int(date_match.group(1)), int(date_match.group(2))
+            year = int(date_match.group(3) or now.year)
+            target = datetime(year, month, day, hour, minute)
+        else:
+            offset = RELATIVE_DAYS.get(relative.group(1).lower(), 0) if relative else 0
+            base = now + timedelta(days=offset)
+            target = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if relative is None and target <= now:
+                target += timedelta(days=1)  # a bare time that already passed means tomorrow
+    except ValueError:
+        return None
+    return target.isoformat()
+
+
+def extract_slots(
+    text: str, expected: Iterable[str] = (), now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Return the slots found in ``text`` keyed like planner action args.
+
+    ``expected`` names the slots still missing; a reply that is just a number fills
+    ``order_id`` when that is what we asked for.
+    """
+    now = now or datetime.now()
+    expected = set(expected)
+    slots: Dict[str, Any] = {}
+
+    order = ORDER_ID_RE.search(text)
+    if order:
+        slots["order_id"] = int(order.group(1) or order.group(2))
+    elif "order_id" in expected:
+        bare = BARE_NUMBER_RE.match(text)
+        if bare:
+            slots["order_id"] = int(bare.group(1))
+
+    # Drop the order id so "order 12 lúc 10h" cannot read "12" as a date or an hour.
+    time_text = ORDER_ID_RE.sub(" ", text) if order else text
+    if "order_id" in slots and BARE_NUMBER_RE.match(text):
+        time_text = ""
+    new_time = extract_time(time_text, now)
+    if new_time:
+        slots["new_time_iso"] = new_time
+
+    route = ROUTE_RE.search(text)
+    if route:
+        slots["route_id"] = f"{route.group(1)}-{route.group(2)}"
+    return slots
@@ -0,0 +1,218 @@
+"""Voice input: chunked transcription in a process pool with speculative planning.
+
+Each pool worker loads the whisper model once (``_init_worker``). Audio is decoded with
+pydub and split into ``VOICE_CHUNK_SECONDS`` chunks that are resampled to 16 kHz mono one at
+a time; chunks are then transcribed in order, each with the text so far as its prompt, so
+``VoiceTranscriber.stream`` yields a growing transcript. ``transcribe_and_plan`` starts a
+planner call on every partial transcript, and reuses the last one when the final audio only
+added filler words, so planning overlaps transcription instead of waiting for it.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ....common import tracing
+from ..config import (
+    VOICE_CHUNK_SECONDS,
+    VOICE_DEVICE,
+    VOICE_LANGUAGE,
+    VOICE_MAX_BYTES,
+    VOICE_MAX_SECONDS,
+    VOICE_MODEL,
+    VOICE_SPECULATION_MAX_TAIL_WORDS,
+    VOICE_THREADS_PER_WORKER,
+    VOICE_WORKERS,
+)
+from . import metrics
+from .media import load_bytes
+from .slots import extract_slots
+
+SAMPLE_RATE = 16000
+
+_model = None  # per worker process
+
+
+def _init_worker(model_name: str, device: str, threads: int) -> None:
+    global _model
+    import torch
+    import whisper_timestamped
+
+    torch.set_num_threads(threads)  # workers share the cores instead of oversubscribing
+    _model = whisper_timestamped.load_model(model_name, device=device)
+
+
+def decode_audio(data: bytes, chunk_seconds: float) -> Tuple[List[bytes], float]:
+    """Split encoded audio into 16 kHz mono int16 PCM chunks; returns (chunks, seconds)."""
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(io.BytesIO(data))
+    chunk_ms = int(chunk_seconds * 1000)
+    chunks = []
+    for start in range(0, len(segment), chunk_ms):
+        piece = segment[start : start + chunk_ms]
+        piece = piece.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+        chunks.append(piece.raw_data)
+    return chunks, len(segment) / 1000
+
+
+def transcribe_chunk(pcm: bytes, prompt: str, submitted_at: float) -> Tuple[str, float, float]:
+    """Transcribe one PCM chunk; returns (text, queue wait seconds, processing seconds)."""
+    import numpy as np
+    import whisper_timestamped
+
+    started = time.time()
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    result = whisper_timestamped.transcribe(
+        _model, audio, language=VOICE_LANGUAGE, initial_prompt=prompt or None
+    )
+    return result["text"].strip(), started - submitted_at, time.time() - started
+
+
+def _default_executor() -> Executor:
+    # spawn: forking the serving process (event loop, client threads) is not safe.
+    return ProcessPoolExecutor(
+        max_workers=VOICE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(VOICE_MODEL, VOICE_DEVICE, VOICE_THREADS_PER_WORKER),
+    )
+
+
+class VoiceTranscriber:
+    def __init__(
+        self,
+        executor_factory: Callable[[], Executor] = _default_executor,
+        decode: Callable = decode_audio,
+        transcribe: Callable = transcribe_chunk,
+        chunk_seconds: float = VOICE_CHUNK_SECONDS,
+    ):
+        self.executor_factory = executor_factory
+        self.decode = decode
+        self.transcribe = transcribe
+        self.chunk_seconds = chunk_seconds
+        self._executor: Optional[Executor] = None
+        self.queued = 0  # chunks submitted to the pool and not finished yet
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:  # started on first use, not at import
+            self._executor = self.executor_factory()
+        return self._executor
+
+    async def _submit(self, fn: Callable, *args) -> Any:
+        self.queued += 1
+        metrics.gauge("voice_queue_depth", self.queued)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.queued -= 1
+            metrics.gauge("voice_queue_depth", self.queued)
+
+    async def stream(self, data: bytes) -> AsyncIterator[str]:
+        """Yield the transcript so far after each chunk."""
+        start = time.perf_counter()
+        chunks, seconds = await self._submit(self.decode, data, self.chunk_seconds)
+        if seconds > VOICE_MAX_SECONDS:
+            raise HTTPException(status_code=413, detail=f"Audio longer than {VOICE_MAX_SECONDS}s")
+        metrics.incr("voice_requests")
+        metrics.incr("voice_audio_seconds", seconds)
+        text = ""
+        for pcm in chunks:
+            part, waited, busy = await self._submit(self.transcribe, pcm, text, time.time())
+            metrics.incr("voice_chunks")
+            metrics.incr("voice_queue_wait_seconds", waited)
+            metrics.incr("voice_processing_seconds", busy)
+            if part:
+                text = f"{text} {part}".strip()
+                yield text
+        metrics.incr("voice_wall_seconds", time.perf_counter() - start)
+
+    async def transcribe_all(self, data: bytes) -> str:
+        text = ""
+        with tracing.span("voice.transcribe"):
+            async for text in self.stream(data):
+                pass
+        return text
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+transcriber = VoiceTranscriber()
+
+
+async def load_audio(source: str) -> bytes:
+    return await load_bytes(source, VOICE_MAX_BYTES, "voice")
+
+
+def combine_text(text: str, transcript: str) -> str:
+    return f"{text.strip()} {transcript}".strip()
+
+
+def can_reuse_plan(planned_text: str, final_text: str) -> bool:
+    """Whether a plan made from ``planned_text`` still fits the final transcript."""
+    if final_text == planned_text:
+        return True
+    if not final_text.startswith(planned_text):
+        return False  # whisper revised earlier words
+    tail = final_text[len(planned_text) :]
+    return len(tail.split()) <= VOICE_SPECULATION_MAX_TAIL_WORDS and not extract_slots(tail)
+
+
+@dataclass
+class VoicePlan:
+    text: str  # request text plus final transcript
+    plan: Optional[Dict[str, Any]]  # speculative plan valid for ``text``, if any
+    planner_calls: int
+
+
+def _retrieve_outcome(task: asyncio.Task) -> None:
+    # Discarded speculative plans may have failed; reading the error keeps asyncio from
+    # logging "Task exception was never retrieved".
+    if not task.cancelled():
+        task.exception()
+
+
+async def transcribe_and_plan(
+    source: str,
+    text: str,
+    planner: Callable[[str], Awaitable[Dict[str, Any]]],
+    voice: Optional[VoiceTranscriber] = None,
+) -> VoicePlan:
+    """Transcribe ``source`` while planning speculatively on each partial transcript."""
+    voice = voice or transcriber
+    data = await load_audio(source)
+    speculative: Optional[Tuple[str, asyncio.Task]] = None
+    calls = 0
+    final = combine_text(text, "")
+    try:
+        with tracing.span("voice.transcribe_and_plan") as span:
+            async for transcript in voice.stream(data):
+                final = combine_text(text, transcript)
+                if speculative is not None:
+                    if can_reuse_plan(speculative[0], final):
+                        continue  # the running plan still fits; keep it
+                    speculative[1].cancel()
+                speculative = (final, asyncio.create_task(planner(final)))
+                speculative[1].add_done_callback(_retrieve_outcome)
+                calls += 1
+            hit = speculative is not None and can_reuse_plan(speculative[0], final)
+            span.attributes.update(planner_calls=calls, speculative_hit=hit)
+            if hit:
+                plan = await speculative[1]
+                metrics.incr("voice_speculative_hits")
+                return VoicePlan(final, plan, calls)
+        metrics.incr("voice_speculative_misses")
+        return VoicePlan(final, None, calls)
+    finally:
+        if speculative is not None and not speculative[1].done():
+            speculative[1].cancel()
@@ -1,11 +1,49 @@
+import asyncio
+import contextlib
+
 import httpx
 from fastapi import FastAPI
 
-from .config import DATA_SERVICE_URL, LLM_SERVICE_URL
+from ...common import profiling, tracing
+from ...common.serialization import CompressionMiddleware, FastJSONResponse
+from .config import (
+    CHANGE_FEED_ENABLED,
+    DATA_SERVICE_URL,
+    HTTP_TIMEOUT_SECONDS,
+    LLM_SERVICE_URL,
+)
+from .logic import metrics
+from .logic.change_feed import follow_changes
+from .logic.ocr import ocr_pipeline
+from .logic.voice import transcriber
 from .routers import gateway as gateway_router
 
-app = FastAPI(title="User Request Handling Layer", version="0.1.0")
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    feed = asyncio.create_task(follow_changes()) if CHANGE_FEED_ENABLED else None
+    yield
+    if feed is not None:
+        feed.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await feed
+    transcriber.shutdown()
+    ocr_pipeline.shutdown()
+
+
+app = FastAPI(
+    title="User Request Handling Layer",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 app.include_router(gateway_router.router)
+app.include_router(tracing.router)
+app.include_router(profiling.router)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(tracing.TracingMiddleware, service="gateway")
+app.add_middleware(profiling.ProfilingMiddleware, service="gateway")
+tracing.instrument_httpx()
 
 
 @app.get("/health")
@@ -14,3 +52,23 @@ async def health():
         llm = await client.get(f"{LLM_SERVICE_URL}/health")
         data = await client.get(f"{DATA_SERVICE_URL}/health")
     return {"status": "ok", "llm": llm.json(), "data": data.json()}
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """One trace across all three services as a waterfall (offset and depth per span)."""
+    spans = tracing.exporter.query(trace_id, limit=5000)
+    params = {"trace_id": trace_id, "limit": 5000}
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
+        for base in (LLM_SERVICE_URL, DATA_SERVICE_URL):
+            try:
+                r = await client.get(f"{base}/traces", params=params)
+                spans.extend(r.json().get("spans", []))
+            except (httpx.HTTPError, ValueError):
+                pass  # that service is down or untraced; show what we have
+    return {"trace_id": trace_id, "spans": tracing.waterfall(spans)}
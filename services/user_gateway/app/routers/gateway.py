@@ -1,39 +1,58 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional
 
 import httpx
 from fastapi import APIRouter, HTTPException
 
-from ..config import DATA_SERVICE_URL, HTTP_TIMEOUT_SECONDS, LLM_SERVICE_URL
+from ....common.serialization import json_body
+from ..config import HTTP_TIMEOUT_SECONDS, LLM_SERVICE_URL
+from ..logic import metrics
+from ..logic import session as session_store
+from ..logic.actions import ActionContext, resolve, run_call, run_calls
+from ..logic.ocr import image_hint, load_image, ocr_pipeline
 from ..logic.pipeline import detect_intent, fetch_data
+from ..logic.session import Session
+from ..logic.slots import extract_slots
+from ..logic.voice import combine_text, load_audio, transcribe_and_plan, transcriber
 from ..schemas.gateway import GatewayResponse, UserRequest
 
 router = APIRouter()
 
-# whisper = ... load whisper model here if needed ...
+
+async def call_planner(text: str, user_id: Optional[int]) -> Dict[str, Any]:
+    body = {"text": text, "user_id": user_id}
+    try:
+        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
+            r = await client.post(f"{LLM_SERVICE_URL}/intents/plan", json=body)
+            if r.status_code != 200:
+                raise HTTPException(status_code=r.status_code, detail=r.text)
+            return r.json()
+    except httpx.ReadTimeout:
+        raise HTTPException(
+            status_code=504,
+            detail="Timeout contacting LLM service for intent planning. Try again.",
+        )
 
 
 @router.post("/query", response_model=GatewayResponse)
 async def query(req: UserRequest):
+    ocr = None
+    if req.image:
+        ocr = await ocr_pipeline.extract(await load_image(req.image))
+        req = req.model_copy(update={"text": combine_text(req.text, image_hint(ocr))})
+    if req.voice:
+        transcript = await transcriber.transcribe_all(await load_audio(req.voice))
+        req = req.model_copy(update={"text": combine_text(req.text, transcript)})
     intent, route = detect_intent(req.text, req.user_id)
     fetched = await fetch_data(intent, req.user_id, route)
-    if req.voice:
-        # Use whisper to process voice input (not implemented)
-        # extracted_text = whisper.transcribe(req.voice)
-        # prompt = f"User said: {extracted_text}\n\n{req.text}"
-
-        raise HTTPException(status_code=400, detail="Voice input not supported yet")
-    if req.image:
-        # Download and process image input then put it into prompt for MLLM (not supported)
-        # image = Image.open(httpx.get(req.image).content)
-        raise HTTPException(status_code=400, detail="Image input not supported yet")
-
     prompt = req.text
     if fetched:
         prompt += f"\nRelevant data: {fetched}"
 
     async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
         gen = await client.post(
-            f"{LLM_SERVICE_URL}/generate", json={"model": req.model, "prompt": prompt}
+            f"{LLM_SERVICE_URL}/generate",
+            # The prompt embeds fetched data-service rows; large bodies are sent gzipped.
+            **json_body({"model": req.model, "task": "chat", "prompt": prompt}),
         )
         if gen.status_code != 200:
             raise HTTPException(status_code=gen.status_code, detail=gen.text)
@@ -41,157 +60,121 @@ async def query(req: UserRequest):
 
     return GatewayResponse(
         answer=payload.get("output", ""),
-        model=payload.get("model", req.model),
-        meta={"intent": intent, "fetched": fetched},
+        model=payload.get("model", req.model or ""),
+        meta={"intent": intent, "fetched": fetched, "ocr": ocr.meta() if ocr else None},
     )
 
 
 @router.post("/intents/plan")
 async def plan(req: UserRequest):
-    if req.voice:
-        # Use whisper to process voice input (not implemented)
-        # extracted_text = whisper.transcribe(req.voice)
-        # prompt = f"User said: {extracted_text}\n\n{req.text}"
-
-        raise HTTPException(status_code=400, detail="Voice input not supported yet")
+    ocr = None
+    # What the user said or typed: a screenshot's slots (a ticket's current departure among
+    # them) must not answer a clarification.
+    user_text = req.text
     if req.image:
-        # Download and process image input then put it into prompt for MLLM (not supported)
-        # image = Image.open(httpx.get(req.image).content)
-        raise HTTPException(status_code=400, detail="Image input not supported yet")
-
-    body = {"text": req.text, "user_id": req.user_id}
-
-    try:
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-            r = await client.post(f"{LLM_SERVICE_URL}/intents/plan", json=body)
-            if r.status_code != 200:
-                raise HTTPException(status_code=r.status_code, detail=r.text)
-            plan = r.json()
-    except httpx.ReadTimeout:
-        raise HTTPException(
-            status_code=504, detail="Timeout contacting LLM service for intent planning. Try again."
+        # Screenshot text goes to the planner as a hint; its ids also fill missing args below.
+        ocr = await ocr_pipeline.extract(await load_image(req.image))
+        req = req.model_copy(update={"text": combine_text(req.text, image_hint(ocr))})
+
+    session = await session_store.load(req.conversation_id) if req.conversation_id else None
+    llm_calls = session.llm_calls if session else 0
+    plan = None
+    if req.voice and session is not None:
+        # Clarification reply: only transcribe, the session resolves it below.
+        transcript = await transcriber.transcribe_all(await load_audio(req.voice))
+        req = req.model_copy(update={"text": combine_text(req.text, transcript)})
+        user_text = combine_text(user_text, transcript)
+    elif req.voice:
+        # Planning starts on partial transcripts; a speculative plan that still fits the
+        # final transcript is used as is.
+        voiced = await transcribe_and_plan(
+            req.voice, req.text, lambda text: call_planner(text, req.user_id)
         )
+        req = req.model_copy(update={"text": voiced.text})
+        llm_calls += voiced.planner_calls
+        metrics.incr("planner_calls", voiced.planner_calls)
+        plan = voiced.plan
+    if req.voice and not req.text:
+        raise HTTPException(status_code=400, detail="No speech recognised in voice input")
+    if session is not None:
+        # Follow-up to a clarification: complete the pending action locally when the reply
+        # supplies something we asked for; otherwise treat it as a new utterance.
+        found = extract_slots(user_text, expected=session.missing)
+        if any(k in found for k in session.missing):
+            plan = {
+                "intent": session.intent,
+                "slots": found,
+                "action": {"name": session.pending_action, "args": {**session.args, **found}},
+                "notes": "completed from conversation session",
+            }
+            metrics.incr("session_local_resolutions")
+
+    if plan is None:
+        plan = await call_planner(req.text, req.user_id)
+        llm_calls += 1
+        metrics.incr("planner_calls")
+        if session is not None:
+            # Same task re-planned: keep what earlier turns already provided.
+            for action in [plan.get("action"), *(plan.get("actions") or [])]:
+                if isinstance(action, dict) and action.get("name") == session.pending_action:
+                    new_args = {k: v for k, v in (action.get("args") or {}).items() if v}
+                    action["args"] = {**session.args, **new_args}
 
-    # Define available action functions
-    async def do_update_ticket_time(args: Dict[str, Any]) -> Dict[str, Any]:
-        order_id = args.get("order_id")
-        new_time_iso = args.get("new_time_iso") or args.get("new_time")
-        if order_id is None or not new_time_iso:
-            # Fallback: let LLM agent handle extraction from natural text
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-                rr = await client.post(
-                    f"{LLM_SERVICE_URL}/agent/change_time", json={"question": req.text}
-                )
-                return (
-                    rr.json()
-                    if rr.headers.get("content-type", "").startswith("application/json")
-                    else {"raw": rr.text}
-                )
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-            rr = await client.post(
-                f"{DATA_SERVICE_URL}/orders/update_time",
-                json={"order_id": order_id, "new_time": new_time_iso},
-            )
-            if rr.status_code != 200:
-                raise HTTPException(status_code=rr.status_code, detail=rr.text)
-            return rr.json()
-
-    async def do_get_trips(args: Dict[str, Any]) -> Dict[str, Any]:
-        route_id = args.get("route_id")
-        if not route_id:
-            raise HTTPException(status_code=400, detail="Missing route_id for get_trips")
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-            rr = await client.get(f"{DATA_SERVICE_URL}/trips/{route_id}")
-            if rr.status_code != 200:
-                raise HTTPException(status_code=rr.status_code, detail=rr.text)
-            return rr.json()
-
-    async def do_get_pending_orders(args: Dict[str, Any]) -> Dict[str, Any]:
-        uid = args.get("user_id") or req.user_id
-        if uid is None:
-            raise HTTPException(status_code=400, detail="Missing user_id for get_pending_orders")
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-            rr = await client.get(f"{DATA_SERVICE_URL}/orders/{uid}/pending")
-            if rr.status_code != 200:
-                raise HTTPException(status_code=rr.status_code, detail=rr.text)
-            return rr.json()
-
-    async def do_faq(args: Dict[str, Any]) -> Dict[str, Any]:
-        question = args.get("question") or req.text
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS) as client:
-            rr = await client.post(f"{LLM_SERVICE_URL}/faq/ask", json={"question": question})
-            if rr.status_code != 200:
-                raise HTTPException(status_code=rr.status_code, detail=rr.text)
-            return rr.json()
-
-    ACTIONS = {
-        "update_ticket_time": do_update_ticket_time,
-        "get_trips": do_get_trips,
-        "get_pending_orders": do_get_pending_orders,
-        "faq": do_faq,
-    }
-
-    # Decide which action to run
     intent = plan.get("intent", "unknown")
-    action = plan.get("action") or {}
-    action_name = action.get("name") if isinstance(action, dict) else None
-    args = action.get("args", {}) if isinstance(action, dict) else {}
-
-    # Provide sensible defaults if planner omitted action
-    if not action_name:
-        if intent == "get_trips":
-            action_name = "get_trips"
-            args = {"route_id": (plan.get("slots", {}) or {}).get("route_id")}
-        elif intent == "get_pending_orders":
-            action_name = "get_pending_orders"
-            args = {"user_id": req.user_id}
-        elif intent == "change_time":
-            action_name = "update_ticket_time"
-            slots = plan.get("slots", {}) or {}
-            args = {"order_id": slots.get("order_id"), "new_time_iso": slots.get("new_time")}
-        elif intent == "faq":
-            action_name = "faq"
-            args = {"question": (plan.get("slots", {}) or {}).get("question") or req.text}
-
-    # Normalize aliases for args
-    if action_name == "update_ticket_time" and "new_time_iso" not in args and args.get("new_time"):
-        args["new_time_iso"] = args.get("new_time")
-
-    # Check required args for the selected action
-    required: Dict[str, List[str]] = {
-        "update_ticket_time": ["order_id", "new_time_iso"],
-        "get_trips": ["route_id"],
-        "get_pending_orders": ["user_id"],
-        # faq has no required args
-    }
-    if action_name in required:
-        missing = [k for k in required[action_name] if not args.get(k)]
-        if missing:
-            # Build a concise clarification message (VN)
-            if action_name == "update_ticket_time":
-                msg = (
-                    "Vui lòng cung cấp đầy đủ thông tin để đổi giờ vé: "
-                    + ", ".join(missing)
-                    + ". Ví dụ: 'Đổi vé order 123 sang 2025-09-15T10:00:00'."
+    calls = resolve(plan, req)
+    if not any(call.spec for call in calls):
+        name = calls[0].name if calls else None
+        return {"plan": plan, "error": f"No handler for action '{name}'", "intent": intent}
+    if ocr is not None:
+        # Ids from a screenshot fill what the planner left empty.
+        for call in calls:
+            for key in call.spec.ocr_args if call.spec else ():
+                if not call.args.get(key) and key in ocr.slots:
+                    call.args[key] = ocr.slots[key]
+
+    ctx = ActionContext(req, intent=intent, llm_calls=llm_calls)
+    pending = next((call for call in calls if call.missing), None)
+    if pending is not None:
+        # Independent actions that are complete still run; the first incomplete one is asked.
+        ready = [call for call in calls if not call.missing]
+        results = await run_calls(ready, ctx) if ready else []
+        missing = pending.missing
+        if req.conversation_id:
+            await session_store.save(
+                Session(
+                    conversation_id=req.conversation_id,
+                    intent=intent,
+                    pending_action=pending.name,
+                    args={k: v for k, v in pending.args.items() if v},
+                    missing=missing,
+                    llm_calls=ctx.llm_calls,
                 )
-            elif action_name == "get_trips":
-                msg = "Vui lòng cung cấp route_id (ví dụ: HCM-HN)."
-            elif action_name == "get_pending_orders":
-                msg = "Vui lòng cung cấp user_id hoặc đăng nhập."
-            else:
-                msg = "Thiếu thông tin cần thiết."
-
-            return {
-                "plan": plan,
-                "needs_clarification": True,
-                "missing": missing,
-                "message": msg,
-                "suggested_action": action_name,
-            }
+            )
+        response = {
+            "plan": plan,
+            "needs_clarification": True,
+            "missing": missing,
+            "message": pending.spec.message(missing),
+            "suggested_action": pending.name,
+            "conversation_id": req.conversation_id,
+            "ocr": ocr.meta() if ocr else None,
+        }
+        if results:
+            response["results"] = results
+        return response
 
     # Execute when all required args are present or not needed
-    if action_name not in ACTIONS:
-        return {"plan": plan, "error": f"No handler for action '{action_name}'", "intent": intent}
-
-    result = await ACTIONS[action_name](args)
-    return {"plan": plan, "result": result, "needs_clarification": False}
+    if len(calls) == 1:
+        outcome = {"result": await run_call(calls[0], ctx)}
+    else:
+        outcome = {"results": await run_calls(calls, ctx)}
+    if req.conversation_id:
+        await session_store.discard(req.conversation_id)
+    metrics.record_task(ctx.llm_calls)
+    return {
+        "plan": plan,
+        **outcome,
+        "needs_clarification": False,
+        "llm_calls": ctx.llm_calls,
+        "ocr": ocr.meta() if ocr else None,
+    }
@@ -14,6 +14,8 @@ class UserRequest(BaseModel):
     image: Optional[str] = None  # image URL (not used currently)
     voice: Optional[str] = None  # voice URL (not used currently)
     intent: Optional[str] = None
+    conversation_id: Optional[str] = None  # ties clarification follow-ups to a pending action
+    model: Optional[str] = None  # None lets the LLM service pick the model for the task
 
 
 class GatewayResponse(BaseModel):
@@ -0,0 +1,123 @@
+"""Timing fixture for the hot-path benchmarks.
+
+Timings are stored relative to a fixed pure-Python calibration loop so that baselines
+recorded on one machine stay meaningful on another. Each repeat times a batch of the
+calibration loop right next to a batch of the benchmark (with the garbage collector off, as
+``timeit`` does), so load or CPU frequency changes hit both; the score is the median ratio
+over the repeats. ``--bench-update`` rewrites ``baselines.json`` with the slowest of a few
+such scores, leaving headroom for run-to-run noise; otherwise a benchmark fails when it is
+more than ``--bench-threshold`` times slower than its baseline.
+"""
+
+import gc
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+import pytest
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+MIN_BATCH_SECONDS = 0.02
+REPEATS = 7
+UPDATE_ROUNDS = 3  # scores per benchmark when recording baselines
+
+
+def _calibration_workload() -> None:
+    table: Dict[int, int] = {}
+    for i in range(20000):
+        table[i % 997] = table.get(i % 997, 0) + len(str(i))
+    sorted(table.items(), key=lambda kv: kv[1])
+
+
+def _batch_time(fn: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def batch_size(fn: Callable[[], Any]) -> int:
+    """Calls of ``fn`` per batch so that a batch lasts at least MIN_BATCH_SECONDS."""
+    fn()  # warm-up: imports, caches, lazy initialisation
+    number = 1
+    while _batch_time(fn, number) * number < MIN_BATCH_SECONDS:
+        number *= 2
+    return number
+
+
+def measure(fn: Callable[[], Any], repeats: int = REPEATS) -> Tuple[float, float]:
+    """Median seconds per call of ``fn`` and median ratio to the calibration loop."""
+    calls, unit_calls = batch_size(fn), batch_size(_calibration_workload)
+    seconds, ratios = [], []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            unit = _batch_time(_calibration_workload, unit_calls)
+            seconds.append(_batch_time(fn, calls))
+            ratios.append(seconds[-1] / unit)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return statistics.median(seconds), statistics.median(ratios)
+
+
+class BenchRecorder:
+    def __init__(self, config: pytest.Config):
+        self.threshold = config.getoption("--bench-threshold")
+        self.update = config.getoption("--bench-update")
+        stored = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+        self.baselines: Dict[str, float] = stored.get("benchmarks", {})
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def __call__(self, name: str, fn: Callable[[], Any]) -> float:
+        seconds, score = measure(fn)
+        if self.update:
+            score = max([score] + [measure(fn)[1] for _ in range(UPDATE_ROUNDS - 1)])
+        baseline = self.baselines.get(name)
+        self.results[name] = {"seconds": seconds, "score": score, "baseline": baseline}
+        if self.update or baseline is None:
+            return seconds
+        if score > baseline * self.threshold:
+            pytest.fail(
+                f"{name}: {score / baseline:.2f}x its baseline "
+                f"({seconds * 1e3:.3f} ms/call, threshold {self.threshold}x)",
+                pytrace=False,
+            )
+        return seconds
+
+    def save(self) -> None:
+        merged = {**self.baselines, **{k: round(v["score"], 4) for k, v in self.results.items()}}
+        payload = {
+            "unit": "multiples of the calibration loop in tests/benchmarks/conftest.py",
+            "benchmarks": dict(sorted(merged.items())),
+        }
+        BASELINES_PATH.write_text(json.dumps(payload, indent=2) + "\n")
+
+
+_RECORDER = pytest.StashKey[BenchRecorder]()
+
+
+@pytest.fixture(scope="session")
+def bench(pytestconfig) -> BenchRecorder:
+    recorder = BenchRecorder(pytestconfig)
+    pytestconfig.stash[_RECORDER] = recorder
+    return recorder
+
+
+def pytest_sessionfinish(session):
+    recorder = session.config.stash.get(_RECORDER, None)
+    if recorder is not None and recorder.update:
+        recorder.save()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    recorder = config.stash.get(_RECORDER, None)
+    if recorder is None or not recorder.results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, r in recorder.results.items():
+        ratio = f"{r['score'] / r['baseline']:.2f}x baseline" if r["baseline"] else "no baseline"
+        terminalreporter.write_line(f"{name:<40} {r['seconds'] * 1e3:>10.3f} ms  {ratio}")
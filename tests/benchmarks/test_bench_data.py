@@ -0,0 +1,32 @@
+import pytest
+
+from services.data_service.app import main as data_main
+
+pytestmark = pytest.mark.benchmark
+
+
+def _orders(size: int):
+    return [
+        {
+            "order_id": i,
+            "user_id": i % 100,
+            "status": "pending" if i % 3 else "completed",
+            "trip_id": 100 + i,
+            "departure_time": f"2025-09-{i % 28 + 1:02d}T10:00:00",
+        }
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize("size", [1_000, 10_000, 100_000])
+def test_pending_orders_lookup(bench, monkeypatch, size):
+    monkeypatch.setattr(data_main, "ORDERS", _orders(size))
+    cursor = data_main.encode_cursor(size // 2)  # a page from the middle of the store
+
+    def lookup():
+        return data_main.get_pending_orders(
+            7, limit=20, cursor=cursor, fields=None, fmt="json", if_none_match=None
+        )
+
+    assert lookup().status_code == 200
+    bench(f"data.pending_orders[{size}]", lookup)
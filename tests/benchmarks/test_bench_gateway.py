@@ -0,0 +1,31 @@
+import asyncio
+import dataclasses
+
+import pytest
+
+from services.user_gateway.app.logic import actions
+from services.user_gateway.app.logic.actions import ACTIONS, ActionContext
+from services.user_gateway.app.schemas.gateway import UserRequest
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("count", [1, 4, 16])
+def test_action_dispatch(bench, monkeypatch, count):
+    async def handler(args, ctx):
+        return args
+
+    spec = dataclasses.replace(ACTIONS["faq"], name="bench", handler=handler, intent=None)
+    monkeypatch.setitem(ACTIONS, "bench", spec)
+    req = UserRequest(text="xem đơn đang chờ và chuyến HCM-HN", user_id=7)
+    plan = {
+        "intent": "faq",
+        "actions": [{"name": "bench", "args": {"question": f"q{i}"}} for i in range(count)],
+    }
+
+    def dispatch():
+        ctx = ActionContext(req, intent=plan["intent"])
+        return asyncio.run(actions.run_calls(actions.resolve(plan, req), ctx))
+
+    assert len(dispatch()) == count
+    bench(f"gateway.action_dispatch[{count}]", dispatch)
@@ -0,0 +1,111 @@
+import json
+import sys
+import types
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+QUESTION = "Làm thế nào để đổi giờ vé xe khách đã đặt?"
+WORDS = "vé xe khách đổi giờ huỷ hoàn tiền nhà xe chuyến đi thanh toán ứng dụng".split()
+
+
+class _HashEmbeddings(Embeddings):
+    """Deterministic 64-dim bag-of-words embeddings; no model download."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def _vec(self, text: str):
+        v = np.zeros(64, dtype="float32")
+        for word in text.lower().split():
+            v[zlib.crc32(word.encode("utf-8")) % 64] += 1.0
+        return (v / (np.linalg.norm(v) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+@pytest.fixture(scope="module")
+def llm_router():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        if "services.llm_service.app.routers.llm" not in sys.modules:
+            monkeypatch.setitem(
+                sys.modules,
+                "langchain_community.embeddings",
+                types.SimpleNamespace(HuggingFaceEmbeddings=_HashEmbeddings),
+            )
+        from services.llm_service.app.routers import llm
+
+        yield llm
+
+
+@pytest.fixture
+def faq_corpus(llm_router, monkeypatch):
+    """Point the router at a real FAISS index over ``size`` synthetic FAQ rows."""
+    from langchain_community.vectorstores.faiss import FAISS
+
+    from services.llm_service.app.logic import vector_index
+    from services.llm_service.app.logic.faq_store import FAQDocuments, FAQStore
+
+    monkeypatch.setattr(vector_index, "FAISS", FAISS)
+
+    def install(size: int) -> None:
+        rng = np.random.default_rng(0)
+        store = FAQStore.from_rows(
+            {"question": " ".join(rng.choice(WORDS, 10)) + f" {i}?", "answer": f"Trả lời {i}."}
+            for i in range(size)
+        )
+        docs, embeddings = FAQDocuments(store), _HashEmbeddings()
+        vs = vector_index.build_vectorstore(docs, embeddings, None, docstore=docs)
+        for name, value in {
+            "faq_store": store,
+            "faq_docs": docs,
+            "faq_embeddings": embeddings,
+            "vectorstore": vs,
+            "retriever": vs.as_retriever(),
+        }.items():
+            monkeypatch.setattr(llm_router, name, value)
+
+    return install
+
+
+@pytest.mark.parametrize("size", [1_000, 10_000, 50_000])
+def test_get_faq_context(bench, llm_router, faq_corpus, size):
+    faq_corpus(size)
+    assert "Q:" in llm_router.get_faq_context(QUESTION)
+    bench(f"llm.get_faq_context[{size}]", lambda: llm_router.get_faq_context(QUESTION))
+
+
+@pytest.mark.parametrize("actions", [1, 10, 100])
+def test_planner_json_parsing(bench, actions):
+    from services.llm_service.app.logic.json_stream import JSONObjectScanner
+    from services.llm_service.app.logic.planner import parse_plan
+
+    plan = {
+        "intent": "get_trips",
+        "slots": {"route_id": "HCM-HN"},
+        "actions": [{"name": "get_trips", "args": {"route_id": f"R-{i}"}} for i in range(actions)],
+        "notes": None,
+    }
+    text = "<think>cần tra chuyến</think>" + json.dumps(plan, ensure_ascii=False) + " Xong!"
+    chunks = [text[i : i + 8] for i in range(0, len(text), 8)]  # ~one token per chunk
+
+    def scan_and_parse():
+        scanner = JSONObjectScanner()
+        for chunk in chunks:
+            if scanner.feed(chunk) is not None:
+                break
+        return parse_plan(scanner.result)
+
+    assert len(scan_and_parse().actions) == actions
+    bench(f"llm.planner_parse[{actions}]", scan_and_parse)
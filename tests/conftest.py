@@ -1,7 +1,37 @@
+import os
 import sys
 from pathlib import Path
 
+import pytest
+
 # Ensure project root (containing 'services') is on sys.path
 ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks", "hot-path microbenchmarks (tests/benchmarks)")
+    group.addoption("--benchmarks", action="store_true", help="run the benchmark tests")
+    group.addoption(
+        "--bench-update", action="store_true", help="record timings as the new baselines"
+    )
+    group.addoption(
+        "--bench-threshold",
+        type=float,
+        default=float(os.environ.get("BENCH_THRESHOLD", "2.0")),
+        help="fail when a benchmark is this many times slower than its baseline",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: hot-path timing, run with --benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks") or config.getoption("--bench-update"):
+        return
+    skip = pytest.mark.skip(reason="benchmark: run with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.data_service.app import main as data_main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    orders = [
+        {
+            "order_id": i,
+            "user_id": 10,
+            "status": "pending" if i % 2 else "completed",
+            "trip_id": 100 + i,
+            "departure_time": f"2025-09-{i % 28 + 1:02d}T10:00:00",
+        }
+        for i in range(1, 51)
+    ]
+    monkeypatch.setattr(data_main, "ORDERS", orders)
+    return TestClient(data_main.app)
+
+
+def test_pending_orders_cursor_pagination_walks_all_rows(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/orders/10/pending", params=params)
+        assert r.status_code == 200, r.text
+        seen.extend(o["order_id"] for o in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == list(range(1, 51, 2))
+
+
+def test_request_without_limit_gets_the_full_list(monkeypatch):
+    orders = [
+        {"order_id": i, "user_id": 10, "status": "pending", "trip_id": 1, "departure_time": ""}
+        for i in range(1, 251)
+    ]
+    monkeypatch.setattr(data_main, "ORDERS", orders)
+    r = TestClient(data_main.app).get("/orders/10/pending")
+    assert r.status_code == 200 and "X-Next-Cursor" not in r.headers
+    assert [o["order_id"] for o in r.json()] == list(range(1, 251))
+
+
+def test_field_projection_and_unknown_field(client):
+    r = client.get("/orders/10/pending", params={"limit": 2, "fields": "order_id,departure_time"})
+    assert r.json() == [
+        {"order_id": 1, "departure_time": "2025-09-02T10:00:00"},
+        {"order_id": 3, "departure_time": "2025-09-04T10:00:00"},
+    ]
+    assert client.get("/orders/10/pending", params={"fields": "password"}).status_code == 400
+
+
+def test_ndjson_streams_all_rows_without_limit(client):
+    r = client.get("/orders/10/pending", params={"format": "ndjson", "fields": "order_id"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert rows == [{"order_id": i} for i in range(1, 51, 2)]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/trips/HCM-HN", params={"cursor": "***"}).status_code == 400
+
+
+def test_etag_conditional_request_returns_304(client):
+    first = client.get("/orders/10/pending", params={"limit": 5})
+    etag = first.headers["ETag"]
+    again = client.get("/orders/10/pending", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    other = client.get("/orders/10/pending", params={"limit": 6}, headers={"If-None-Match": etag})
+    assert other.status_code == 200 and len(other.json()) == 6
+
+
+def test_mutations_are_recorded_in_change_feed(client, monkeypatch):
+    monkeypatch.setattr(data_main, "CHANGES", data_main.ChangeLog(max_entries=2))
+    start = client.get("/changes").json()
+    assert start == {"changes": [], "next_since": 0, "reset": False}
+
+    client.post("/orders/update_time", json={"order_id": 1, "new_time": "2025-10-01T08:00:00"})
+    client.delete("/orders/3")
+    page = client.get("/changes", params={"since": 0}).json()
+    assert [c["op"] for c in page["changes"]] == ["order.updated", "order.deleted"]
+    assert page["changes"][0]["data"]["user_id"] == 10 and page["next_since"] == 2
+
+    # Nothing new: a short long-poll times out empty and keeps the cursor
+    idle = client.get("/changes", params={"since": 2, "wait": 0.05}).json()
+    assert idle["changes"] == [] and idle["next_since"] == 2
+
+    # Evicted entries (bounded log) or a cursor from a previous run force a reset
+    client.post("/complaint/1", params={"complaint": "late"})
+    assert client.get("/changes", params={"since": 0}).json()["reset"] is True
+    ahead = client.get("/changes", params={"since": 99}).json()
+    assert ahead["reset"] is True and ahead["next_since"] == 3
+
+
+def test_change_log_wakes_waiters_from_worker_thread():
+    import asyncio
+
+    log = data_main.ChangeLog()
+
+    async def scenario():
+        waiters = [asyncio.create_task(log.wait(0, timeout=5.0)) for _ in range(50)]
+        await asyncio.sleep(0)
+        # Sync handlers run in the threadpool; append must wake the loop's waiters.
+        await asyncio.to_thread(log.append, "order.updated", {"order_id": 1})
+        return await asyncio.wait_for(asyncio.gather(*waiters), 1.0)
+
+    assert asyncio.run(scenario()) == [True] * 50
@@ -0,0 +1,43 @@
+import pytest
+
+from services.llm_service.app.logic import utils
+from services.llm_service.app.logic.faq_store import FAQDocuments, FAQStore, faq_answer
+
+ROWS = [
+    {"question": " Chính sách đổi vé? ", "answer": "Liên hệ nhà xe."},
+    {"question": "Phí huỷ vé?", "answer": "Liên hệ nhà xe."},
+    {"question": "Đặt vé máy bay?", "answer": "Qua ứng dụng Vexere."},
+]
+
+
+def test_store_round_trips_rows_and_deduplicates_values():
+    store = FAQStore.from_rows(ROWS)
+    assert len(store) == 3
+    assert store.record(0).as_dict() == {
+        "question": "Chính sách đổi vé?",
+        "answer": "Liên hệ nhà xe.",
+    }
+    assert [r.answer for r in store.records()] == [r["answer"] for r in ROWS]
+    assert store.columns["answer"].distinct == 2  # the repeated answer is stored once
+    assert store.record(2).get("missing", "-") == "-"
+    with pytest.raises(AttributeError):
+        store.record(0).extra = 1  # __slots__ records
+
+
+def test_documents_serve_as_faiss_docstore():
+    store = FAQStore.from_rows(ROWS)
+    docs = FAQDocuments(store)
+    assert [d.page_content for d in docs] == store.column("question")
+    hit = docs.search("2")
+    assert hit.metadata == {"row": 2} and faq_answer(hit, store) == "Qua ứng dụng Vexere."
+
+
+def test_store_loads_csv_and_backs_retrieve_faq(tmp_path, monkeypatch):
+    path = tmp_path / "faq.csv"
+    path.write_text('question ,answer\nPhí huỷ vé?,"10-30%,\ntuỳ nhà xe"\n', encoding="utf-8")
+    store = FAQStore.from_csv(path)
+    assert store.record(0).as_dict() == {"question": "Phí huỷ vé?", "answer": "10-30%,\ntuỳ nhà xe"}
+    assert len(FAQStore.from_csv(tmp_path / "missing.csv")) == 0
+
+    monkeypatch.setattr(utils, "_FAQ_STORE", store)
+    assert utils.retrieve_faq("Phí huỷ vé") == [store.record(0).as_dict()]
@@ -0,0 +1,60 @@
+import asyncio
+import dataclasses
+
+from services.user_gateway.app.logic import actions
+from services.user_gateway.app.logic.actions import ACTIONS, ActionCall, ActionContext, resolve
+from services.user_gateway.app.schemas.gateway import UserRequest
+
+
+def test_registry_declares_every_planner_action():
+    assert set(ACTIONS) == {"update_ticket_time", "get_trips", "get_pending_orders", "faq"}
+    assert actions.INTENT_ACTIONS["change_time"] == "update_ticket_time"
+    spec = ACTIONS["update_ticket_time"]
+    assert spec.missing({"order_id": 3}) == ["new_time_iso"]
+    assert "new_time_iso" in spec.message(["new_time_iso"])
+
+
+def test_resolve_normalises_aliases_defaults_and_duplicates():
+    req = UserRequest(text="câu hỏi?", user_id=5)
+    plan = {
+        "intent": "change_time",
+        "actions": [
+            {"name": "update_ticket_time", "args": {"order_id": 1, "new_time": "2025-09-15T10:00"}},
+            {"name": "faq", "args": {}},
+            {"name": "faq", "args": {}},
+        ],
+    }
+    calls = resolve(plan, req)
+    assert calls == [
+        ActionCall("update_ticket_time", {"order_id": 1, "new_time_iso": "2025-09-15T10:00"}),
+        ActionCall("faq", {"question": "câu hỏi?"}),
+    ]
+    # No action: the intent's action, with arguments taken from the slots
+    plan = {"intent": "change_time", "slots": {"order_id": 2, "new_time": "t", "question": "?"}}
+    assert resolve(plan, req) == [
+        ActionCall("update_ticket_time", {"order_id": 2, "new_time_iso": "t"})
+    ]
+    assert resolve({"intent": "unknown"}, req) == []
+
+
+def test_run_calls_applies_per_action_timeouts(monkeypatch):
+    async def slow(args, ctx):
+        await asyncio.sleep(1)
+
+    async def fast(args, ctx):
+        ctx.llm_calls += 1
+        return "ok"
+
+    monkeypatch.setitem(
+        ACTIONS, "slow", dataclasses.replace(ACTIONS["faq"], name="slow", handler=slow)
+    )
+    monkeypatch.setitem(
+        ACTIONS, "fast", dataclasses.replace(ACTIONS["faq"], name="fast", handler=fast)
+    )
+    monkeypatch.setitem(actions.ACTION_TIMEOUTS, "slow", 0.05)
+    ctx = ActionContext(UserRequest(text="x"))
+    calls = [ActionCall("slow", {}), ActionCall("fast", {}), ActionCall("nope", {})]
+    results = asyncio.run(actions.run_calls(calls, ctx))
+    assert results[0]["status_code"] == 504 and "timed out" in results[0]["error"]
+    assert results[1]["result"] == "ok" and ctx.llm_calls == 1
+    assert results[2]["status_code"] == 400
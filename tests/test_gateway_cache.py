@@ -0,0 +1,92 @@
+import asyncio
+
+from services.user_gateway.app.logic.cache import NOT_MODIFIED, ReadThroughCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _loader(calls, value="v1", etag='"e1"'):
+    async def load(if_none_match):
+        calls.append(if_none_match)
+        if if_none_match == etag:
+            return NOT_MODIFIED, etag
+        return value, etag
+
+    return load
+
+
+def test_fresh_hit_then_stale_revalidates_with_etag():
+    clock = _Clock()
+    cache = ReadThroughCache({"trips": (10.0, 20.0)}, clock=clock)
+    calls = []
+
+    async def scenario():
+        assert await cache.get("trips", "trips|a", _loader(calls)) == "v1"
+        clock.now = 5.0
+        assert await cache.get("trips", "trips|a", _loader(calls)) == "v1"
+        assert calls == [None]  # fresh hit, no upstream call
+
+        clock.now = 15.0  # stale: served immediately, revalidated in background
+        assert await cache.get("trips", "trips|a", _loader(calls)) == "v1"
+        await asyncio.sleep(0)
+        await asyncio.gather(*cache._background)
+        assert calls == [None, '"e1"']
+
+        clock.now = 20.0  # 304 extended freshness
+        assert await cache.get("trips", "trips|a", _loader(calls)) == "v1"
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+    assert cache.stats["not_modified"] == 1
+
+
+def test_concurrent_misses_share_one_request_and_invalidate_drops_resource():
+    cache = ReadThroughCache({"pending_orders": (10.0, 0.0), "trips": (10.0, 0.0)})
+    calls = []
+
+    async def slow_load(etag):
+        calls.append(etag)
+        await asyncio.sleep(0.01)
+        return ["order"], None
+
+    async def scenario():
+        results = await asyncio.gather(
+            *[cache.get("pending_orders", "pending_orders|u1", slow_load) for _ in range(5)]
+        )
+        assert results == [["order"]] * 5 and len(calls) == 1
+        await cache.get("trips", "trips|x", _loader([]))
+
+        cache.invalidate("pending_orders")
+        await cache.get("pending_orders", "pending_orders|u1", slow_load)
+        assert len(calls) == 2
+        assert await cache.get("trips", "trips|x", _loader(["unused"])) == "v1"
+
+    asyncio.run(scenario())
+
+
+def test_change_feed_invalidates_only_affected_user(monkeypatch):
+    from services.user_gateway.app.logic import change_feed
+
+    cache = ReadThroughCache({"pending_orders": (60.0, 0.0), "trips": (60.0, 0.0)})
+    monkeypatch.setattr(change_feed, "data_cache", cache)
+    base = change_feed.DATA_SERVICE_URL
+
+    async def fill():
+        for key in (
+            f"pending_orders|{base}/orders/10/pending|[]",
+            f"pending_orders|{base}/orders/11/pending|[]",
+            "trips|x|[]",
+        ):
+            await cache.get(key.split("|")[0], key, _loader([]))
+
+    asyncio.run(fill())
+    change_feed.apply_changes([{"seq": 1, "op": "order.updated", "data": {"user_id": 10}}], False)
+    assert set(cache._entries) == {f"pending_orders|{base}/orders/11/pending|[]", "trips|x|[]"}
+    change_feed.apply_changes([], reset=True)
+    assert not cache._entries
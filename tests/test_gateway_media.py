@@ -0,0 +1,62 @@
+import asyncio
+import base64
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from services.user_gateway.app.logic import media
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """Route the module's httpx client to an in-process handler; records bytes sent."""
+    sent = []
+    real_client = httpx.AsyncClient
+
+    def handler(request):
+        size = int(request.url.params["size"])
+        declared = request.url.params.get("declare", "yes") == "yes"
+
+        async def body():
+            for _ in range(size // 1024):
+                sent.append(1024)
+                yield b"x" * 1024
+
+        headers = {"content-length": str(size)} if declared else {}
+        return httpx.Response(200, headers=headers, content=body())
+
+    monkeypatch.setattr(
+        media.httpx,
+        "AsyncClient",
+        lambda **kw: real_client(transport=httpx.MockTransport(handler), **kw),
+    )
+    return sent
+
+
+def _load(source, max_bytes=8 * 1024):
+    return asyncio.run(media.load_bytes(source, max_bytes, "image"))
+
+
+def test_url_within_limit_is_returned(served):
+    assert _load("http://img/?size=4096") == b"x" * 4096
+
+
+def test_declared_oversized_url_is_refused_before_download(served):
+    with pytest.raises(HTTPException) as err:
+        _load("http://img/?size=104857600")
+    assert err.value.status_code == 413 and served == []
+
+
+def test_undeclared_oversized_url_is_aborted_while_streaming(served):
+    with pytest.raises(HTTPException) as err:
+        _load("http://img/?size=104857600&declare=no")
+    assert err.value.status_code == 413 and sum(served) <= 9 * 1024
+
+
+def test_oversized_data_uri_is_refused():
+    uri = "data:image/png;base64," + base64.b64encode(b"x" * 64 * 1024).decode()
+    with pytest.raises(HTTPException) as err:
+        _load(uri)
+    assert err.value.status_code == 413
+    assert _load("data:image/png;base64," + base64.b64encode(b"ok").decode()) == b"ok"
@@ -0,0 +1,49 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from services.user_gateway.app.logic.ocr import OCRPipeline, image_hint
+
+
+def fake_pipeline(texts):
+    calls = []
+
+    def run(data, submitted_at):
+        calls.append(data)
+        if data == b"broken":
+            raise ValueError("not a decodable image")
+        return texts[data], {"queue": 0.0, "decode": 0.001, "normalise": 0.002, "ocr": 0.05}
+
+    return OCRPipeline(lambda: ThreadPoolExecutor(2), run), calls
+
+
+def test_repeated_screenshots_skip_ocr():
+    pipeline, calls = fake_pipeline({b"img": "Mã đơn: #4821\nKhởi hành 08:30 20/09/2025"})
+
+    async def scenario():
+        first, second = await asyncio.gather(pipeline.extract(b"img"), pipeline.extract(b"img"))
+        return first, second, await pipeline.extract(b"img")
+
+    first, concurrent, repeat = asyncio.run(scenario())
+    pipeline.shutdown()
+    assert calls == [b"img"]  # one OCR run for three requests
+    assert first.slots["order_id"] == 4821
+    assert first.slots["new_time_iso"] == "2025-09-20T08:30:00"
+    assert not first.cached and concurrent.cached and repeat.cached
+    assert set(first.timings_ms) == {"hash", "queue", "decode", "normalise", "ocr", "total"}
+    assert set(repeat.timings_ms) == {"hash", "total"}
+    hint = image_hint(first)
+    assert hint.startswith("[Thông tin từ ảnh: order_id=4821")
+    # The ticket's departure is labelled as the current time, never as the requested one
+    assert "new_time_iso" not in hint
+    assert "giờ khởi hành hiện tại=2025-09-20T08:30:00" in hint
+
+
+def test_undecodable_image_is_rejected():
+    pipeline, _ = fake_pipeline({})
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(pipeline.extract(b"broken"))
+    pipeline.shutdown()
+    assert err.value.status_code == 400
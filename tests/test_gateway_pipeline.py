@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from services.user_gateway.app.config import DATA_PAGE_SIZE, DATA_SERVICE_URL
+from services.user_gateway.app.logic.cache import data_cache
 from services.user_gateway.app.main import app as gateway_app
 
 
@@ -20,6 +22,11 @@ def client():
     return TestClient(gateway_app)
 
 
+@pytest.fixture(autouse=True)
+def _clear_data_cache():
+    data_cache.clear()
+
+
 class MockResp:
     def __init__(self, status_code=200, json_data=None, text="", headers=None):
         self.status_code = status_code
@@ -36,6 +43,8 @@ class MockResp:
 
 
 _PLAN_MODE = {"mode": "missing_change_time"}
+_GET_CALLS: list = []
+_PLANNER_CALLS: list = []
 
 
 @pytest.fixture
@@ -60,6 +69,7 @@ def mock_async_client(monkeypatch):
 
         async def post(self, url, json=None):
             if url.endswith("/intents/plan"):
+                _PLANNER_CALLS.append(json)
                 mode = _PLAN_MODE["mode"]
                 if mode == "missing_change_time":
                     return MockResp(
@@ -80,6 +90,17 @@ def mock_async_client(monkeypatch):
                             },
                         }
                     )
+                if mode == "change_time_no_order":
+                    return MockResp(
+                        json_data={
+                            "intent": "change_time",
+                            "slots": {"new_time": "2025-09-15T10:00:00"},
+                            "action": {
+                                "name": "update_ticket_time",
+                                "args": {"new_time_iso": "2025-09-15T10:00:00"},
+                            },
+                        }
+                    )
                 if mode == "trips":
                     return MockResp(
                         json_data={
@@ -88,6 +109,18 @@ def mock_async_client(monkeypatch):
                             "action": {"name": "get_trips", "args": {"route_id": "HCM-HN"}},
                         }
                     )
+                if mode == "multi":
+                    return MockResp(
+                        json_data={
+                            "intent": "get_pending_orders",
+                            "slots": {"route_id": "HCM-HN"},
+                            "action": {"name": "get_pending_orders", "args": {}},
+                            "actions": [
+                                {"name": "get_pending_orders", "args": {}},
+                                {"name": "get_trips", "args": {"route": "HCM-HN"}},
+                            ],
+                        }
+                    )
                 if mode == "faq":
                     return MockResp(
                         json_data={
@@ -114,7 +147,8 @@ def mock_async_client(monkeypatch):
                 return MockResp(json_data={"answer": "FAQ", "context": ""})
             return MockResp(text="Unhandled POST", status_code=500)
 
-        async def get(self, url):
+        async def get(self, url, params=None, headers=None):
+            _GET_CALLS.append((url, params))
             if "/trips/" in url:
                 return MockResp(json_data=[{"trip_id": 1}])
             if "/orders/" in url and url.endswith("/pending"):
@@ -151,6 +185,9 @@ def test_get_trips_flow(client, plan_mode):
     data = resp.json()
     assert data["plan"]["intent"] == "get_trips"
     assert isinstance(data["result"], list)
+    # Only the first page is requested from the data service
+    url, params = _GET_CALLS[-1]
+    assert url.endswith("/trips/HCM-HN") and params == {"limit": DATA_PAGE_SIZE}
 
 
 def test_faq_fallback(client, plan_mode):
@@ -160,3 +197,140 @@ def test_faq_fallback(client, plan_mode):
     data = resp.json()
     assert data["plan"]["intent"] == "faq"
     assert "answer" in data["result"] or "context" in data["result"]
+
+
+def test_multi_action_plan_runs_all_actions(client, plan_mode):
+    plan_mode("multi")
+    _GET_CALLS.clear()
+    resp = client.post(
+        "/intents/plan", json={"text": "xem đơn đang chờ và chuyến HCM-HN", "user_id": 7}
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["needs_clarification"] is False and "result" not in data
+    by_action = {r["action"]: r for r in data["results"]}
+    assert by_action["get_pending_orders"]["args"] == {"user_id": 7}
+    assert by_action["get_trips"]["args"] == {"route_id": "HCM-HN"}  # alias resolved
+    assert by_action["get_trips"]["result"] == [{"trip_id": 1}]
+    assert sorted(url for url, _ in _GET_CALLS) == [
+        f"{DATA_SERVICE_URL}/orders/7/pending",
+        f"{DATA_SERVICE_URL}/trips/HCM-HN",
+    ]
+
+
+def test_multi_action_plan_asks_for_incomplete_action(client, plan_mode):
+    plan_mode("multi")
+    resp = client.post("/intents/plan", json={"text": "xem đơn đang chờ và chuyến HCM-HN"})
+    data = resp.json()
+    assert data["needs_clarification"] is True and data["suggested_action"] == "get_pending_orders"
+    assert data["missing"] == ["user_id"]
+    assert [r["action"] for r in data["results"]] == ["get_trips"]
+
+
+def test_clarification_follow_up_completes_without_replanning(client, plan_mode):
+    plan_mode("missing_change_time")
+    _PLANNER_CALLS.clear()
+    first = client.post(
+        "/intents/plan",
+        json={"text": "Đổi giờ vé order 12", "user_id": 7, "conversation_id": "c-1"},
+    ).json()
+    assert first["needs_clarification"] is True and first["missing"] == ["new_time_iso"]
+
+    follow = client.post(
+        "/intents/plan",
+        json={"text": "10h sáng mai", "user_id": 7, "conversation_id": "c-1"},
+    )
+    assert follow.status_code == 200, follow.text
+    data = follow.json()
+    assert data["needs_clarification"] is False and data["result"]["updated"] is True
+    assert data["plan"]["action"]["args"]["order_id"] == 12
+    assert len(_PLANNER_CALLS) == 1 and data["llm_calls"] == 1
+
+    # The session is closed once the task completes
+    again = client.post(
+        "/intents/plan", json={"text": "10h sáng mai", "user_id": 7, "conversation_id": "c-1"}
+    ).json()
+    assert len(_PLANNER_CALLS) == 2 and again["needs_clarification"] is True
+
+
+def test_voice_plan_uses_transcript(client, plan_mode, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.user_gateway.app.logic import voice
+
+    parts = ["Đổi giờ vé order 12 sang 2025-09-15T10:00:00", "nhé"]
+    fake = voice.VoiceTranscriber(
+        lambda: ThreadPoolExecutor(1),
+        decode=lambda data, seconds: (parts, 12.0),
+        transcribe=lambda pcm, prompt, t0: (pcm, 0.0, 1.0),
+    )
+    monkeypatch.setattr(voice, "transcriber", fake)
+    plan_mode("full_change_time")
+    _PLANNER_CALLS.clear()
+    resp = client.post(
+        "/intents/plan", json={"text": "", "voice": "data:audio/wav;base64,UklGRg==", "user_id": 7}
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["result"]["updated"] is True and data["llm_calls"] == 1
+    # Planning started on the first partial and was kept for the filler-only tail
+    assert _PLANNER_CALLS == [{"text": parts[0], "user_id": 7}]
+    fake.shutdown()
+
+
+def test_image_order_id_fills_missing_arg(client, plan_mode, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.user_gateway.app.logic import ocr
+    from services.user_gateway.app.routers import gateway
+
+    def run(data, submitted_at):
+        return "VEXERE  Mã đơn hàng: 12  Khởi hành 08:30 20/09/2025", {"ocr": 0.01}
+
+    monkeypatch.setattr(
+        gateway, "ocr_pipeline", ocr.OCRPipeline(lambda: ThreadPoolExecutor(1), run)
+    )
+    plan_mode("change_time_no_order")
+    _PLANNER_CALLS.clear()
+    resp = client.post(
+        "/intents/plan",
+        json={"text": "Đổi sang 10h ngày 15/9", "image": "data:image/png;base64,iVBORw0KGgo="},
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["result"]["updated"] is True and data["ocr"]["slots"]["order_id"] == 12
+    assert "order_id=12" in _PLANNER_CALLS[0]["text"]
+    gateway.ocr_pipeline.shutdown()
+
+
+def test_image_departure_does_not_answer_clarification(client, plan_mode, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.user_gateway.app.logic import ocr
+    from services.user_gateway.app.routers import gateway
+
+    def run(data, submitted_at):
+        return "VEXERE  Mã đơn hàng: 12  Khởi hành 08:30 20/09/2025", {"ocr": 0.01}
+
+    monkeypatch.setattr(
+        gateway, "ocr_pipeline", ocr.OCRPipeline(lambda: ThreadPoolExecutor(1), run)
+    )
+    plan_mode("missing_change_time")
+    image = "data:image/png;base64,iVBORw0KGgo="
+    first = client.post(
+        "/intents/plan",
+        json={"text": "Đổi giờ vé này", "image": image, "user_id": 7, "conversation_id": "c-img"},
+    ).json()
+    assert first["needs_clarification"] is True and first["missing"] == ["new_time_iso"]
+
+    # The screenshot is sent again with the reply; its departure is the time being changed
+    follow = client.post(
+        "/intents/plan",
+        json={"text": "10h sáng mai", "image": image, "user_id": 7, "conversation_id": "c-img"},
+    )
+    assert follow.status_code == 200, follow.text
+    args = follow.json()["plan"]["action"]["args"]
+    assert args["order_id"] == 12
+    assert args["new_time_iso"] != "2025-09-20T08:30:00"
+    assert args["new_time_iso"].endswith("T10:00:00")
+    gateway.ocr_pipeline.shutdown()
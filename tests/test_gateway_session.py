@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from services.user_gateway.app.logic import session as session_module
+from services.user_gateway.app.logic.session import (
+    MemorySessionStore,
+    Session,
+    SQLiteSessionStore,
+)
+from services.user_gateway.app.logic.slots import extract_slots
+
+NOW = datetime(2025, 9, 10, 15, 0)
+
+
+def test_extract_slots_vietnamese_follow_ups():
+    assert extract_slots("order 123, 10h sáng mai", now=NOW) == {
+        "order_id": 123,
+        "new_time_iso": "2025-09-11T10:00:00",
+    }
+    assert extract_slots("7 giờ tối ngày kia", now=NOW) == {"new_time_iso": "2025-09-12T19:00:00"}
+    assert extract_slots("14:30 ngày 15/9", now=NOW) == {"new_time_iso": "2025-09-15T14:30:00"}
+    assert extract_slots("12h đêm nay", now=NOW) == {"new_time_iso": "2025-09-10T00:00:00"}
+    assert extract_slots("2h đêm mai", now=NOW) == {"new_time_iso": "2025-09-11T02:00:00"}
+    assert extract_slots("11h đêm mai", now=NOW) == {"new_time_iso": "2025-09-11T23:00:00"}
+    assert extract_slots("10h30 ngày 15/9", now=NOW) == {"new_time_iso": "2025-09-15T10:30:00"}
+    # Counts and words starting with "h" are not times
+    assert extract_slots("2 hành khách", expected=["new_time_iso"], now=NOW) == {}
+    assert extract_slots("tôi có 3 hành lý", expected=["new_time_iso"], now=NOW) == {}
+    assert extract_slots("hcm-hn", expected=["new_time_iso"], now=NOW) == {}
+    assert "new_time_iso" not in extract_slots("25h", now=NOW)
+    assert extract_slots("đơn 55 sang 2025-09-15T10:00:00", now=NOW)["order_id"] == 55
+    assert extract_slots("chuyến HCM-HN", now=NOW) == {"route_id": "HCM-HN"}
+    # A bare number only counts as an order id when that is what we asked for
+    assert extract_slots("123", expected=["order_id"], now=NOW) == {"order_id": 123}
+    assert extract_slots("123", expected=["new_time_iso"], now=NOW) == {}
+
+
+def test_memory_store_expires_sessions():
+    now = [0.0]
+    store = MemorySessionStore(ttl=10.0, clock=lambda: now[0])
+    store.put(Session("c", "change_time", "update_ticket_time", {"order_id": 1}, ["x"], 1))
+    assert store.get("c").args == {"order_id": 1}
+    now[0] = 11.0
+    assert store.get("c") is None
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "s.db"), ttl=60.0)
+    session = Session("c", "change_time", "update_ticket_time", {"order_id": 1}, ["x"], 2)
+    store.put(session)
+    # A second handle on the same file sees it (e.g. another worker)
+    assert SQLiteSessionStore(str(tmp_path / "s.db")).get("c") == session
+    store.delete("c")
+    assert store.get("c") is None
+
+
+def test_sqlite_store_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "s.db"), ttl=60.0)
+    threads = []
+    get = store.get
+
+    def tracked_get(conversation_id):
+        threads.append(threading.current_thread())
+        return get(conversation_id)
+
+    monkeypatch.setattr(store, "get", tracked_get)
+    monkeypatch.setattr(session_module, "sessions", store)
+    session = Session("c", "change_time", "update_ticket_time", {"order_id": 1}, ["x"], 2)
+
+    async def scenario():
+        await session_module.save(session)
+        loaded = await session_module.load("c")
+        await session_module.discard("c")
+        return loaded, await session_module.load("c")
+
+    assert asyncio.run(scenario()) == (session, None)
+    assert threading.main_thread() not in threads and len(threads) == 2
@@ -0,0 +1,95 @@
+import asyncio
+import gc
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from services.user_gateway.app.logic import metrics
+from services.user_gateway.app.logic.voice import (
+    VoiceTranscriber,
+    can_reuse_plan,
+    transcribe_and_plan,
+)
+
+
+def fake_transcriber(parts, seconds_per_chunk=10.0):
+    def decode(data, chunk_seconds):
+        return list(parts), seconds_per_chunk * len(parts)
+
+    def transcribe(pcm, prompt, submitted_at):
+        return pcm, 0.01, seconds_per_chunk / 5  # RTF 0.2
+
+    return VoiceTranscriber(lambda: ThreadPoolExecutor(2), decode, transcribe)
+
+
+VOICE_URI = "data:audio/wav;base64,UklGRg=="
+
+
+def test_stream_yields_growing_transcript_and_metrics():
+    voice = fake_transcriber(["đổi vé", "", "order 12"])
+    before = metrics.snapshot().get("voice_chunks", 0)
+
+    async def collect():
+        return [t async for t in voice.stream(b"audio")]
+
+    assert asyncio.run(collect()) == ["đổi vé", "đổi vé order 12"]
+    voice.shutdown()
+    snap = metrics.snapshot()
+    assert snap["voice_chunks"] - before == 3
+    assert snap["voice_queue_depth"] == 0 and 0 < snap["voice_rtf"] <= 0.2 + 1e-9
+
+
+def test_can_reuse_plan_only_for_filler_tails():
+    assert can_reuse_plan("đổi vé order 12", "đổi vé order 12 nhé ạ")
+    assert not can_reuse_plan("đổi vé order 12", "đổi vé order 12 sang 10h sáng mai")
+    assert not can_reuse_plan("đổi vé order 12", "đổi vé order 13")
+
+
+def test_speculative_plan_is_reused_or_replaced():
+    planned = []
+
+    async def planner(text):
+        planned.append(text)
+        await asyncio.sleep(0.01)
+        return {"intent": "change_time", "text": text}
+
+    async def run(parts):
+        planned.clear()
+        return await transcribe_and_plan(VOICE_URI, "", planner, fake_transcriber(parts))
+
+    hit = asyncio.run(run(["đổi vé order 12 sang 10h", "ạ"]))
+    assert hit.text == "đổi vé order 12 sang 10h ạ" and hit.planner_calls == 1
+    assert hit.plan["text"] == "đổi vé order 12 sang 10h"
+
+    miss = asyncio.run(run(["đổi vé order 12", "sang 10h sáng mai"]))
+    # The first plan was cancelled once the tail brought a new slot; the second fits.
+    assert miss.planner_calls == 2 and miss.plan["text"] == "đổi vé order 12 sang 10h sáng mai"
+
+
+def test_failed_discarded_plan_is_not_reported_as_unretrieved():
+    errors = []
+
+    async def planner(text):
+        raise HTTPException(status_code=502, detail="planner unavailable")
+
+    def transcribe(pcm, prompt, submitted_at):
+        time.sleep(0.02)  # the plan fails while this chunk is transcribed
+        if pcm == "bad":
+            raise ValueError("undecodable chunk")
+        return pcm, 0.02, 2.0
+
+    parts = ["đổi vé order 12", "bad"]
+    voice = VoiceTranscriber(lambda: ThreadPoolExecutor(1), lambda d, s: (parts, 20.0), transcribe)
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: errors.append(ctx))
+        with pytest.raises(ValueError, match="undecodable"):
+            await transcribe_and_plan(VOICE_URI, "", planner, voice)
+        gc.collect()  # unretrieved task errors are reported when the task is collected
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    voice.shutdown()
+    assert errors == []
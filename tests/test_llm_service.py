@@ -35,7 +35,7 @@ class _DummyFAISS:
         self._retriever = _DummyRetriever(docs)
 
     @classmethod
-    def from_documents(cls, docs, embeddings):
+    def from_documents(cls, docs, embeddings, **kwargs):
         return cls(docs)
 
     def as_retriever(self, search_kwargs=None):
@@ -43,7 +43,12 @@ class _DummyFAISS:
 
 
 @pytest.fixture(scope="module")
-def llm_client(monkeypatch):
+def llm_client():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        yield _make_llm_client(monkeypatch)
+
+
+def _make_llm_client(monkeypatch):
     # Patch vector store and embeddings before importing the app
     monkeypatch.setitem(
         sys.modules,
@@ -54,13 +59,26 @@ def llm_client(monkeypatch):
         sys.modules, "langchain_community.vectorstores", types.SimpleNamespace(FAISS=_DummyFAISS)
     )
 
+    # Another test module may have imported the real FAISS class already.
+    vector_index = sys.modules.get("services.llm_service.app.logic.vector_index")
+    if vector_index is not None:
+        monkeypatch.setattr(vector_index, "FAISS", _DummyFAISS)
+
     # Import after patching
     from services.llm_service.app.main import app as llm_app
     from services.llm_service.app.routers import llm as llm_router
 
+    # ...or the router itself, with a real index; use the dummy one either way.
+    dummy_store = _DummyFAISS()
+    monkeypatch.setattr(llm_router, "vectorstore", dummy_store)
+    monkeypatch.setattr(llm_router, "retriever", dummy_store.as_retriever())
+
     # Provide a controllable LLM stub
     class LLMStub:
         def __init__(self):
+            self.plan_outputs = []
+            self.stream_kwargs = []
+            self.streamed_chunks = 0
             self.responses = {
                 "faq": types.SimpleNamespace(content="Trả lời FAQ mô phỏng"),
                 "plan": types.SimpleNamespace(
@@ -92,19 +110,34 @@ def llm_client(monkeypatch):
 
             return WithTools()
 
-        async def ainvoke(self, prompt_or_messages):
+        async def astream(self, prompt, **kwargs):
+            # Planner path: stream the queued outputs (default: the canned plan) in small
+            # chunks with trailing chatter that an early stop should never read.
+            self.stream_kwargs.append(kwargs)
+            content = self.plan_outputs.pop(0) if self.plan_outputs else None
+            content = content if content is not None else self.responses["plan"].content
+            content += " Hope this helps! " * 20
+            for i in range(0, len(content), 8):
+                self.streamed_chunks += 1
+                yield types.SimpleNamespace(content=content[i : i + 8])
+
+        async def ainvoke(self, prompt_or_messages, **kwargs):
             # Heuristic: planner contains "intent" keys in template
             # FAQ prompt contains "Ngữ cảnh" marker
-            if isinstance(prompt_or_messages, str):
-                # Not expected in our code path, but default to plan
-                return self.responses["plan"]
             text = str(prompt_or_messages)
             if "Ngữ cảnh" in text:
                 return self.responses["faq"]
             return self.responses["plan"]
 
-    # Swap in the stubbed llm
-    llm_router.llm = LLMStub()
+    # Scored retrieval over the dummy retriever; 0.5 keeps answers on the generated path.
+    def scored_search(vectorstore, embeddings, questions, k):
+        docs = vectorstore.as_retriever().get_relevant_documents("")
+        return [[(d, 0.5) for d in docs] for _ in questions]
+
+    monkeypatch.setattr(llm_router, "batch_search_with_scores", scored_search)
+
+    # Swap in the stubbed llm (agent, FAQ and planner clients)
+    llm_router.llm = llm_router.faq_llm = llm_router.planner_llm = LLMStub()
 
     # Replace TOOLS with a dummy tool that doesn't call network
     class DummyTool:
@@ -135,6 +168,36 @@ def test_faq_ask_returns_answer_and_context(llm_client):
     assert "Q:" in data["context"]
 
 
+def test_faq_ask_near_exact_match_returns_stored_answer(llm_client, monkeypatch):
+    from services.llm_service.app.logic import metrics
+    from services.llm_service.app.routers import llm as llm_router
+
+    stored = "Bạn có thể đổi vé trước giờ khởi hành 24h."
+
+    def scored_search(vectorstore, embeddings, questions, k):
+        return [[(_DummyDoc("Chính sách đổi vé?", {"answer": stored}), 0.97)] for _ in questions]
+
+    monkeypatch.setattr(llm_router, "batch_search_with_scores", scored_search)
+    before = metrics.counters["faq_extractive"]
+
+    r = llm_client.post("/faq/ask", json={"question": "chính sách đổi vé"})
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data["answer"] == stored and data["extractive"] is True and data["score"] == 0.97
+
+    r = llm_client.post("/faq/ask", params={"stream": True}, json={"question": "đổi vé?"})
+    assert r.headers["X-FAQ-Extractive"] == "1"
+    assert f"[ANSWER_START]\n{stored}\n[ANSWER_END]" in r.text
+    assert metrics.counters["faq_extractive"] == before + 2
+
+    monkeypatch.setattr(llm_router, "FAQ_EXTRACTIVE_MIN_SCORE", 0.99)
+    data = llm_client.post("/faq/ask", json={"question": "đổi vé?"}).json()
+    assert data["extractive"] is False and data["answer"].startswith("Trả lời")
+    snapshot = metrics.snapshot()
+    assert 0 < snapshot["faq_extractive_rate"] < 1
+    assert "faq_latency_saved_s" in snapshot
+
+
 def test_intents_plan_parses_json(llm_client):
     r = llm_client.post("/intents/plan", json={"text": "FAQ về đổi vé", "user_id": 1})
     assert r.status_code == 200
@@ -153,3 +216,123 @@ def test_agent_change_time_executes_tool_and_returns_final_answer(llm_client):
     assert data["tool_calls"], "Expected tool calls recorded"
     assert any(tc.get("name") == "update_ticket_time" for tc in data["tool_calls"])
     assert isinstance(data["answer"], str) and len(data["answer"]) >= 0
+
+
+def test_faq_ask_batch_streams_ndjson(llm_client, monkeypatch):
+    from services.llm_service.app.routers import llm as llm_router
+
+    calls = []
+
+    def fake_batch_search(vectorstore, embeddings, questions, k):
+        calls.append(list(questions))
+        return [[_DummyDoc(q, {"answer": f"A:{q}"})] for q in questions]
+
+    monkeypatch.setattr(llm_router, "batch_search", fake_batch_search)
+    questions = ["Chính sách đổi vé?", "Phí huỷ vé?", "Đặt vé máy bay?"]
+    r = llm_client.post("/faq/ask_batch", json={"questions": questions, "max_concurrency": 2})
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in r.text.splitlines() if line]
+    # One retrieval pass for the whole batch, one line per question
+    assert calls == [questions]
+    assert sorted(i["index"] for i in items) == [0, 1, 2]
+    for item in items:
+        assert item["question"] == questions[item["index"]]
+        assert item["answer"].startswith("Trả lời")
+        assert f"A:{item['question']}" in item["context"]
+
+
+def test_faq_ask_batch_rejects_empty(llm_client):
+    r = llm_client.post("/faq/ask_batch", json={"questions": []})
+    assert r.status_code == 422
+
+
+def test_intents_plan_uses_structured_output_and_stops_early(llm_client):
+    from services.llm_service.app.routers import llm as llm_router
+
+    stub = llm_router.llm
+    stub.streamed_chunks = 0
+    r = llm_client.post("/intents/plan", json={"text": "FAQ về đổi vé"})
+    assert r.status_code == 200, r.text
+    kwargs = stub.stream_kwargs[-1]
+    assert kwargs["response_format"]["type"] == "json_schema"
+    assert "intent" in kwargs["response_format"]["json_schema"]["schema"]["properties"]
+    assert kwargs["max_tokens"] <= 256
+    plan_len = len(stub.responses["plan"].content)
+    assert stub.streamed_chunks <= plan_len // 8 + 1  # trailing chatter never consumed
+
+
+def test_intents_plan_repairs_once_then_gives_502(llm_client):
+    from services.llm_service.app.routers import llm as llm_router
+
+    stub = llm_router.llm
+    good = stub.responses["plan"].content
+    stub.plan_outputs = ["Sure! {intent: faq", good]
+    r = llm_client.post("/intents/plan", json={"text": "FAQ về đổi vé"})
+    assert r.status_code == 200 and r.json()["intent"] == "faq"
+
+    stub.plan_outputs = ["not json", '{"intent": "faq", "action": "oops"}']
+    r = llm_client.post("/intents/plan", json={"text": "FAQ về đổi vé"})
+    assert r.status_code == 502
+
+    m = llm_client.get("/metrics").json()
+    assert m["planner_parse_failures"] >= 3 and m["planner_failures"] >= 1
+    assert 0 < m["planner_parse_failure_rate"] <= 1
+
+
+def test_intents_plan_maps_backend_failures(llm_client, monkeypatch):
+    import httpx
+
+    from services.llm_service.app.logic.local_llm import QueueFullError
+    from services.llm_service.app.logic.model_router import BackendError, NoBackendError
+    from services.llm_service.app.routers import llm as llm_router
+
+    for exc, status in [
+        (NoBackendError("no backend serves 'planner'"), 503),
+        (QueueFullError("local backend queue is full (64)"), 503),
+        (BackendError("local: generation failed"), 502),
+        (httpx.ConnectError("connection refused"), 502),
+    ]:
+
+        async def failing(llm, prompt, exc=exc):
+            raise exc
+
+        monkeypatch.setattr(llm_router, "run_planner", failing)
+        r = llm_client.post("/intents/plan", json={"text": "FAQ về đổi vé"})
+        assert r.status_code == status and str(exc) in r.json()["detail"]
+
+
+def test_parse_plan_reads_multiple_actions(llm_client):
+    from services.llm_service.app.logic.planner import parse_plan
+
+    plan = parse_plan(
+        json.dumps(
+            {
+                "intent": "get_pending_orders",
+                "action": {"name": "get_pending_orders", "args": {}},
+                "actions": [
+                    {"name": "get_pending_orders", "args": {}},
+                    {"name": "get_trips", "args": {"route_id": "HCM-HN"}},
+                ],
+            }
+        )
+    )
+    assert [a.name for a in plan.actions] == ["get_pending_orders", "get_trips"]
+    with pytest.raises(ValueError):
+        parse_plan('{"intent": "faq", "actions": "get_trips"}')
+
+
+def test_json_scanner_handles_think_blocks_and_string_braces():
+    from services.llm_service.app.logic.json_stream import JSONObjectScanner
+
+    scanner = JSONObjectScanner()
+    pieces = [
+        "<thi",
+        "nk>maybe {x}</think>\n",
+        '{"notes": "a } b \\" {", ',
+        '"slots": {}}',
+        " extra",
+    ]
+    results = [scanner.feed(p) for p in pieces]
+    assert results[:3] == [None, None, None]
+    assert json.loads(results[3]) == {"notes": 'a } b " {', "slots": {}}
@@ -0,0 +1,231 @@
+import asyncio
+import threading
+
+import httpx
+
+from services.llm_service.app.logic.local_llm import (
+    DynamicBatcher,
+    GenerationJob,
+    TransformersRunner,
+    _BatchStreamer,
+)
+from services.llm_service.app.logic.model_router import (
+    Backend,
+    BackendConfig,
+    LocalBackend,
+    ModelRouter,
+)
+from services.llm_service.app.schemas.llm import GenerationRequest
+
+
+class FakeRunner:
+    """Emits one token per step for each job, like a batched generate call."""
+
+    def __init__(self, steps=3, gate=None):
+        self.steps = steps
+        self.gate = gate
+        self.batches = []
+
+    def __call__(self, jobs):
+        self.batches.append(len(jobs))
+        if self.gate is not None:
+            self.gate.wait(5)
+        for step in range(self.steps):
+            for job in jobs:
+                if not job.finished:
+                    job.generated += 1
+                    job.emit(f"{job.messages[0]['content']}{step} ")
+        for job in jobs:
+            job.finished = True
+            job.finish()
+
+
+def _job(text, temperature=0.0):
+    return GenerationJob(
+        [{"role": "user", "content": text}], max_new_tokens=8, temperature=temperature
+    )
+
+
+async def _collect(batcher, job):
+    return "".join([d async for d in batcher.stream(job)])
+
+
+def test_concurrent_jobs_share_one_batch():
+    runner = FakeRunner()
+    batcher = DynamicBatcher(runner, max_batch_size=8, max_wait=0.05)
+
+    async def scenario():
+        jobs = [_job(t) for t in "abcd"] + [_job("z", temperature=0.7)]
+        return await asyncio.gather(*(_collect(batcher, j) for j in jobs))
+
+    outputs = asyncio.run(scenario())
+    assert outputs[0] == "a0 a1 a2 " and outputs[3] == "d0 d1 d2 "
+    # Same-temperature jobs are coalesced; the sampled one runs in its own batch.
+    assert runner.batches == [4, 1]
+    assert batcher.stats()["mean_batch_size"] == 2.5
+
+
+def test_batch_token_cap_and_early_close():
+    runner = FakeRunner(steps=50)
+    batcher = DynamicBatcher(runner, max_batch_size=8, max_batch_tokens=20, max_wait=0.05)
+
+    async def scenario():
+        first = _job("a")
+        stream = batcher.stream(first)
+        head = await stream.__anext__()
+        await stream.aclose()  # e.g. the planner's early stop
+        rest = await asyncio.gather(*(_collect(batcher, _job(t)) for t in "bcd"))
+        return first, head, rest
+
+    first, head, rest = asyncio.run(scenario())
+    assert head == "a0 " and first.cancelled and first.generated < 50
+    # Each job costs ~8 tokens, so at most two fit into a 20-token batch.
+    assert runner.batches == [1, 2, 1] and rest[2].startswith("d0 ")
+
+
+def test_full_local_queue_fails_over_to_http_backend():
+    gate = threading.Event()
+    batcher = DynamicBatcher(FakeRunner(gate=gate), max_batch_size=1, max_wait=0, max_queue=1)
+    local = LocalBackend(BackendConfig("local", "", ["m"], kind="local"), batcher=batcher)
+
+    def remote(request):
+        message = {"role": "assistant", "content": "remote"}
+        return httpx.Response(200, json={"model": "m", "choices": [{"message": message}]})
+
+    http = Backend(BackendConfig("http", "http://remote/v1", ["m"]), httpx.MockTransport(remote))
+    http.ewma_latency = 10.0  # slower, so the local backend is preferred while it has room
+    router = ModelRouter([local, http], default_model="m")
+
+    async def scenario():
+        running = asyncio.create_task(router.generate(GenerationRequest(prompt="a")))
+        await asyncio.sleep(0.05)  # "a" is inside the runner, blocked on the gate
+        queued = asyncio.create_task(router.generate(GenerationRequest(prompt="b")))
+        await asyncio.sleep(0.05)  # "b" now fills the one-slot queue
+        overflow = await router.generate(GenerationRequest(prompt="c"))
+        gate.set()
+        return await running, await queued, overflow
+
+    a, b, c = asyncio.run(scenario())
+    assert (a.backend, a.output) == ("local", "a0 a1 a2 ")
+    assert b.backend == "local" and (c.backend, c.output) == ("http", "remote")
+
+
+class FakeTokenizer:
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(i) for i in ids)
+
+
+class FakeTensor(list):
+    def reshape(self, *shape):
+        return self
+
+    def tolist(self):
+        return list(self)
+
+
+def test_batch_streamer_splits_rows_and_stops_on_eos():
+    jobs = [_job("a"), _job("b")]
+    loop = asyncio.new_event_loop()
+    for job in jobs:
+        job._loop, job._queue = loop, asyncio.Queue()
+    streamer = _BatchStreamer(FakeTokenizer(), jobs, eos_ids={0})
+    streamer.put(FakeTensor([[1, 2], [3, 4]]))  # prompt ids are skipped
+    streamer.put(FakeTensor([ord("h"), ord("x")]))
+    streamer.put(FakeTensor([ord("i"), 0]))
+    assert jobs[1].finished and not jobs[0].finished
+    streamer.put(FakeTensor([ord("!"), 0]))
+    streamer.end()
+    loop.run_until_complete(asyncio.sleep(0))
+    deltas = [[], []]
+    for i, job in enumerate(jobs):
+        while not job._queue.empty():
+            deltas[i].append(job._queue.get_nowait())
+    loop.close()
+    assert deltas[0][:3] == ["h", "i", "!"] and deltas[1][:1] == ["x"]
+    assert jobs[0].generated == 3 and jobs[1].generated == 1
+
+
+def test_short_job_stream_closes_before_batch_ends():
+    gate = threading.Event()
+
+    def runner(jobs):
+        streamer = _BatchStreamer(FakeTokenizer(), jobs, eos_ids={0})
+        streamer.put(FakeTensor([[1], [1]]))
+        streamer.put(FakeTensor([ord("a"), ord("x")]))
+        streamer.put(FakeTensor([0, ord("y")]))  # the short job hits EOS
+        gate.wait(5)  # the long row keeps generating until the short reply is read
+        streamer.put(FakeTensor([0, ord("z")]))
+        streamer.end()
+
+    batcher = DynamicBatcher(runner, max_batch_size=2, max_wait=0.05)
+    closed = []
+
+    async def consume(job, name):
+        text = await _collect(batcher, job)
+        closed.append(name)
+        if name == "short":
+            gate.set()
+        return text
+
+    async def scenario():
+        return await asyncio.gather(consume(_job("s"), "short"), consume(_job("l"), "long"))
+
+    assert asyncio.run(scenario()) == ["a", "xyz"]
+    assert closed == ["short", "long"] and gate.is_set()
+
+
+class ByteTokenizer:
+    """Token ids are UTF-8 bytes; records how many ids each decode call sees."""
+
+    def __init__(self):
+        self.decoded = []
+
+    def decode(self, ids, skip_special_tokens=True):
+        self.decoded.append(len(ids))
+        return bytes(ids).decode("utf-8", errors="replace")
+
+
+def test_batch_streamer_decodes_a_bounded_window():
+    text = "Đổi vé sang chuyến 10h sáng mai nhé. " * 50
+    job = _job("a")
+    loop = asyncio.new_event_loop()
+    job._loop, job._queue = loop, asyncio.Queue()
+    job.max_new_tokens = 10_000
+    tokenizer = ByteTokenizer()
+    streamer = _BatchStreamer(tokenizer, [job], eos_ids={0})
+    streamer.put(FakeTensor([[1]]))
+    for byte in text.encode("utf-8"):
+        streamer.put(FakeTensor([byte]))
+    streamer.end()
+    loop.run_until_complete(asyncio.sleep(0))
+    deltas = []
+    while not job._queue.empty():
+        deltas.append(job._queue.get_nowait())
+    loop.close()
+    assert "".join(d for d in deltas if isinstance(d, str)) == text
+    assert max(tokenizer.decoded) <= 8  # a character or two, never the whole reply
+
+
+class WordTokenizer:
+    def apply_chat_template(self, messages, **kwargs):
+        return "".join(f"{m['role']}: {m['content']}\n" for m in messages) + "assistant:"
+
+    def __call__(self, text):
+        return {"input_ids": text.split()}
+
+
+def test_long_chat_drops_oldest_turns_first():
+    runner = TransformersRunner("unused", max_input_tokens=12)
+    runner._tokenizer = WordTokenizer()
+    messages = [
+        {"role": "system", "content": "planner"},
+        {"role": "user", "content": "một hai ba bốn năm sáu bảy tám"},
+        {"role": "assistant", "content": "ok"},
+        {"role": "user", "content": "đổi vé order 12"},
+    ]
+    prompt = runner._prompt(GenerationJob(messages, max_new_tokens=8))
+    assert prompt.startswith("system: planner") and "user: đổi vé order 12" in prompt
+    assert "một hai" not in prompt and prompt.endswith("assistant:")
+    # The cost estimate never calls the tokenizer and is capped at the input budget
+    long_job = GenerationJob([{"role": "user", "content": "x" * 400}], max_new_tokens=8)
+    assert runner.estimate_cost(long_job) == 12 + 8
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from services.llm_service.app.logic.model_router import (
+    Backend,
+    BackendConfig,
+    BackendError,
+    ModelRouter,
+    NoBackendError,
+    RoutedChatModel,
+)
+from services.llm_service.app.schemas.llm import GenerationRequest
+
+
+def _backend(name, models, handler):
+    return Backend(BackendConfig(name, f"http://{name}/v1", models), httpx.MockTransport(handler))
+
+
+def _ok(name):
+    def handler(request):
+        body = json.loads(request.content)
+        if body["stream"]:
+            chunks = [
+                f'data: {json.dumps({"choices": [{"delta": {"content": c}}]})}\n\n'
+                for c in ("xin ", name)
+            ]
+            return httpx.Response(200, text="".join(chunks) + "data: [DONE]\n\n")
+        message = {"role": "assistant", "content": f"from {name}"}
+        return httpx.Response(200, json={"model": body["model"], "choices": [{"message": message}]})
+
+    return handler
+
+
+def test_task_routes_to_configured_model():
+    router = ModelRouter(
+        [_backend("small", ["qwen3-4b"], _ok("small")), _backend("big", ["qwen3-14b"], _ok("big"))],
+        task_models={"intent_plan": "qwen3-4b", "faq": "qwen3-14b"},
+        default_model="qwen3-4b",
+    )
+
+    async def scenario():
+        plan = await router.generate(GenerationRequest(task="intent_plan", prompt="hi"))
+        faq = await router.generate(GenerationRequest(task="faq", prompt="hi"))
+        streamed = [c.content async for c in RoutedChatModel(router, "faq").astream("hi")]
+        return plan, faq, streamed
+
+    plan, faq, streamed = asyncio.run(scenario())
+    assert (plan.backend, plan.model, plan.output) == ("small", "qwen3-4b", "from small")
+    assert faq.backend == "big" and streamed == ["xin ", "big"]
+    with pytest.raises(NoBackendError):
+        router.candidates("gpt-4o")
+
+
+def test_least_outstanding_and_failover_with_benching():
+    calls = []
+
+    def flaky(request):
+        calls.append("a")
+        return httpx.Response(503)
+
+    a, b = _backend("a", ["m"], flaky), _backend("b", ["m"], _ok("b"))
+    router = ModelRouter([a, b], default_model="m")
+    b.outstanding = 5  # a looks idle, so it is tried first and fails over to b
+
+    async def scenario():
+        return [await router.generate(GenerationRequest(prompt="x")) for _ in range(4)]
+
+    results = asyncio.run(scenario())
+    assert all(r.backend == "b" for r in results)
+    # After BACKEND_FAILURE_THRESHOLD consecutive failures "a" is benched and skipped
+    assert len(calls) == 3 and not a.healthy(router.clock())
+    assert router.candidates("m")[0] is b
+
+
+def test_all_backends_failing_raises():
+    router = ModelRouter([_backend("a", ["m"], lambda r: httpx.Response(500))], default_model="m")
+    with pytest.raises(BackendError):
+        asyncio.run(router.generate(GenerationRequest(prompt="x")))
@@ -0,0 +1,106 @@
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.common import profiling
+from services.common.profiling import ProfileStore, ProfilingMiddleware
+
+
+def _busy(seconds: float) -> int:
+    end, n = time.perf_counter() + seconds, 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "store", ProfileStore(str(tmp_path), max_files=2))
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        _busy(0.03)
+        await asyncio.sleep(0.03)
+        return {"ok": True}
+
+    app.include_router(profiling.router)
+    app.add_middleware(ProfilingMiddleware, service="test", token="secret", interval_ms=1)
+    return TestClient(app)
+
+
+def test_profile_requested_by_header(client):
+    r = client.get("/work", headers={"X-Profile": "secret"})
+    assert r.status_code == 200
+    profile_id = r.headers["x-profile-id"]
+
+    folded = profiling.store.read(profile_id)
+    kinds = {line.split(";", 1)[0] for line in folded.splitlines()}
+    assert {"cpu", "await"} <= kinds
+    assert "_busy (test_profiling.py" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+
+
+def test_unprofiled_requests(client):
+    assert "x-profile-id" not in client.get("/work").headers
+    assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "wrong"}).headers
+    assert profiling.store.list() == []
+
+
+def test_retention_and_endpoints(client):
+    ids = [client.get("/work", headers={"X-Profile": "secret"}).headers["x-profile-id"]]
+    for _ in range(2):
+        time.sleep(0.002)  # ids sort by millisecond timestamp
+        ids.append(client.get("/work", headers={"X-Profile": "secret"}).headers["x-profile-id"])
+
+    assert client.get("/profiles").status_code == 403
+    listed = client.get("/profiles", headers={"X-Profile": "secret"}).json()["profiles"]
+    assert [p["id"] for p in listed] == ids[:0:-1]
+    assert listed[0]["path"] == "/work" and listed[0]["status"] == 200
+    assert listed[0]["wall_ms"] >= 50
+
+    r = client.get(f"/profiles/{ids[-1]}", headers={"X-Profile": "secret"})
+    assert r.status_code == 200 and r.text.startswith(("cpu;", "await;"))
+    assert client.get(f"/profiles/{ids[0]}", headers={"X-Profile": "secret"}).status_code == 404
+    assert client.get("/profiles/..%2Fx", headers={"X-Profile": "secret"}).status_code == 404
+
+
+def test_sample_rate_without_token_keeps_profiles_private(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "store", ProfileStore(str(tmp_path)))
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", None)
+    app = FastAPI()
+    app.get("/ping")(lambda: {"ok": True})
+    app.include_router(profiling.router)
+    app.add_middleware(ProfilingMiddleware, service="test", sample_rate=1.0)
+    client = TestClient(app)
+    profile_id = client.get("/ping").headers["x-profile-id"]
+    assert client.get("/profiles").status_code == 403
+    assert client.get(f"/profiles/{profile_id}").status_code == 403
+
+
+def test_parked_threads_are_skipped_but_busy_ones_kept():
+    release = []
+    busy = threading.Thread(target=get, args=(release,), daemon=True)
+    with ThreadPoolExecutor(1) as pool:
+        pool.submit(lambda: None).result()  # the worker is now parked waiting for work
+        busy.start()
+        time.sleep(0.05)
+        frames = sys._current_frames()
+        assert profiling._idle(frames[next(iter(pool._threads)).ident])
+        assert not profiling._idle(frames[busy.ident])  # a function named "get" is work
+        release.append(True)
+    busy.join()
+
+
+def get(release):  # named like FAQStore.get: sampled while it runs
+    n = 0
+    while not release:
+        n += 1
+    return n
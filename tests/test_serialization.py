@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.common import serialization
+from services.common.serialization import dumps, json_body, preferred_encoding
+from services.data_service.app import main as data_main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    orders = [
+        {
+            "order_id": i,
+            "user_id": 10,
+            "status": "pending",
+            "trip_id": 100 + i,
+            "departure_time": f"2025-09-{i % 28 + 1:02d}T10:00:00",
+        }
+        for i in range(1, 201)
+    ]
+    monkeypatch.setattr(data_main, "ORDERS", orders)
+    return TestClient(data_main.app)
+
+
+def test_dumps_matches_stdlib_json():
+    obj = {"q": "Đổi giờ vé", "n": [1, 2.5, None, True]}
+    assert json.loads(dumps(obj)) == obj
+    assert dumps(obj) == json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def test_preferred_encoding_honours_q_values():
+    assert preferred_encoding("") is None
+    assert preferred_encoding("gzip, deflate") == "gzip"
+    assert preferred_encoding("gzip;q=0, identity") is None
+    assert preferred_encoding("*") in ("br", "gzip")
+    if serialization.brotli is not None:
+        assert preferred_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+        assert preferred_encoding("gzip, br") == "br"
+
+
+def test_large_json_is_gzipped_small_is_not(client):
+    r = client.get("/orders/10/pending", params={"limit": 100}, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert len(r.json()) == 100  # httpx decodes transparently
+
+    r = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.json() == {"status": "ok"}
+
+    r = client.get("/orders/10/pending", params={"limit": 100}, headers={"Accept-Encoding": ""})
+    assert "content-encoding" not in r.headers
+
+
+def test_streamed_ndjson_is_compressed_per_chunk(client):
+    r = client.get(
+        "/orders/10/pending", params={"format": "ndjson"}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert r.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["order_id"] for row in rows] == list(range(1, 201))
+
+
+def test_gzip_request_body_is_accepted(client):
+    kwargs = json_body({"order_id": 3, "new_time": "2025-10-01T09:00:00", "pad": "x" * 4096})
+    assert kwargs["headers"]["Content-Encoding"] == "gzip"
+    r = client.post("/orders/update_time", **kwargs)
+    assert r.status_code == 200, r.text
+    assert json_body({"order_id": 3}) == {"json": {"order_id": 3}}
+
+
+def test_corrupt_request_body_is_rejected(client):
+    r = client.post(
+        "/orders/update_time",
+        content=b"not gzip",
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_compression_bomb_is_rejected(client, monkeypatch, encoding):
+    if encoding == "br" and serialization.brotli is None:
+        pytest.skip("brotli is not installed")
+    monkeypatch.setattr(serialization, "MAX_DECOMPRESSED_BYTES", 1024 * 1024)
+    bomb = serialization.compress(b"0" * (8 * 1024 * 1024), encoding)
+    assert len(bomb) < 64 * 1024
+    r = client.post(
+        "/orders/update_time",
+        content=bomb,
+        headers={"Content-Type": "application/json", "Content-Encoding": encoding},
+    )
+    assert r.status_code == 413 and "too large" in r.json()["detail"]
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from services.common import tracing
+from services.data_service.app.main import app as data_app
+
+PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+@pytest.fixture(autouse=True)
+def _clean_buffer():
+    tracing.exporter.clear()
+    yield
+    tracing.configure(sample_rate=1.0)
+
+
+def test_traceparent_parsing():
+    ctx = tracing.parse_traceparent(PARENT)
+    assert ctx.trace_id == "0af7651916cd43dd8448eb211c80319c" and ctx.sampled
+    assert ctx.traceparent() == PARENT
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+
+def test_server_span_continues_incoming_trace():
+    resp = TestClient(data_app).get("/trips/HCM-HN", headers={"traceparent": PARENT})
+    assert resp.headers["x-trace-id"] == "0af7651916cd43dd8448eb211c80319c"
+    (span,) = tracing.exporter.query("0af7651916cd43dd8448eb211c80319c")
+    assert span["service"] == "data_service" and span["kind"] == "server"
+    assert span["parent_id"] == "b7ad6b7169203331"
+    assert span["attributes"]["http.status_code"] == 200
+
+    # Excluded paths are not recorded
+    TestClient(data_app).get("/health", headers={"traceparent": PARENT})
+    assert len(tracing.exporter.query("0af7651916cd43dd8448eb211c80319c")) == 1
+
+
+def test_httpx_calls_carry_context_and_record_client_spans():
+    tracing.instrument_httpx()
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json={})
+
+    async def call():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with tracing.span("root") as root:
+                await client.get("http://data:8002/trips/HCM-HN")
+        return root
+
+    root = asyncio.run(call())
+    child = tracing.parse_traceparent(seen[0])
+    assert child.trace_id == root.trace_id and child.span_id != root.span_id
+    spans = {s["name"]: s for s in tracing.exporter.query(root.trace_id)}
+    assert spans["GET data:8002/trips/HCM-HN"]["parent_id"] == root.span_id
+    assert spans["GET data:8002/trips/HCM-HN"]["span_id"] == child.span_id
+
+
+def test_httpx_calls_outside_a_trace_are_not_recorded():
+    tracing.instrument_httpx()
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json={})
+
+    async def poll():  # like the gateway's change-feed loop
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for _ in range(3):
+                await client.get("http://data:8002/changes")
+
+    before = len(tracing.exporter.query())
+    asyncio.run(poll())
+    assert seen == [None] * 3 and len(tracing.exporter.query()) == before
+
+
+def test_sampling_is_decided_at_the_root():
+    tracing.configure(sample_rate=0.0)
+    with tracing.span("unsampled") as root:
+        with tracing.span("child"):
+            assert tracing.current_traceparent().endswith("-00")
+    assert tracing.exporter.query(root.trace_id) == []
+    # An upstream decision to sample wins over the local rate
+    resp = TestClient(data_app).get("/trips/HCM-HN", headers={"traceparent": PARENT})
+    assert resp.status_code == 200 and len(tracing.exporter.query()) == 1
+
+
+def test_waterfall_orders_spans_with_depth():
+    spans = [
+        {"span_id": "c", "parent_id": "b", "start": 10.3, "name": "db"},
+        {"span_id": "a", "parent_id": None, "start": 10.0, "name": "gateway"},
+        {"span_id": "b", "parent_id": "a", "start": 10.1, "name": "llm"},
+    ]
+    rows = tracing.waterfall(spans)
+    assert [(r["name"], r["depth"]) for r in rows] == [("gateway", 0), ("llm", 1), ("db", 2)]
+    assert rows[2]["offset_ms"] == pytest.approx(300.0)
+
+
+def test_jsonl_export_is_written_off_the_request_path(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    buffer = tracing.SpanBuffer(path=str(path))
+    monkeypatch.setattr(tracing, "exporter", buffer)
+    written_by = []
+    real_jsonl = tracing._jsonl
+
+    def tracking_jsonl(span):
+        written_by.append(threading.current_thread().name)
+        return real_jsonl(span)
+
+    monkeypatch.setattr(tracing, "_jsonl", tracking_jsonl)
+    for i in range(20):
+        with tracing.span(f"work-{i}"):
+            pass
+    buffer.flush()
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["name"] for line in lines] == [f"work-{i}" for i in range(20)]
+    assert set(written_by) == {"trace-export"}
+    assert len(buffer.query()) == 20
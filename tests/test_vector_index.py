@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community.docstore.in_memory")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+
+class _CharEmbeddings(Embeddings):
+    """Deterministic 8-dim embeddings from character codes."""
+
+    def _vec(self, text: str):
+        v = [0.0] * 8
+        for i, ch in enumerate(text):
+            v[i % 8] += ord(ch) / 1000.0
+        return v
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+def _docs(*questions):
+    return [Document(page_content=q, metadata={"answer": f"A:{q}"}) for q in questions]
+
+
+@pytest.fixture
+def vector_index(monkeypatch):
+    # Imported lazily: test_llm_service stubs FAISS before the router pulls this module in.
+    from langchain_community.vectorstores.faiss import FAISS
+
+    from services.llm_service.app.logic import vector_index
+
+    monkeypatch.setattr(vector_index, "FAISS", FAISS)
+    return vector_index
+
+
+def test_build_vectorstore_persists_and_mmaps(tmp_path, vector_index):
+    docs = _docs("Chính sách đổi vé?", "Phí huỷ vé?", "Đặt vé máy bay?")
+    vs = vector_index.build_vectorstore(docs, _CharEmbeddings(), index_dir=tmp_path)
+    assert (tmp_path / vector_index.INDEX_FILE).exists()
+    hit = vs.similarity_search("Phí huỷ vé?", k=1)[0]
+    assert hit.metadata["answer"] == "A:Phí huỷ vé?"
+
+    # Same corpus reuses the file; a changed corpus rebuilds it.
+    mtime = (tmp_path / vector_index.INDEX_FILE).stat().st_mtime_ns
+    vector_index.build_vectorstore(docs, _CharEmbeddings(), index_dir=tmp_path)
+    assert (tmp_path / vector_index.INDEX_FILE).stat().st_mtime_ns == mtime
+    vs2 = vector_index.build_vectorstore(docs[:2], _CharEmbeddings(), index_dir=tmp_path)
+    assert vs2.index.ntotal == 2
+
+
+def test_build_vectorstore_empty_corpus(tmp_path, vector_index):
+    assert vector_index.build_vectorstore([], _CharEmbeddings(), index_dir=tmp_path) is None
+
+
+def test_batch_search_matches_single_queries(tmp_path, vector_index):
+    docs = _docs("Chính sách đổi vé?", "Phí huỷ vé?", "Đặt vé máy bay?")
+    vs = vector_index.build_vectorstore(docs, _CharEmbeddings(), index_dir=None)
+    questions = ["Phí huỷ vé?", "Đặt vé máy bay?"]
+    batched = vector_index.batch_search(vs, _CharEmbeddings(), questions, k=2)
+    single = [vs.similarity_search(q, k=2) for q in questions]
+    assert [[d.page_content for d in row] for row in batched] == [
+        [d.page_content for d in row] for row in single
+    ]
+
+
+def test_batch_search_with_scores_is_cosine(tmp_path, vector_index):
+    docs = _docs("Chính sách đổi vé?", "Phí huỷ vé?", "Đặt vé máy bay?")
+    vs = vector_index.build_vectorstore(docs, _CharEmbeddings(), index_dir=tmp_path)
+    (hits,) = vector_index.batch_search_with_scores(vs, _CharEmbeddings(), ["Phí huỷ vé?"], k=3)
+    assert hits[0][0].page_content == "Phí huỷ vé?"
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert all(score < 1.0 for _, score in hits[1:])
+
+
+def test_build_vectorstore_resolves_hits_through_faq_store(tmp_path, vector_index):
+    from services.llm_service.app.logic.faq_store import FAQDocuments, FAQStore
+
+    store = FAQStore.from_rows(
+        {"question": q, "answer": f"A:{q}"} for q in ("Chính sách đổi vé?", "Phí huỷ vé?")
+    )
+    docs = FAQDocuments(store)
+    for index_dir in (None, tmp_path):
+        vs = vector_index.build_vectorstore(docs, _CharEmbeddings(), index_dir, docstore=docs)
+        assert vs.docstore is docs
+        hit = vs.similarity_search("Phí huỷ vé?", k=1)[0]
+        assert hit.metadata == {"row": 1}